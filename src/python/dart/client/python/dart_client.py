@@ -1,5 +1,7 @@
+import copy
 import json
 import time
+from collections import OrderedDict
 
 import jsonpatch
 import requests
@@ -7,23 +9,47 @@ import requests
 from dart.model.action import Action, ActionState
 from dart.model.dataset import Dataset
 from dart.model.datastore import Datastore
-from dart.model.engine import Engine, ActionContext
+from dart.model.engine import Engine, ActionContext, ActionBatchCheckin
 from dart.model.event import Event
-from dart.model.exception import DartRequestException
+from dart.model.exception import DartRequestException, DartTimeoutException
 from dart.model.graph import Graph, SubGraphDefinition
 from dart.model.query import Filter
 from dart.model.query import Operator
 from dart.model.subscription import Subscription, SubscriptionElementStats, SubscriptionState, SubscriptionElement
 from dart.model.trigger import Trigger, TriggerType
 from dart.model.workflow import Workflow, WorkflowInstance, WorkflowInstanceState
+from dart.util import json_util
+
+
+# how many long polls in a row may fail with a server error (e.g. a proxy that gave up on the poll) before the
+# await_* methods raise it
+_MAX_AWAIT_FAILURES = 5
+
+# the model classes of the entity types accepted by batch_get and batch_patch
+_ENTITY_MODEL_CLASSES = {
+    'action': Action,
+    'dataset': Dataset,
+    'datastore': Datastore,
+    'engine': Engine,
+    'event': Event,
+    'subgraph_definition': SubGraphDefinition,
+    'subscription': Subscription,
+    'trigger': Trigger,
+    'workflow': Workflow,
+    'workflow_instance': WorkflowInstance,
+}
 
 
 class Dart(object):
-    def __init__(self, host, port=80, api_version=1):
+    def __init__(self, host, port=80, api_version=1, etag_cache_size=100):
+        """ :param etag_cache_size: how many entity GET responses to keep, so that fetching one again (e.g. while
+                                     polling) sends If-None-Match and costs a 304 when it is unchanged """
         self._host = host
         self._port = port
         self._api_version = api_version
         self._base_url = 'http://%s:%s/api/%s' % (self._host, self._port, self._api_version)
+        self._etag_cache_size = etag_cache_size
+        self._etag_cache = OrderedDict()
 
     def save_engine(self, engine):
         """ :type engine: dart.model.engine.Engine
@@ -68,6 +94,13 @@ class Dart(object):
             :rtype: dict """
         return self._get_response_data('put', '/engine/action/%s/checkin' % action_id, data=action_result.to_dict())
 
+    def engine_action_batch_checkin(self, action_results, released_action_ids=None):
+        """ :type action_results: list[dart.model.engine.ActionBatchResult]
+            :type released_action_ids: list[str]
+            :rtype: dict """
+        data = ActionBatchCheckin(action_results, released_action_ids).to_dict()
+        return self._get_response_data('put', '/engine/action_batch/checkin', data=data)
+
     def delete_engine(self, engine_id):
         """ :type engine_id: str """
         self._get_response_data('delete', '/engine/%s' % engine_id)
@@ -124,12 +157,14 @@ class Dart(object):
         return jsonpatch.make_patch(model.to_dict(), updated_model_dict)
 
     def save_actions(self, actions, datastore_id=None, workflow_id=None):
-        """ :type actions: list[dart.model.action.Action]
+        """ :param actions: the actions to create.  The id of an action template (saved with workflow_id) only names
+                            it within this call, so that the other templates can list it in depends_on.
+            :type actions: list[dart.model.action.Action]
             :rtype: list[dart.model.action.Action] """
         # the ^ operator on two bool values is an xor
         assert bool(datastore_id) ^ bool(workflow_id), 'please pass either datastore_id or workflow_id'
         for a in actions:
-            assert not a.id, 'updating an action is not supported - action has id: %s' % a.id
+            assert workflow_id or not a.id, 'updating an action is not supported - action has id: %s' % a.id
 
         data = [a.to_dict() for a in actions]
         if datastore_id:
@@ -137,15 +172,14 @@ class Dart(object):
         if workflow_id:
             return self._request_list('post', '/workflow/%s/action' % workflow_id, data=data, model_class=Action)
 
-    def await_action_completion(self, action_id, timeout_seconds=2):
+    def await_action_completion(self, action_id, timeout_seconds=2, max_wait_seconds=24 * 60 * 60):
         """ :type action_id: str
+            :param timeout_seconds: how long to pause before retrying after a failed request
+            :param max_wait_seconds: how long to wait in all before raising a DartTimeoutException
             :rtype: dart.model.action.Action """
         finished_states = [ActionState.COMPLETED, ActionState.FAILED]
-        while True:
-            action = self.get_action(action_id)
-            if action.data.state in finished_states:
-                return action
-            time.sleep(timeout_seconds)
+        return self._await_change('/action/%s' % action_id, self.get_action(action_id), Action,
+                                  lambda a: a.data.state in finished_states, timeout_seconds, max_wait_seconds)
 
     def get_action(self, action_id):
         """ :type action_id: str
@@ -211,6 +245,7 @@ class Dart(object):
     def await_workflow_completion(self, workflow_id, num_instances=1, timeout_seconds=2):
         """ :type workflow_id: str
             :type num_instances: int
+            :param timeout_seconds: the least time to wait for a change before listing the instances again
             :rtype: list[dart.model.workflow.WorkflowInstance] """
         finished_states = [WorkflowInstanceState.COMPLETED, WorkflowInstanceState.FAILED]
         while True:
@@ -218,7 +253,8 @@ class Dart(object):
             num_finished = sum([1 for wfi in wfis if wfi.data.state in finished_states])
             if num_finished >= num_instances:
                 return wfis
-            time.sleep(timeout_seconds)
+            # a change made between the listing and the wait is only noticed when the wait times out
+            self.wait_for_state_change('workflow', workflow_id, timeout_seconds=max(timeout_seconds, 10))
 
     def get_workflow_instances(self, workflow_id):
         """ :type workflow_id: str
@@ -249,14 +285,15 @@ class Dart(object):
         p = self._get_patch(subscription, data_properties)
         return self._request('patch', '/subscription/%s' % subscription.id, data=p.patch, model_class=Subscription)
 
-    def await_subscription_generation(self, subscription_id, timeout_seconds=2):
+    def await_subscription_generation(self, subscription_id, timeout_seconds=2, max_wait_seconds=24 * 60 * 60):
         """ :type subscription_id: str
+            :param timeout_seconds: how long to pause before retrying after a failed request
+            :param max_wait_seconds: how long to wait in all before raising a DartTimeoutException
             :rtype: dart.model.subscription.Subscription """
-        while True:
-            subscription = self.get_subscription(subscription_id)
-            if subscription.data.state not in [SubscriptionState.QUEUED, SubscriptionState.GENERATING]:
-                return subscription
-            time.sleep(timeout_seconds)
+        generating_states = [SubscriptionState.QUEUED, SubscriptionState.GENERATING]
+        return self._await_change('/subscription/%s' % subscription_id, self.get_subscription(subscription_id),
+                                  Subscription, lambda s: s.data.state not in generating_states, timeout_seconds,
+                                  max_wait_seconds)
 
     def get_subscription(self, subscription_id):
         """ :type subscription_id: str
@@ -359,16 +396,98 @@ class Dart(object):
             :rtype: dart.model.graph.Graph """
         return self._request('get', '/graph/%s/%s' % (entity_type, entity_id), model_class=Graph)
 
+    def batch_get(self, entity_type, ids, include_archived=False):
+        """ fetches many entities of one type with a single request
+
+            :type entity_type: str
+            :type ids: list[str]
+            :return: the entities (or None for those not found), in the order of the given ids
+            :rtype: list """
+        model_class = _ENTITY_MODEL_CLASSES[entity_type]
+        params = {'include_archived': 'true'} if include_archived else None
+        results = self._get_response_data('post', '/%s/batch_get' % entity_type, data=ids, params=params)
+        return [model_class.from_dict(e) if e else None for e in results]
+
+    def batch_patch(self, entity_type, models_and_data_properties):
+        """ patches many entities of one type (action, event, subscription, trigger or workflow) in a single
+            request and transaction, e.g. batch_patch('action', [(action, {'tags': ['foo']}), ...])
+
+            :type entity_type: str
+            :type models_and_data_properties: list[(object, dict)]
+            :rtype: list """
+        model_class = _ENTITY_MODEL_CLASSES[entity_type]
+        data = [{'id': model.id, 'patch': self._get_patch(model, data_properties).patch}
+                for model, data_properties in models_and_data_properties]
+        return self._request_list('patch', '/%s/batch' % entity_type, data=data, model_class=model_class)
+
+    def wait_for_state_change(self, entity_type, entity_id, timeout_seconds=None):
+        """ waits (on the server) for the next change to an action, datastore, workflow, workflow_instance or
+            subscription, including changes to the actions, workflow instances, etc. that belong to it
+
+            :type entity_type: str
+            :type entity_id: str
+            :return: the change notification, or None if the server's wait timed out
+            :rtype: dict """
+        params = {'timeout_seconds': timeout_seconds} if timeout_seconds is not None else None
+        return self._get_response_data('get', '/state_change/%s/%s' % (entity_type, entity_id), params=params)
+
+    def _await_change(self, url_prefix, model, model_class, is_done, retry_seconds, max_wait_seconds):
+        """ long polls the entity (each poll returning once its version_id differs from the given model's, or when
+            the server's wait times out) until is_done(entity).  A poll already in progress when max_wait_seconds
+            pass is allowed to finish (see dart.state_change.long_poll_max_seconds). """
+        deadline = time.time() + max_wait_seconds
+        failures = 0
+        while not is_done(model):
+            if time.time() >= deadline:
+                raise DartTimeoutException('%s did not finish within %s seconds' % (url_prefix, max_wait_seconds))
+            try:
+                model = self._request('get', url_prefix, params={'wait_for_change_since': model.version_id},
+                                      model_class=model_class)
+                failures = 0
+            except DartRequestException as e:
+                # e.g. a proxy that gave up on the long poll
+                failures += 1
+                if e.response.status_code < 500 or failures >= _MAX_AWAIT_FAILURES:
+                    raise
+                time.sleep(retry_seconds)
+        return model
+
     def _get_response_data(self, method, url_prefix, data=None, params=None):
-        response = requests.request(method, self._base_url + '/' + url_prefix.lstrip('/'), json=data, params=params)
+        url = self._base_url + '/' + url_prefix.lstrip('/')
+        if method == 'get' and not params and self._etag_cache_size:
+            return self._get_response_data_with_etag(url)
+        body = json_util.dumps(data) if data is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else None
+        response = requests.request(method, url, data=body, headers=headers, params=params)
         try:
-            data = response.json()
+            data = json_util.loads(response.content)
             if data['results'] == 'ERROR':
                 raise
             return data['results']
         except:
             raise DartRequestException(response)
 
+    def _get_response_data_with_etag(self, url):
+        cached = self._etag_cache.pop(url, None)
+        headers = {'If-None-Match': cached[0]} if cached else None
+        response = requests.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            self._etag_cache[url] = cached
+            return copy.deepcopy(cached[1])
+        try:
+            data = json_util.loads(response.content)
+            if data['results'] == 'ERROR':
+                raise
+        except:
+            raise DartRequestException(response)
+        etag = response.headers.get('ETag')
+        if etag:
+            self._etag_cache[url] = (etag, data['results'])
+            if len(self._etag_cache) > self._etag_cache_size:
+                self._etag_cache.popitem(last=False)
+            return copy.deepcopy(data['results'])
+        return data['results']
+
     def _request(self, method, url_prefix=None, data=None, params=None, model_class=None):
         response_data = self._get_response_data(method, url_prefix, data, params)
         return model_class.from_dict(response_data)
@@ -5,6 +5,8 @@ from pydoc import locate
 import pinject
 
 from dart.context.locator import find_injectable_classes
+from dart.util.json_util import configure_json_codec
+from dart.util.rand import configure_id_generator
 from dart.util.strings import to_snake_case
 
 _logger = logging.getLogger(__name__)
@@ -13,6 +15,8 @@ _logger = logging.getLogger(__name__)
 class AppContext(object):
     def __init__(self, config, exclude_injectable_module_paths):
         self.config = config
+        configure_id_generator(config['dart'].get('id_generator', 'time_ordered'))
+        configure_json_codec(config['dart'].get('json_codec', 'json'))
         self._instance_bindings = {
             o['name']: locate(o['path'])(**(o.get('options', {}))) for o in config['dart'].get('app_context', [])
         }
@@ -0,0 +1,51 @@
+import logging
+import traceback
+
+from dart.model.action import OnFailure
+from dart.model.engine import ActionResultState, ActionResult, ActionBatchResult
+from dart.model.exception import DartRequestException
+
+_logger = logging.getLogger(__name__)
+
+
+def run_action_batch(engine, action_ids, action_handlers):
+    """ runs a batch of actions that the engine worker handed to a single engine task (see DART_ACTION_IDS), in
+        order.  Each action is checked out (moving it to RUNNING) just before it runs and checked in as soon as it
+        finishes, so the rest of the batch stays PENDING in the meantime.  If an action fails and its on_failure is
+        DEACTIVATE, the actions after it are released (back to HAS_NEVER_RUN) rather than run, which is where they
+        would have been left had they not been batched.
+
+        :param engine: the engine instance, which has a dart client and is passed on to the action handlers
+        :type action_ids: list[str]
+        :param action_handlers: the engine's handlers by action type name, each called with (engine, datastore,
+                                action) and raising to fail the action
+        :type action_handlers: dict[str, function] """
+    dart = engine.dart
+    for i, action_id in enumerate(action_ids):
+        try:
+            action_context = dart.engine_action_checkout(action_id)
+        except DartRequestException:
+            # the action is no longer PENDING, e.g. it was deleted after the batch was handed out
+            _logger.warn('skipping batched action (id=%s) that could not be checked out' % action_id)
+            continue
+
+        action = action_context.action
+        state = ActionResultState.SUCCESS
+        error_message = None
+        try:
+            action_type_name = action.data.action_type_name
+            _logger.info('running batched action %s of %s (id=%s)' % (i + 1, len(action_ids), action.id))
+            assert action_type_name in action_handlers, 'unsupported action: %s' % action_type_name
+            action_handlers[action_type_name](engine, action_context.datastore, action)
+
+        except Exception as e:
+            state = ActionResultState.FAILURE
+            error_message = e.message + '\n\n\n' + traceback.format_exc()
+
+        released_action_ids = []
+        if state == ActionResultState.FAILURE and action.data.on_failure == OnFailure.DEACTIVATE:
+            released_action_ids = action_ids[i + 1:]
+        action_result = ActionBatchResult(action.id, ActionResult(state, error_message))
+        dart.engine_action_batch_checkin([action_result], released_action_ids)
+        if released_action_ids:
+            return
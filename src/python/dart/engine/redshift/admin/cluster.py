@@ -123,8 +123,17 @@ class RedshiftCluster(object):
         return self.redshift_engine.secrets.get(self.password_key)
 
     def get_db_connection(self):
-        self.wait_for_cluster_available()
-        return self.get_db_engine().connect()
+        db_engines = getattr(self.redshift_engine, 'db_engines', None)
+        if db_engines is None:
+            self.wait_for_cluster_available()
+            return self.get_db_engine().connect()
+
+        db_engine = db_engines.get(self.cluster_identifier)
+        if not db_engine:
+            self.wait_for_cluster_available()
+            db_engine = self.get_db_engine()
+            db_engines[self.cluster_identifier] = db_engine
+        return db_engine.connect()
 
     @retry(wait_fixed=10000, stop_max_attempt_number=7, retry_on_exception=_retry_waiter_error)
     def wait_for_cluster_available(self):
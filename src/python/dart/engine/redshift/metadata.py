@@ -32,6 +32,7 @@ class RedshiftActionTypes(object):
     )
     execute_sql = ActionType(
         name='execute_sql',
+        batchable=True,
         description='Executes a user defined SQL script',
         params_json_schema={
             'type': 'object',
@@ -155,6 +156,7 @@ class RedshiftActionTypes(object):
     )
     data_check = ActionType(
         name='data_check',
+        batchable=True,
         description='Executes a user defined, SQL data check',
         params_json_schema={
             'type': 'object',
@@ -4,6 +4,7 @@ import random
 import traceback
 
 from dart.client.python.dart_client import Dart
+from dart.engine.batch import run_action_batch
 from dart.engine.redshift.actions.data_check import data_check
 from dart.engine.redshift.actions.copy_to_s3 import copy_to_s3
 from dart.engine.redshift.actions.consume_subscription import consume_subscription
@@ -43,11 +44,17 @@ class RedshiftEngine(object):
         self.cluster_tags = cluster_tags
         self.region = region
         self.secrets = Secrets(kms_key_arn, secrets_s3_path)
+        # sqlalchemy engines by cluster identifier, so that batched actions share the cluster lookup and connections
+        self.db_engines = {}
 
     def random_availability_zone(self):
         return self.availability_zones[random.randint(0, len(self.availability_zones) - 1)]
 
     def run(self):
+        if os.environ.get('DART_ACTION_IDS'):
+            run_action_batch(self, os.environ['DART_ACTION_IDS'].split(','), self._action_handlers)
+            return
+
         action_context = self.dart.engine_action_checkout(os.environ.get('DART_ACTION_ID'))
         action = action_context.action
         datastore = action_context.datastore
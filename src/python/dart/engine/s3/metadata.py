@@ -8,6 +8,7 @@ _logger = logging.getLogger(__name__)
 class S3ActionTypes(object):
     copy = ActionType(
         name='copy',
+        batchable=True,
         description='Accomplishes s3 source to s3 destination copy, giving the destination bucket owner full control',
         params_json_schema={
             'type': 'object',
@@ -23,6 +24,7 @@ class S3ActionTypes(object):
 
     data_check = ActionType(
         name='data_check',
+        batchable=True,
         description='A data check that passes if an s3 key/file exists that matches the specified requirements',
         params_json_schema={
             'type': 'object',
@@ -3,6 +3,7 @@ import os
 import traceback
 
 from dart.client.python.dart_client import Dart
+from dart.engine.batch import run_action_batch
 from dart.engine.s3.actions.copy import copy
 from dart.engine.s3.actions.data_check import data_check
 from dart.engine.s3.metadata import S3ActionTypes
@@ -22,6 +23,10 @@ class S3Engine(object):
         }
 
     def run(self):
+        if os.environ.get('DART_ACTION_IDS'):
+            run_action_batch(self, os.environ['DART_ACTION_IDS'].split(','), self._action_handlers)
+            return
+
         action_context = self.dart.engine_action_checkout(os.environ.get('DART_ACTION_ID'))
         action = action_context.action
         datastore = action_context.datastore
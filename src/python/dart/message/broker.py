@@ -1,6 +1,5 @@
 from abc import abstractmethod
 import base64
-import json
 import logging
 from pydoc import locate
 import random
@@ -9,6 +8,7 @@ from boto.sqs.connection import SQSConnection
 from boto.sqs.jsonmessage import JSONMessage
 from dart.model.message import MessageState
 from dart.service.message import MessageService
+from dart.util import json_util
 
 
 _logger = logging.getLogger(__name__)
@@ -21,10 +21,12 @@ class MessageBroker(object):
         raise NotImplementedError
 
     @abstractmethod
-    def send_message(self, message):
+    def send_message(self, message, delay_seconds=None):
         """
         :param message: the message to send
         :type message: dict
+        :param delay_seconds: when set, the message will not be delivered until this many seconds have passed
+        :type delay_seconds: int
         """
         raise NotImplementedError
 
@@ -36,6 +38,20 @@ class MessageBroker(object):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def receive_messages(self, handler, batch_handler, is_batchable, max_messages):
+        """
+        :param handler: callback function that handles one message, as for receive_message
+        :type handler: function[str, dict, bool]
+        :param batch_handler: callback function that handles all received batchable messages at once
+        :type batch_handler: function[list[(str, dict, bool)]]
+        :param is_batchable: whether a message is handled by batch_handler rather than by handler
+        :type is_batchable: function[dict]
+        :param max_messages: the maximum number of messages to receive in one call
+        :type max_messages: int
+        """
+        raise NotImplementedError
+
 
 class SqsJsonMessageBroker(MessageBroker):
     def __init__(self, queue_name, aws_access_key_id=None, aws_secret_access_key=None, region='us-east-1',
@@ -54,44 +70,91 @@ class SqsJsonMessageBroker(MessageBroker):
     def set_app_context(self, app_context):
         self._message_service = app_context.get(MessageService)
 
-    def send_message(self, message):
+    def send_message(self, message, delay_seconds=None):
         # dart always uses the JSONMessage format
-        self.queue.write(JSONMessage(self.queue, message))
+        self.queue.write(JSONMessage(self.queue, message), delay_seconds=delay_seconds)
 
     def receive_message(self, handler, wait_time_seconds=20):
-        # randomly purge old messages
-        if random.randint(0, 100) < 1:
-            self._message_service.purge_old_messages()
+        self._maybe_purge_old_messages()
 
         sqs_message = self.queue.read(wait_time_seconds=wait_time_seconds)
         if not sqs_message:
             return
 
+        self._handle_message(handler, sqs_message)
+
+    def receive_messages(self, handler, batch_handler, is_batchable, max_messages=10, wait_time_seconds=20):
+        self._maybe_purge_old_messages()
+
+        # SQS will not return more than 10 messages per receive
+        sqs_messages = self.queue.get_messages(num_messages=min(max_messages, 10), wait_time_seconds=wait_time_seconds)
+        if not sqs_messages:
+            return
+
+        # batchable messages are quick to handle together.  the others are each begun (marked RUNNING) only when
+        # their turn comes, so that none of them waits past its visibility timeout (and is redelivered) while the
+        # messages before it are handled
+        batchable = [is_batchable(self._get_body(sqs_message)) for sqs_message in sqs_messages]
+        batch = []
+        for sqs_message in [m for m, b in zip(sqs_messages, batchable) if b]:
+            received = self._begin_message(sqs_message)
+            if received:
+                batch.append((sqs_message, received))
+        if batch:
+            batch_handler([(sqs_message.id, body, previous_failed) for sqs_message, (m, body, previous_failed, s)
+                           in batch])
+            for sqs_message, (message, sqs_message_body, previous_handler_failed, result_state) in batch:
+                self._complete_message(sqs_message, message, result_state)
+
+        for sqs_message in [m for m, b in zip(sqs_messages, batchable) if not b]:
+            self._handle_message(handler, sqs_message)
+
+    def _handle_message(self, handler, sqs_message):
+        received = self._begin_message(sqs_message)
+        if not received:
+            return
+
+        message, sqs_message_body, previous_handler_failed, result_state = received
+        handler(sqs_message.id, sqs_message_body, previous_handler_failed)
+        self._complete_message(sqs_message, message, result_state)
+
+    def _maybe_purge_old_messages(self):
+        # randomly purge old messages
+        if random.randint(0, 100) < 1:
+            self._message_service.purge_old_messages()
+
+    def _begin_message(self, sqs_message):
+        """ records the message as RUNNING, returning None if the message should not be handled right now
+
+            :rtype: (dart.model.message.Message, dict, bool, str) """
         sqs_message_body = self._get_body(sqs_message)
         message = self._message_service.get_message(sqs_message.id, raise_when_missing=False)
         previous_handler_failed = False
         result_state = MessageState.COMPLETED
         if not message:
-            message = self._message_service.save_message(sqs_message.id, json.dumps(sqs_message_body), MessageState.RUNNING)
+            message = self._message_service.save_message(sqs_message.id, json_util.dumps(sqs_message_body),
+                                                         MessageState.RUNNING)
 
         elif message:
             if message.state in [MessageState.COMPLETED, MessageState.FAILED]:
                 _logger.warn('bailing on sqs message with id=%s because it was redelivered' % sqs_message.id)
                 self.queue.delete_message(sqs_message)
-                return
+                return None
 
             if message.state in [MessageState.RUNNING]:
                 # the DB says its running, but is it REALLY running?
                 ecs_task_status = self._message_service.get_ecs_task_status(message)
                 if ecs_task_status == 'RUNNING':
                     # ok, it was really running.  return and let the visibility timeout resend the message later
-                    return
+                    return None
                 if not ecs_task_status or ecs_task_status == 'STOPPED':
                     # it seems the container was lost, so mark this message as failed
                     previous_handler_failed = True
                     result_state = MessageState.FAILED
 
-        handler(sqs_message.id, sqs_message_body, previous_handler_failed)
+        return message, sqs_message_body, previous_handler_failed, result_state
+
+    def _complete_message(self, sqs_message, message, result_state):
         self._message_service.update_message_state(message, result_state)
         self.queue.delete_message(sqs_message)
 
@@ -102,10 +165,10 @@ class SqsJsonMessageBroker(MessageBroker):
         try:
             # dart's messages are decoded like JSONMessage
             value = base64.b64decode(message.get_body().encode('utf-8')).decode('utf-8')
-            value = json.loads(value)
+            value = json_util.loads(value)
         except:
             # s3 event notifications are raw
-            value = json.loads(message.get_body())
+            value = json_util.loads(message.get_body())
         return value
 
     @property
@@ -2,6 +2,7 @@ class TriggerCall(object):
     PROCESS_TRIGGER = 'PROCESS_TRIGGER'
     TRY_NEXT_ACTION = 'TRY_NEXT_ACTION'
     COMPLETE_ACTION = 'COMPLETE_ACTION'
+    CASCADE_DELETE = 'CASCADE_DELETE'
 
 
 class SubscriptionCall(object):
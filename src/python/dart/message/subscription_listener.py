@@ -3,6 +3,7 @@ import logging
 import traceback
 import urllib
 
+from dart.context.database import db
 from dart.context.locator import injectable
 from dart.message.call import SubscriptionCall
 from dart.model.subscription import SubscriptionState
@@ -14,54 +15,85 @@ _logger = logging.getLogger(__name__)
 @injectable
 class SubscriptionListener(object):
     def __init__(self, subscription_broker, subscription_service, subscription_element_service, trigger_service,
-                 subscription_batch_trigger_processor, emailer):
+                 subscription_batch_trigger_processor, emailer, subscription_matcher, dart_config):
         self._subscription_broker = subscription_broker
         self._subscription_service = subscription_service
+        self._subscription_matcher = subscription_matcher
         self._subscription_element_service = subscription_element_service
         self._trigger_service = trigger_service
         self._subscription_batch_trigger_processor = subscription_batch_trigger_processor
         self._emailer = emailer
+        self._max_messages = dart_config.get('subscriptions', {}).get('max_messages_per_receive', 10)
         self._handlers = {
             SubscriptionCall.GENERATE: self._handle_create_subscription_call
         }
 
     def await_call(self, wait_time_seconds=20):
-        self._subscription_broker.receive_message(self._handle_call, wait_time_seconds)
+        # s3 events from all received messages are handled together (and first, since subscription generation can
+        # take a while), everything else is handled one message at a time
+        self._subscription_broker.receive_messages(self._handle_call, self._handle_s3_event_batch, _is_s3_event,
+                                                   self._max_messages, wait_time_seconds)
+
+    def _handle_s3_event_batch(self, messages):
+        """ :type messages: list[(str, dict, bool)] """
+        try:
+            self._handle_s3_events([message for message_id, message, previous_handler_failed in messages])
+        except Exception:
+            # e.g. a malformed message, so each message is handled on its own and only the bad ones are lost
+            _logger.error(json.dumps(traceback.format_exc()))
+            db.session.rollback()
+            for message_id, message, previous_handler_failed in messages:
+                self._handle_call(message_id, message, previous_handler_failed)
 
     def _handle_call(self, message_id, message, previous_handler_failed):
-        if 'Subject' in message and message['Subject'] == 'Amazon S3 Notification':
-            handler = self._handle_s3_event
-        else:
-            call = message['call']
-            if call not in self._handlers:
-                raise Exception('no handler defined for call: %s' % call)
-            handler = self._handlers[call]
+        # an error (e.g. an unknown call) is logged rather than raised, so that the rest of the received messages
+        # are still handled
         try:
+            if _is_s3_event(message):
+                handler = self._handle_s3_event
+            else:
+                call = message['call']
+                if call not in self._handlers:
+                    raise Exception('no handler defined for call: %s' % call)
+                handler = self._handlers[call]
             handler(message_id, message, previous_handler_failed)
         except Exception:
             _logger.error(json.dumps(traceback.format_exc()))
+            db.session.rollback()
 
     # message_id and previous_handler_failed are unused because the conditional insert makes this funciton idempotent
     # noinspection PyUnusedLocal
     def _handle_s3_event(self, message_id, message, previous_handler_failed):
         """ :type message: dict """
+        self._handle_s3_events([message])
+
+    def _handle_s3_events(self, messages):
+        """ :type messages: list[dict] """
 
         # Helpful data to help understand this function:
         #
         #     - http://docs.aws.amazon.com/AmazonS3/latest/dev/notification-content-structure.html
         #     - dart/tools/sample-s3event_sqs-message.json
         #
-        for record in json.loads(message['Message'])['Records']:
-            if not record['eventName'].startswith('ObjectCreated:'):
-                continue
-            s3_path = 's3://' + record['s3']['bucket']['name'] + '/' + urllib.unquote(record['s3']['object']['key'])
-            size = record['s3']['object']['size']
-            for subscription in self._subscription_service.find_matching_subscriptions(s3_path):
-                success = self._subscription_element_service.conditional_insert_subscription_element(
-                    subscription, s3_path, size
-                )
-                if success:
-                    self._trigger_service.evaluate_subscription_triggers(subscription)
+        subscriptions_by_id = {}
+        elements = []
+        for message in messages:
+            for record in json.loads(message['Message'])['Records']:
+                if not record['eventName'].startswith('ObjectCreated:'):
+                    continue
+                key = urllib.unquote(record['s3']['object']['key'])
+                s3_path = 's3://' + record['s3']['bucket']['name'] + '/' + key
+                size = record['s3']['object']['size']
+                for subscription in self._subscription_matcher.find_matching_subscriptions(s3_path):
+                    subscriptions_by_id[subscription.id] = subscription
+                    elements.append((subscription.id, s3_path, size))
+
+        if not elements:
+            return
+
+        inserted_counts = self._subscription_element_service.conditional_insert_subscription_elements(elements)
+        for subscription_id in inserted_counts:
+            self._trigger_service.evaluate_subscription_triggers(subscriptions_by_id[subscription_id])
 
     def _handle_create_subscription_call(self, message_id, message, previous_handler_failed):
         subscription = self._subscription_service.get_subscription(message['subscription_id'])
@@ -70,8 +102,15 @@ class SubscriptionListener(object):
         if previous_handler_failed:
             self._subscription_service.update_subscription_state(subscription, SubscriptionState.FAILED)
             self._emailer.send_subscription_failed_email(subscription)
+            db.session.commit()
             return
 
         self._subscription_element_service.generate_subscription_elements(subscription)
+        self._subscription_matcher.invalidate()
         self._trigger_service.evaluate_subscription_triggers(subscription)
         self._emailer.send_subscription_completed_email(subscription)
+        db.session.commit()
+
+
+def _is_s3_event(message):
+    return 'Subject' in message and message['Subject'] == 'Amazon S3 Notification'
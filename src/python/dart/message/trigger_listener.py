@@ -2,10 +2,14 @@ import json
 import logging
 import traceback
 
+from sqlalchemy.orm.exc import StaleDataError
+
+from dart.context.database import db
 from dart.context.locator import injectable
 from dart.message.call import TriggerCall
 from dart.model.action import ActionState, OnFailure as ActionOnFailure, Action
 from dart.model.datastore import DatastoreState
+from dart.model.exception import DartConditionalUpdateFailedException
 from dart.model.query import Filter, Operator
 from dart.model.workflow import WorkflowInstanceState, WorkflowState, OnFailure as WorkflowOnFailure
 from dart.trigger.subscription import subscription_batch_trigger
@@ -17,7 +21,7 @@ _logger = logging.getLogger(__name__)
 @injectable
 class TriggerListener(object):
     def __init__(self, trigger_broker, trigger_proxy, trigger_service, action_service, datastore_service,
-                 workflow_service, emailer, subscription_element_service):
+                 workflow_service, emailer, subscription_element_service, cascade_delete_service):
         self._trigger_broker = trigger_broker
         self._trigger_proxy = trigger_proxy
         self._trigger_service = trigger_service
@@ -26,10 +30,12 @@ class TriggerListener(object):
         self._workflow_service = workflow_service
         self._emailer = emailer
         self._subscription_element_service = subscription_element_service
+        self._cascade_delete_service = cascade_delete_service
         self._handlers = {
             TriggerCall.PROCESS_TRIGGER: self._handle_process_trigger,
             TriggerCall.TRY_NEXT_ACTION: self._handle_try_next_action,
             TriggerCall.COMPLETE_ACTION: self._handle_complete_action,
+            TriggerCall.CASCADE_DELETE: self._handle_cascade_delete,
         }
         self._trigger_processors = {
             name: p.evaluate_message for name, p in trigger_service.trigger_processors().iteritems()
@@ -74,22 +80,46 @@ class TriggerListener(object):
             return
 
         datastore = self._datastore_service.get_datastore(message['datastore_id'])
-        running_or_queued_workflow_ids = self._action_service.find_running_or_queued_action_workflow_ids(datastore.id)
-        exists_non_workflow_action = self._action_service.exists_running_or_queued_non_workflow_action(datastore.id)
-        next_action = self._action_service.find_next_runnable_action(
-            datastore_id=datastore.id,
-            not_in_workflow_ids=running_or_queued_workflow_ids,
-            ensure_workflow_action=exists_non_workflow_action
-        )
-        if not next_action:
-            _logger.info('datastore (id=%s) has no actions that can be run at this time' % datastore.id)
+        # QUEUED actions count against the datastore's concurrency here (the engine worker only counts PENDING,
+        # RUNNING and FINISHING ones), so that concurrent calls cannot queue more actions than the datastore can
+        # run.  Unlike before depends_on, actions beyond that wait as HAS_NEVER_RUN rather than QUEUED.
+        states = [ActionState.QUEUED, ActionState.PENDING, ActionState.RUNNING, ActionState.FINISHING]
+        available_slots = datastore.data.concurrency - self._action_service.find_action_count(datastore.id, states)
+        if available_slots <= 0:
+            _logger.info('datastore (id=%s) has reached max concurrency' % datastore.id)
             return
 
-        assert isinstance(next_action, Action)
-        if next_action.data.action_type_name == 'consume_subscription':
-            self._subscription_element_service.assign_subscription_elements(next_action)
+        runnable_actions = self._action_service.find_runnable_actions(datastore.id, available_slots)
+        if not runnable_actions:
+            _logger.info('datastore (id=%s) has no actions that can be run at this time' % datastore.id)
+            return
 
-        self._action_service.update_action_state(next_action, ActionState.QUEUED, next_action.data.error_message)
+        for next_action in runnable_actions:
+            assert isinstance(next_action, Action)
+            try:
+                # subscription elements are assigned in the same transaction as the action is queued, so that they
+                # are only taken if this worker is the one that queues it
+                if next_action.data.action_type_name == 'consume_subscription':
+                    self._subscription_element_service.assign_subscription_elements(next_action, commit=False)
+
+                # conditional, in case another trigger worker queued it first
+                self._action_service.update_action_state(
+                    next_action, ActionState.QUEUED, next_action.data.error_message,
+                    conditional=lambda a: a.data.state == ActionState.HAS_NEVER_RUN,
+                    commit=False
+                )
+                db.session.commit()
+            except (DartConditionalUpdateFailedException, StaleDataError):
+                db.session.rollback()
+                continue
+            except Exception:
+                db.session.rollback()
+                raise
+
+    # the delete is idempotent, so it is simply run again when a previous handler failed
+    # noinspection PyUnusedLocal
+    def _handle_cascade_delete(self, message_id, message, previous_handler_failed):
+        self._cascade_delete_service.delete(message['delete_name'], message['entity_id'])
 
     def _handle_complete_action(self, message_id, message, previous_handler_failed):
         if previous_handler_failed:
@@ -127,24 +157,32 @@ class TriggerListener(object):
                     else:
                         self._datastore_service.update_datastore_state(datastore, DatastoreState.INACTIVE)
                 else:
-                    if wfi and action.data.last_in_workflow:
+                    if wfi and self._action_service.all_workflow_instance_actions_finished(wfi.id):
                         self._handle_complete_workflow(callbacks, wf, wfi, wfid)
 
             elif state == ActionState.COMPLETED:
                 if action.data.on_success_email:
                     callbacks.append(lambda: self._emailer.send_action_completed_email(action, datastore))
-                if wfi and action.data.last_in_workflow:
+                if wfi and self._action_service.all_workflow_instance_actions_finished(wfi.id):
                     self._handle_complete_workflow(callbacks, wf, wfi, wfid)
 
         finally:
             for f in callbacks:
                 f()
+            db.session.commit()
 
         if try_next_action:
             self._trigger_proxy.try_next_action(datastore.id)
 
     def _handle_complete_workflow(self, callbacks, wf, wfi, wfid):
-        self._workflow_service.update_workflow_instance_state(wfi, WorkflowInstanceState.COMPLETED)
+        # with parallel branches, the last two actions of an instance can finish at the same time
+        finished_states = [WorkflowInstanceState.COMPLETED, WorkflowInstanceState.FAILED]
+        try:
+            self._workflow_service.update_workflow_instance_state(
+                wfi, WorkflowInstanceState.COMPLETED, conditional=lambda i: i.data.state not in finished_states
+            )
+        except DartConditionalUpdateFailedException:
+            return
         self._trigger_proxy.trigger_workflow_completion(wfid)
         self._trigger_subscription_evaluations(wfi.data.trigger_id)
         if wf.data.on_success_email:
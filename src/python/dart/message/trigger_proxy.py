@@ -10,11 +10,11 @@ class TriggerProxy(object):
     def __init__(self, trigger_broker):
         self._trigger_broker = trigger_broker
 
-    def process_trigger(self, trigger_type, message):
+    def process_trigger(self, trigger_type, message, delay_seconds=None):
         """ :type trigger_type: dart.model.trigger.TriggerType
             :type message: dict """
         args = {'call': TriggerCall.PROCESS_TRIGGER, 'trigger_type_name': trigger_type.name, 'message': message}
-        self._trigger_broker.send_message(args)
+        self._trigger_broker.send_message(args, delay_seconds)
 
     def try_next_action(self, datastore_id):
         args = {'call': TriggerCall.TRY_NEXT_ACTION, 'datastore_id': datastore_id}
@@ -25,11 +25,15 @@ class TriggerProxy(object):
                 'error_message': error_message}
         self._trigger_broker.send_message(args)
 
+    def cascade_delete(self, delete_name, entity_id):
+        args = {'call': TriggerCall.CASCADE_DELETE, 'delete_name': delete_name, 'entity_id': entity_id}
+        self._trigger_broker.send_message(args)
+
     def trigger_workflow_completion(self, workflow_id):
         self.process_trigger(workflow_completion_trigger, {'workflow_id': workflow_id})
 
-    def trigger_subscription_evaluation(self, trigger_id):
-        self.process_trigger(subscription_batch_trigger, {'trigger_id': trigger_id})
+    def trigger_subscription_evaluation(self, trigger_id, delay_seconds=None):
+        self.process_trigger(subscription_batch_trigger, {'trigger_id': trigger_id}, delay_seconds)
 
     def super_trigger_evaluation(self, trigger_id):
         self.process_trigger(super_trigger, {'trigger_id': trigger_id})
@@ -3,15 +3,18 @@ from dart.model.base import BaseModel, dictable
 
 @dictable
 class ActionType(BaseModel):
-    def __init__(self, name, description=None, params_json_schema=None):
+    def __init__(self, name, description=None, params_json_schema=None, batchable=False):
         """
         :type name: str
         :type description: str
         :type params_json_schema: dict
+        :type batchable: bool
         """
         self.name = name
         self.description = description
         self.params_json_schema = params_json_schema
+        # whether a contiguous run of actions of this type can be handed to a single engine task
+        self.batchable = batchable
 
 
 @dictable
@@ -47,6 +50,12 @@ class ActionState(object):
         return [ActionState.HAS_NEVER_RUN, ActionState.QUEUED, ActionState.PENDING, ActionState.RUNNING,
                 ActionState.FINISHING, ActionState.COMPLETED, ActionState.FAILED, ActionState.TEMPLATE]
 
+    @staticmethod
+    def finished():
+        # a FAILED action only lets the actions depending on it run when its on_failure is CONTINUE, since otherwise
+        # the remaining actions of its workflow instance are SKIPPED
+        return [ActionState.COMPLETED, ActionState.FAILED, ActionState.SKIPPED]
+
 
 class OnFailure(object):
     DEACTIVATE = 'DEACTIVATE'
@@ -63,7 +72,7 @@ class ActionData(BaseModel):
                  end_time=None, progress=None, order_idx=None, error_message=None, on_failure=OnFailure.DEACTIVATE,
                  on_failure_email=None, on_success_email=None, engine_name=None, datastore_id=None, workflow_id=None,
                  workflow_instance_id=None, workflow_action_id=None, first_in_workflow=False, last_in_workflow=False,
-                 ecs_task_arn=None, extra_data=None, tags=None, user_id='anonymous'):
+                 depends_on=None, ecs_task_arn=None, extra_data=None, tags=None, user_id='anonymous'):
         """
         :type name: str
         :type action_type_name: str
@@ -86,6 +95,7 @@ class ActionData(BaseModel):
         :type workflow_action_id: str
         :type first_in_workflow: bool
         :type last_in_workflow: bool
+        :type depends_on: list[str]
         :type ecs_task_arn: str
         :type extra_data: dict
         """
@@ -109,6 +119,7 @@ class ActionData(BaseModel):
         self.workflow_action_id = workflow_action_id
         self.first_in_workflow = first_in_workflow
         self.last_in_workflow = last_in_workflow
+        self.depends_on = depends_on
         self.ecs_task_arn = ecs_task_arn
         self.extra_data = extra_data
         self.tags = tags or []
@@ -0,0 +1,29 @@
+from dart.model.base import BaseModel, dictable
+
+
+class CacheVersions(object):
+    TRIGGERS = 'TRIGGERS'
+    ENGINES = 'ENGINES'
+
+    @staticmethod
+    def all():
+        return [CacheVersions.TRIGGERS, CacheVersions.ENGINES]
+
+
+@dictable
+class CacheVersion(BaseModel):
+    def __init__(self, id, version_id, created, updated, name, version):
+        """
+        :type id: str
+        :type version_id: int
+        :type created: datetime.datetime
+        :type updated: datetime.datetime
+        :type name: str
+        :type version: long
+        """
+        self.id = id
+        self.version_id = version_id
+        self.created = created
+        self.updated = updated
+        self.name = name
+        self.version = version
@@ -0,0 +1,42 @@
+from dart.model.base import BaseModel, dictable
+
+
+class OutboxEmailState(object):
+    PENDING = 'PENDING'
+    SENDING = 'SENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+
+
+@dictable
+class OutboxEmail(BaseModel):
+    def __init__(self, id, version_id, created, updated, subject, body, to_addresses, cc_addresses, digest_key, state,
+                 attempts, next_attempt, error_message=None):
+        """
+        :type id: str
+        :type version_id: int
+        :type created: datetime.datetime
+        :type updated: datetime.datetime
+        :type subject: str
+        :type body: str
+        :type to_addresses: list[str]
+        :type cc_addresses: list[str]
+        :type digest_key: str
+        :type state: str
+        :type attempts: int
+        :type next_attempt: datetime.datetime
+        :type error_message: str
+        """
+        self.id = id
+        self.version_id = version_id
+        self.created = created
+        self.updated = updated
+        self.subject = subject
+        self.body = body
+        self.to_addresses = to_addresses
+        self.cc_addresses = cc_addresses
+        self.digest_key = digest_key
+        self.state = state
+        self.attempts = attempts
+        self.next_attempt = next_attempt
+        self.error_message = error_message
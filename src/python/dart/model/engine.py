@@ -83,3 +83,25 @@ class ActionResult(BaseModel):
         self.state = state
         self.error_message = error_message
         self.consume_subscription_state = consume_subscription_state
+
+
+@dictable
+class ActionBatchResult(BaseModel):
+    def __init__(self, action_id=None, result=None):
+        """
+        :type action_id: str
+        :type result: dart.model.engine.ActionResult
+        """
+        self.action_id = action_id
+        self.result = result
+
+
+@dictable
+class ActionBatchCheckin(BaseModel):
+    def __init__(self, action_results=None, released_action_ids=None):
+        """
+        :type action_results: list[dart.model.engine.ActionBatchResult]
+        :type released_action_ids: list[str]
+        """
+        self.action_results = action_results or []
+        self.released_action_ids = released_action_ids or []
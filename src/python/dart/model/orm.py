@@ -1,14 +1,14 @@
-import json
-
 from flask.ext.jsontools import JsonSerializableBase
-from sqlalchemy import BigInteger, Column, Integer, TIMESTAMP, String, Text
+from sqlalchemy import BigInteger, Column, Index, Integer, TIMESTAMP, String, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from dart.model.action import Action
 from dart.model.accounting import Accounting
+from dart.model.cache_version import CacheVersion
 
 from dart.model.dataset import Dataset
 from dart.model.datastore import Datastore
-from dart.context.database import db
+from dart.model.email import OutboxEmail
+from dart.context.database import db, config
 from dart.model.engine import Engine
 from dart.model.event import Event
 from dart.model.graph import SubGraphDefinition
@@ -17,7 +17,7 @@ from dart.model.mutex import Mutex
 from dart.model.subscription import Subscription, SubscriptionElement
 from dart.model.trigger import Trigger
 from dart.model.workflow import Workflow, WorkflowInstance
-from dart.util.json_util import DartJsonEncoder
+from dart.util.json_util import to_jsonable
 
 
 class VersionedAuditableSerializable(JsonSerializableBase):
@@ -29,7 +29,7 @@ class VersionedAuditableSerializable(JsonSerializableBase):
     __modelclass__ = None
 
     def to_model(self):
-        return self.__modelclass__.from_dict(json.loads(json.dumps(self, cls=DartJsonEncoder)))
+        return self.__modelclass__.from_dict(to_jsonable(self))
 
 
 class VersionedAuditableData(VersionedAuditableSerializable):
@@ -58,6 +58,25 @@ class ActionDao(db.Model, VersionedAuditableData):
     __modelclass__ = Action
 
 
+class ActionArchiveDao(db.Model, VersionedAuditableData):
+    __tablename__ = 'action_archive'
+    __modelclass__ = Action
+
+
+class ActionPayloadColumns(VersionedAuditableSerializable):
+    """ the bulky, rarely read parts of action data, keyed by action id (see dart.service.action) """
+    extra_data = Column(JSONB)
+    error_message = Column(Text())
+
+
+class ActionPayloadDao(db.Model, ActionPayloadColumns):
+    __tablename__ = 'action_payload'
+
+
+class ActionPayloadArchiveDao(db.Model, ActionPayloadColumns):
+    __tablename__ = 'action_payload_archive'
+
+
 class DatastoreDao(db.Model, VersionedAuditableData):
     __tablename__ = 'datastore'
     __modelclass__ = Datastore
@@ -78,6 +97,11 @@ class WorkflowInstanceDao(db.Model, VersionedAuditableData):
     __modelclass__ = WorkflowInstance
 
 
+class WorkflowInstanceArchiveDao(db.Model, VersionedAuditableData):
+    __tablename__ = 'workflow_instance_archive'
+    __modelclass__ = WorkflowInstance
+
+
 class EventDao(db.Model, VersionedAuditableData):
     __tablename__ = 'event'
     __modelclass__ = Event
@@ -88,8 +112,7 @@ class SubscriptionDao(db.Model, VersionedAuditableData):
     __modelclass__ = Subscription
 
 
-class SubscriptionElementDao(db.Model, VersionedAuditableSerializable):
-    __tablename__ = 'subscription_element'
+class SubscriptionElementColumns(VersionedAuditableSerializable):
     __modelclass__ = SubscriptionElement
     subscription_id = Column(String(length=36), nullable=False)
     s3_path = Column(String(length=1024), nullable=False)
@@ -98,6 +121,20 @@ class SubscriptionElementDao(db.Model, VersionedAuditableSerializable):
     action_id = Column(String(length=36))
     batch_id = Column(String(length=36))
     processed = Column(TIMESTAMP)
+    # see dart.service.subscription_element_partition.  Databases created before partitioning only have this column
+    # once tool/migration/partition_subscription_elements has run, so it is only mapped when partitioning is enabled.
+    if config['dart'].get('subscription_element_partitions', 0) > 0:
+        partition_key = Column(Integer)
+
+
+class SubscriptionElementDao(db.Model, SubscriptionElementColumns):
+    __tablename__ = 'subscription_element'
+
+
+class SubscriptionElementArchiveDao(db.Model, SubscriptionElementColumns):
+    __tablename__ = 'subscription_element_archive'
+    # archived elements still count as seen when new s3 keys are conditionally inserted
+    __table_args__ = (Index('subscription_element_archive_subscription_id_s3_path', 'subscription_id', 's3_path'),)
 
 
 class MessageDao(db.Model, VersionedAuditableSerializable):
@@ -112,8 +149,7 @@ class MessageDao(db.Model, VersionedAuditableSerializable):
     state = Column(String(length=50), nullable=False)
 
 
-class AccountingDao(db.Model, VersionedAuditableSerializable):
-    __tablename__ = 'accounting'
+class AccountingColumns(VersionedAuditableSerializable):
     __modelclass__ = Accounting
     user_id = Column(String(length=128), nullable=False)
     state = Column(String(length=32), nullable=False)
@@ -123,8 +159,62 @@ class AccountingDao(db.Model, VersionedAuditableSerializable):
     api_version = Column(String(length=4), nullable=False)
     extra = Column(String(length=128), nullable=True)
 
+
+class AccountingDao(db.Model, AccountingColumns):
+    __tablename__ = 'accounting'
+
+
+class AccountingArchiveDao(db.Model, AccountingColumns):
+    __tablename__ = 'accounting_archive'
+
+
 class MutexDao(db.Model, VersionedAuditableSerializable):
     __tablename__ = 'mutex'
     __modelclass__ = Mutex
     name = Column(String(length=255), unique=True, nullable=False)
     state = Column(String(length=50), nullable=False)
+
+
+class CacheVersionDao(db.Model, VersionedAuditableSerializable):
+    __tablename__ = 'cache_version'
+    __modelclass__ = CacheVersion
+    name = Column(String(length=255), unique=True, nullable=False)
+    version = Column(BigInteger, nullable=False)
+
+
+class OutboxEmailDao(db.Model, VersionedAuditableSerializable):
+    __tablename__ = 'email_outbox'
+    __modelclass__ = OutboxEmail
+    subject = Column(Text(), nullable=False)
+    body = Column(Text(), nullable=False)
+    to_addresses = Column(JSONB)
+    cc_addresses = Column(JSONB)
+    digest_key = Column(String(length=255))
+    state = Column(String(length=50), nullable=False)
+    attempts = Column(Integer, nullable=False)
+    next_attempt = Column(TIMESTAMP, nullable=False)
+    error_message = Column(Text())
+
+
+class EntitySearchDao(db.Model, VersionedAuditableSerializable):
+    """ the ids and names of the entities that the UI search box finds, kept up to date by dart.service.entity_search
+        and indexed for substring matches with pg_trgm """
+    __tablename__ = 'entity_search'
+    entity_type = Column(String(length=50), nullable=False)
+    name = Column(Text())
+    # lower(id || ' ' || name)
+    search_text = Column(Text(), nullable=False)
+    __table_args__ = (Index('entity_search_search_text_trgm', 'search_text', postgresql_using='gin',
+                            postgresql_ops={'search_text': 'gin_trgm_ops'}),)
+
+
+class EntityEdgeDao(db.Model, VersionedAuditableSerializable):
+    """ the parent -> child edges of the entity graph, kept up to date by dart.service.entity_edge.  The id is
+        md5(src_type-src_id dst_type-dst_id relationship), so that an edge is only ever stored once. """
+    __tablename__ = 'entity_edge'
+    src_type = Column(String(length=50), nullable=False)
+    src_id = Column(String(length=36), nullable=False, index=True)
+    dst_type = Column(String(length=50), nullable=False)
+    dst_id = Column(String(length=36), nullable=False, index=True)
+    # the data field of the entity that defines the edge, e.g. "dataset_id" or "destination_s3_path"
+    relationship = Column(String(length=50), nullable=False)
@@ -33,6 +33,13 @@ def action_schema(supported_action_type_params_schema):
             'workflow_action_id': {'type': ['string', 'null'], 'default': None, 'readonly': True},
             'first_in_workflow': {'type': ['boolean', 'null'], 'default': False, 'readonly': True},
             'last_in_workflow': {'type': ['boolean', 'null'], 'default': False, 'readonly': True},
+            'depends_on': {
+                'type': ['array', 'null'],
+                'items': {'type': 'string'},
+                'default': None,
+                'description': 'for workflow action templates, the ids of the other action templates that must finish'
+                               ' before this one runs (when unset, all action templates before this one in order_idx)'
+            },
             'ecs_task_arn': {'type': ['string', 'null'], 'default': None, 'readonly': True},
             'extra_data': {'type': ['object', 'null'], 'default': None, 'readonly': True},
         },
@@ -1,26 +1,89 @@
+import copy
+import json
+import threading
+
 from jsonschema import Draft4Validator
 from jsonschema.exceptions import best_match
 
 from dart.model.exception import DartValidationException
+from dart.util.lru_cache import LruCache
+
+# how many compiled schemas each thread keeps, by identity and by content
+_COMPILED_SCHEMA_CACHE_SIZE = 256
+# validators are not shared between threads, since the RefResolver of a validator keeps a stack of scopes
+_compiled_schemas = threading.local()
 
 
 def apply_defaults(instance, schema):
-    if not schema or not instance:
+    _apply_defaults_plan(instance, _defaults_plan(schema))
+
+
+def _defaults_plan(schema):
+    """ :return: [(prop, has_default, default, subplan)] for the properties of the schema that have a default, or
+                 that have nested properties with defaults """
+    plan = []
+    for prop, subschema in (schema or {}).get('properties', {}).iteritems():
+        if not subschema:
+            continue
+        subplan = _defaults_plan(subschema)
+        if 'default' in subschema or subplan:
+            plan.append((prop, 'default' in subschema, subschema.get('default'), subplan))
+    return plan
+
+
+def _apply_defaults_plan(instance, plan):
+    if not plan or not instance:
         return
-    for prop, subschema in schema.get('properties', {}).iteritems():
-        if subschema and 'default' in subschema and instance.get(prop) is None:
-            instance[prop] = subschema['default']
-        if prop in instance:
-            apply_defaults(instance[prop], subschema)
+    for prop, has_default, default, subplan in plan:
+        if has_default and instance.get(prop) is None:
+            # schemas are cached and shared, so mutable defaults are copied
+            instance[prop] = copy.deepcopy(default) if isinstance(default, (dict, list)) else default
+        if subplan and prop in instance:
+            _apply_defaults_plan(instance[prop], subplan)
+
+
+class _CompiledSchema(object):
+    def __init__(self, schema):
+        self.validator = Draft4Validator(schema)
+        self.defaults_plan = _defaults_plan(schema)
+
+    def default_and_validate(self, model):
+        instance = model.to_dict()
+        _apply_defaults_plan(instance, self.defaults_plan)
+        errors = list(self.validator.iter_errors(instance))
+        if len(errors) > 0:
+            raise DartValidationException(str(best_match(errors)))
+        return model.from_dict(instance)
+
+
+def compile_schema(schema):
+    """ :return: the validator and defaults of the schema, from a cache keyed by the identity of the schema (for
+                 schemas that are built once and reused, e.g. by EngineCache) or else by its content.  Schemas must
+                 not be modified once they have been used.
+        :rtype: _CompiledSchema """
+    if not hasattr(_compiled_schemas, 'by_id'):
+        _compiled_schemas.by_id = LruCache(_COMPILED_SCHEMA_CACHE_SIZE)
+        _compiled_schemas.by_content = LruCache(_COMPILED_SCHEMA_CACHE_SIZE)
+    by_id, by_content = _compiled_schemas.by_id, _compiled_schemas.by_content
+
+    compiled = by_id.get_by_identity([schema])
+    if compiled is None:
+        content = json.dumps(schema, sort_keys=True)
+        compiled = by_content.get(content) or _CompiledSchema(schema)
+        by_content.put(content, compiled)
+        by_id.put_by_identity([schema], compiled)
+    return compiled
 
 
 def default_and_validate(model, schema):
-    instance = model.to_dict()
-    apply_defaults(instance, schema)
-    errors = list(Draft4Validator(schema).iter_errors(instance))
-    if len(errors) > 0:
-        raise DartValidationException(str(best_match(errors)))
-    return model.from_dict(instance)
+    return compile_schema(schema).default_and_validate(model)
+
+
+def default_and_validate_all(models, schema):
+    """ like default_and_validate, for many models and one schema
+        :rtype: list """
+    compiled = compile_schema(schema)
+    return [compiled.default_and_validate(m) for m in models]
 
 
 def base_schema(data_json_schema):
@@ -23,6 +23,7 @@ def engine_schema():
                         'name': {'type': 'string'},
                         'description': {'type': 'string'},
                         'params_json_schema': {'type': ['object', 'null']},
+                        'batchable': {'type': ['boolean', 'null'], 'default': False},
                     }
                 },
                 'minItems': 1,
@@ -5,7 +5,7 @@ from dart.model.exception import DartValidationException
 from dart.model.orm import AccountingDao
 from dart.context.database import db
 from dart.service.patcher import retry_stale_data
-from dart.util.rand import random_id
+from dart.util.rand import new_id
 
 
 @injectable
@@ -18,7 +18,7 @@ class AccountingService(object):
         """ :type accounting_event: dart.model.accounting.Accounting """
 
         accounting_dao = AccountingDao()
-        accounting_dao.id = random_id()
+        accounting_dao.id = new_id()
         accounting_dao.user_id = accounting_event.user_id
         accounting_dao.state = accounting_event.state
         accounting_dao.entity = accounting_event.entity
@@ -1,25 +1,32 @@
 from datetime import datetime, timedelta
 
-from sqlalchemy import Float, func, desc, not_, or_
+from sqlalchemy import Float, func, desc, not_, or_, text
 from sqlalchemy.sql.expression import nullslast
 
 from dart.context.database import db
 from dart.context.locator import injectable
-from dart.model.action import ActionState, ActionType, Action
+from dart.model.action import ActionState
 from dart.model.engine import Engine
 from dart.model.exception import DartValidationException
-from dart.model.orm import ActionDao, DatastoreDao
+from dart.model.orm import ActionDao, DatastoreDao, ActionArchiveDao, ActionPayloadDao, ActionPayloadArchiveDao
 from dart.model.query import Direction, OrderBy
-from dart.schema.action import action_schema
-from dart.schema.base import default_and_validate
+from dart.schema.base import default_and_validate_all
+from dart.service.archive import query_with_archive
 from dart.service.patcher import patch_difference, retry_stale_data
-from dart.util.rand import random_id
+from dart.util.query_stream import query_results
+from dart.util.rand import new_id
+
+# the bulky, rarely read fields of action data (e.g. EMR steps and tracebacks).  They are kept in the action_payload
+# table rather than in the action row, which the scheduling queries read and every progress update rewrites, and
+# they are only loaded by get_action.  Since list queries leave them as None, a payload field is only written when
+# it differs between the source and destination models of an update.
+ACTION_PAYLOAD_FIELDS = ['extra_data', 'error_message']
 
 
 @injectable
 class ActionService(object):
-    def __init__(self, engine_service, filter_service, order_by_service):
-        self._engine_service = engine_service
+    def __init__(self, engine_cache, filter_service, order_by_service):
+        self._engine_cache = engine_cache
         self._filter_service = filter_service
         self._order_by_service = order_by_service
 
@@ -27,44 +34,64 @@ class ActionService(object):
         """ :type actions: list[dart.model.action.Action]
             :type datastore: dart.model.datastore.Datastore """
 
-        engine = self._engine_service.get_engine_by_name(engine_name)
+        engine = self._engine_cache.get_engine_by_name(engine_name)
         assert isinstance(engine, Engine)
-        action_types_by_name = {at.name: at for at in engine.data.supported_action_types}
 
-        action_daos = []
         max_order_idx = ActionService._get_max_order_idx(datastore.id) + 1 if datastore else 0
         for action in actions:
             action.data.engine_name = engine_name
             if not action.data.order_idx:
                 action.data.order_idx = max_order_idx
             max_order_idx = action.data.order_idx + 1
-            action_dao = ActionDao()
-            action_dao.id = random_id()
 
-            action_type = action_types_by_name.get(action.data.action_type_name)
-            action = self.default_and_validate_action(action, action_type)
+        # the actions are saved with new ids, but depends_on can refer to other actions saved along with them by the
+        # ids they were given in the request
+        action_ids = [new_id() for _ in actions]
+        request_ids = {action.id: action_id for action, action_id in zip(actions, action_ids) if action.id}
 
+        action_daos = []
+        for action, action_id in zip(self.default_and_validate_actions(actions), action_ids):
+            if action.data.depends_on:
+                action.data.depends_on = [request_ids.get(i, i) for i in action.data.depends_on]
+            action_dao = ActionDao()
+            action_dao.id = action_id
+            payload = ActionService._pop_payload(action)
             action_dao.data = action.data.to_dict()
             db.session.add(action_dao)
             action_daos.append(action_dao)
+            if payload:
+                ActionService._save_payload(action_dao.id, payload)
         if flush:
             db.session.flush()
         if commit:
             db.session.commit()
         return [a.to_model() for a in action_daos]
 
-    def default_and_validate_action(self, action, action_type=None):
-        if not action_type:
-            engine = self._engine_service.get_engine_by_name(action.data.engine_name)
-            action_types_by_name = {at.name: at for at in engine.data.supported_action_types}
-            action_type = action_types_by_name.get(action.data.action_type_name)
-        if not action_type:
-            raise DartValidationException('unknown action: "%s"' % action.data.action_type_name)
-        assert isinstance(action_type, ActionType)
-        if not action.data.args:
-            action.data.args = {}
-        action = default_and_validate(action, action_schema(action_type.params_json_schema))
-        return action
+    def default_and_validate_action(self, action):
+        return self.default_and_validate_actions([action])[0]
+
+    def default_and_validate_actions(self, actions):
+        """ validates the actions of each action type together, against its cached schema
+
+            :type actions: list[dart.model.action.Action]
+            :return: the defaulted and validated actions, in the same order
+            :rtype: list[dart.model.action.Action] """
+        indexes_by_action_type = {}
+        for i, action in enumerate(actions):
+            if not action.data.args:
+                action.data.args = {}
+            indexes_by_action_type.setdefault((action.data.engine_name, action.data.action_type_name), []).append(i)
+
+        results = [None] * len(actions)
+        for (engine_name, action_type_name), indexes in indexes_by_action_type.iteritems():
+            schema = self._engine_cache.get_action_schema(engine_name, action_type_name)
+            if not schema:
+                # raises for an unknown engine
+                self._engine_cache.get_engine_by_name(engine_name)
+                raise DartValidationException('unknown action: "%s"' % action_type_name)
+            for i, action in zip(indexes, default_and_validate_all([actions[i] for i in indexes], schema)):
+                results[i] = action
+        return results
 
     @staticmethod
     def _get_max_order_idx(datastore_id):
@@ -73,11 +100,47 @@ class ActionService(object):
             .filter(ActionDao.data['datastore_id'].astext == datastore_id).all()[0][0] or 0
 
     @staticmethod
-    def get_action(action_id, raise_when_missing=True):
+    def get_action(action_id, raise_when_missing=True, include_archived=False):
+        """ :return: the action, along with its payload fields (see ACTION_PAYLOAD_FIELDS)
+            :rtype: dart.model.action.Action """
+        archived = False
         action_dao = ActionDao.query.get(action_id)
+        if not action_dao and include_archived:
+            action_dao = ActionArchiveDao.query.get(action_id)
+            archived = action_dao is not None
         if not action_dao and raise_when_missing:
             raise Exception('action with id=%s not found' % action_id)
-        return action_dao.to_model() if action_dao else None
+        if not action_dao:
+            return None
+        action = action_dao.to_model()
+        payload_dao = ActionPayloadDao.query.get(action_id)
+        if not payload_dao and archived:
+            payload_dao = ActionPayloadArchiveDao.query.get(action_id)
+        # actions saved before the payload table existed may still have their payload in the action row
+        if payload_dao:
+            for field in ACTION_PAYLOAD_FIELDS:
+                setattr(action.data, field, getattr(payload_dao, field))
+        return action
+
+    @staticmethod
+    def get_actions(action_ids, include_archived=False):
+        """ like get_action, for many actions at once
+
+            :return: the actions (or None for those not found), in the order of the given ids
+            :rtype: list[dart.model.action.Action] """
+        actions = {dao.id: dao.to_model() for dao in ActionDao.query.filter(ActionDao.id.in_(action_ids)).all()}
+        payload_daos = ActionPayloadDao.query.filter(ActionPayloadDao.id.in_(action_ids)).all()
+        missing_ids = [i for i in action_ids if i not in actions]
+        if missing_ids and include_archived:
+            archive_daos = ActionArchiveDao.query.filter(ActionArchiveDao.id.in_(missing_ids)).all()
+            actions.update({dao.id: dao.to_model() for dao in archive_daos})
+            payload_daos.extend(ActionPayloadArchiveDao.query.filter(ActionPayloadArchiveDao.id.in_(missing_ids)).all())
+        for payload_dao in payload_daos:
+            action = actions.get(payload_dao.id)
+            if action:
+                for field in ACTION_PAYLOAD_FIELDS:
+                    setattr(action.data, field, getattr(payload_dao, field))
+        return [actions.get(i) for i in action_ids]
 
     def find_action_count(self, datastore_id=None, states=None, action_type_names=None, gt_order_idx=None, offset=None):
         return self._find_action_query(datastore_id, None, gt_order_idx, None, action_type_names, states, None, None, offset).count()
@@ -95,43 +158,117 @@ class ActionService(object):
         return [r.to_model() for r in query.all()]
 
     @staticmethod
-    def find_running_or_queued_action_workflow_ids(datastore_id):
-        resultset = db.session\
-            .query(func.distinct(ActionDao.data['workflow_id'].astext))\
-            .filter(ActionDao.data['datastore_id'].astext == datastore_id)\
-            .filter(ActionDao.data['state'].astext.in_([ActionState.RUNNING, ActionState.QUEUED]))\
-            .filter(ActionDao.data['workflow_id'] != 'null')\
-            .all()
-        return [r[0] for r in resultset]
+    def find_runnable_actions(datastore_id, limit):
+        """ finds the HAS_NEVER_RUN actions on a datastore that are ready to be queued, in order_idx order:
+
+              - non-workflow actions run one at a time, once every earlier non-workflow action has finished
+              - workflow actions with depends_on run once each of those actions has finished
+              - workflow actions without depends_on run once every earlier action of the workflow has finished
+
+            :rtype: list[dart.model.action.Action] """
+        sql = """
+            SELECT a.*
+            FROM action a
+            WHERE a.data->>'datastore_id' = :datastore_id
+              AND a.data->>'state' = :has_never_run
+              AND CASE
+                  WHEN a.data->>'workflow_id' IS NULL THEN NOT EXISTS (
+                      SELECT NULL
+                      FROM action p
+                      WHERE p.data->>'datastore_id' = :datastore_id
+                        AND p.data->>'workflow_id' IS NULL
+                        AND p.data->>'state' <> ALL(:finished_states)
+                        AND CAST(p.data->>'order_idx' AS FLOAT) < CAST(a.data->>'order_idx' AS FLOAT))
+                  WHEN jsonb_typeof(a.data->'depends_on') = 'array' THEN NOT EXISTS (
+                      SELECT NULL
+                      FROM jsonb_array_elements_text(a.data->'depends_on') dependency_id
+                      JOIN action d ON d.id = dependency_id
+                      WHERE d.data->>'state' <> ALL(:finished_states))
+                  ELSE NOT EXISTS (
+                      SELECT NULL
+                      FROM action p
+                      WHERE p.data->>'datastore_id' = :datastore_id
+                        AND p.data->>'workflow_id' = a.data->>'workflow_id'
+                        AND p.data->>'state' <> ALL(:finished_states)
+                        AND CAST(p.data->>'order_idx' AS FLOAT) < CAST(a.data->>'order_idx' AS FLOAT))
+              END
+            ORDER BY CAST(a.data->>'order_idx' AS FLOAT), a.created
+            LIMIT :limit
+            """
+        statement = text(sql).bindparams(
+            datastore_id=datastore_id,
+            has_never_run=ActionState.HAS_NEVER_RUN,
+            finished_states=ActionState.finished(),
+            limit=limit,
+        )
+        return [a.to_model() for a in ActionDao.query.from_statement(statement).all()]
 
     @staticmethod
-    def exists_running_or_queued_non_workflow_action(datastore_id):
-        query = ActionDao.query\
-            .filter(ActionDao.data['datastore_id'].astext == datastore_id)\
-            .filter(ActionDao.data['state'].astext.in_([ActionState.RUNNING, ActionState.QUEUED]))\
-            .filter(ActionDao.data['workflow_id'] == 'null')\
-            .limit(1)
-        return len(list(query.all())) > 0
+    def all_workflow_instance_actions_finished(workflow_instance_id):
+        sql = """
+            SELECT NOT EXISTS (
+                SELECT NULL
+                FROM action
+                WHERE data->>'workflow_instance_id' = :workflow_instance_id AND data->>'state' <> ALL(:finished_states)
+            )
+            """
+        statement = text(sql).bindparams(workflow_instance_id=workflow_instance_id,
+                                         finished_states=ActionState.finished())
+        return db.session.execute(statement).scalar()
 
     @staticmethod
-    def find_next_runnable_action(datastore_id, not_in_workflow_ids, ensure_workflow_action):
+    def find_following_actions(action, limit):
+        """ finds the actions that come after the given one in its run order: the later non-workflow actions on its
+            datastore for a non-workflow action, otherwise the later actions of its workflow instance
+
+            :type action: dart.model.action.Action
+            :rtype: list[dart.model.action.Action] """
         query = ActionDao.query\
-            .filter(ActionDao.data['datastore_id'].astext == datastore_id)\
-            .filter(ActionDao.data['state'].astext == ActionState.HAS_NEVER_RUN)
-        if not_in_workflow_ids:
-            query = query.filter(
-                or_(
-                    ActionDao.data['workflow_id'] == 'null',
-                    not_(ActionDao.data['workflow_id'].astext.in_(not_in_workflow_ids)),
-                ).self_group()
-            )
-        if ensure_workflow_action:
-            query = query.filter(ActionDao.data['workflow_id'] != 'null')
-        query = query\
-            .order_by(ActionDao.data['order_idx'].cast(Float))\
-            .limit(1)
-        result = [a for a in query.all()]
-        return result[0].to_model() if result else None
+            .filter(ActionDao.data['datastore_id'].astext == action.data.datastore_id)\
+            .filter(ActionDao.data['order_idx'].cast(Float) > action.data.order_idx)
+        if action.data.workflow_instance_id:
+            query = query.filter(ActionDao.data['workflow_instance_id'].astext == action.data.workflow_instance_id)
+        else:
+            query = query.filter(ActionDao.data['workflow_id'].astext.is_(None))
+        query = query.order_by(ActionDao.data['order_idx'].cast(Float), ActionDao.created).limit(limit)
+        return [dao.to_model() for dao in query.all()]
+
+    @staticmethod
+    def validate_workflow_action_dependencies(workflow_id, actions):
+        """ ensures that the depends_on ids of the given (TEMPLATE) actions refer to other TEMPLATE actions of the
+            workflow and that the dependencies contain no cycles.  The ids of new actions are the ones they were
+            given in the request, which other new actions can depend on (see save_actions).
+
+            :type actions: list[dart.model.action.Action] """
+        template_daos = ActionDao.query\
+            .filter(ActionDao.data['workflow_id'].astext == workflow_id)\
+            .filter(ActionDao.data['state'].astext == ActionState.TEMPLATE)\
+            .all()
+        dependencies = {dao.id: dao.data.get('depends_on') or [] for dao in template_daos}
+        for action in actions:
+            if action.id:
+                dependencies[action.id] = action.data.depends_on or []
+        for action in actions:
+            for dependency_id in action.data.depends_on or []:
+                if dependency_id == action.id or dependency_id not in dependencies:
+                    msg = 'depends_on id "%s" is not another action template of this workflow' % dependency_id
+                    raise DartValidationException(msg)
+
+        visited, in_progress = set(), set()
+
+        def visit(action_id):
+            if action_id in in_progress:
+                raise DartValidationException('the depends_on values of this workflow contain a cycle')
+            if action_id in visited:
+                return
+            in_progress.add(action_id)
+            for dependency_id in dependencies.get(action_id, []):
+                visit(dependency_id)
+            in_progress.remove(action_id)
+            visited.add(action_id)
+
+        for action_id in dependencies:
+            visit(action_id)
 
     @staticmethod
     def _find_action_query(datastore_id=None, datastore_state=None, gt_order_idx=None, limit=None, action_type_names=None, states=None, workflow_id=None, order_by=None, offset=None):
@@ -170,41 +307,47 @@ class ActionService(object):
                 yield e
             offset += limit
 
-    def query_actions(self, filters, limit=20, offset=0, order_by=None):
-        """ :type filters: list[dart.model.query.Filter] """
+    def query_actions(self, filters, limit=20, offset=0, order_by=None, include_archived=False, stream=False):
+        """ :type filters: list[dart.model.query.Filter]
+            :param include_archived: whether archived actions follow the current ones
+            :param stream: whether to return an iterator that reads the actions from a server side cursor """
 
         default_order_bys = [OrderBy('updated', Direction.DESC)]
         order_bys = order_by if order_by else default_order_bys
 
         query = self._query_action_query(filters, order_bys)
-        query = query.limit(limit).offset(offset)
-        return [a.to_model() for a in query.all()]
+        if include_archived:
+            archive_query = self._query_action_query(filters, order_bys, ActionArchiveDao)
+            daos = query_with_archive(query, archive_query, limit, offset, stream)
+        else:
+            daos = query_results(query.limit(limit).offset(offset), stream)
+        actions = (a.to_model() for a in daos)
+        return actions if stream else list(actions)
 
-    def query_actions_count(self, filters):
+    def query_actions_count(self, filters, include_archived=False):
         """ :type filters: list[dart.model.query.Filter] """
-        query = self._query_action_query(filters)
-        return query.count()
+        count = self._query_action_query(filters).count()
+        if include_archived:
+            count += self._query_action_query(filters, dao=ActionArchiveDao).count()
+        return count
 
-    def _query_action_query(self, filters, order_by=None):
+    def _query_action_query(self, filters, order_by=None, dao=ActionDao):
         """ :type filters: list[dart.model.query.Filter]
             :type order_by: list[dart.model.query.OrderBy] """
-        action_types = []
-        for engine in self._engine_service.query_engines([], 1000, 0):
-            action_types.extend(engine.data.supported_action_types)
-        action_schemas = [action_schema(a.params_json_schema) for a in action_types]
+        action_schemas = self._engine_cache.all_action_schemas()
 
-        query = ActionDao.query
+        query = dao.query
 
         for o in (order_by or []):
-            query = self._order_by_service.apply_order_by(o, query, ActionDao, action_schemas)
+            query = self._order_by_service.apply_order_by(o, query, dao, action_schemas)
 
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, ActionDao, action_schemas)
+            query = self._filter_service.apply_filter(f, query, dao, action_schemas)
 
         return query
 
     @staticmethod
-    def update_action_state(action, state, error_message, conditional=None):
+    def update_action_state(action, state, error_message, conditional=None, commit=True):
         """ :type action: dart.model.action.Action """
         source_action = action.copy()
         action.data.error_message = error_message
@@ -218,14 +361,14 @@ class ActionService(object):
         elif state == ActionState.COMPLETED:
             action.data.end_time = datetime.now()
             action.data.progress = 1
-        return patch_difference(ActionDao, source_action, action, True, conditional)
+        return ActionService.patch_action(source_action, action, conditional, commit)
 
     @staticmethod
     def update_action_ecs_task_arn(action, ecs_task_arn):
         """ :type action: dart.model.action.Action """
         source_action = action.copy()
         action.data.ecs_task_arn = ecs_task_arn
-        return patch_difference(ActionDao, source_action, action)
+        return ActionService.patch_action(source_action, action)
 
     @staticmethod
     def update_action(action, progress, extra_data):
@@ -233,51 +376,168 @@ class ActionService(object):
         source_action = action.copy()
         action.data.progress = progress
         action.data.extra_data = extra_data
-        return patch_difference(ActionDao, source_action, action)
+        return ActionService.patch_action(source_action, action)
 
     @staticmethod
-    def patch_action(source_action, action):
-        return patch_difference(ActionDao, source_action, action)
+    def patch_action(source_action, action, conditional=None, commit=True):
+        """ applies the differences between the two actions, writing the payload fields that changed to the
+            action_payload table and everything else to the action row.  With commit=False a StaleDataError is left
+            for the caller (see dart.service.patcher.patch_data).
+
+            :type source_action: dart.model.action.Action
+            :type action: dart.model.action.Action
+            :rtype: dart.model.action.Action """
+        if commit:
+            return ActionService._patch_action_retryable(source_action, action, conditional)
+        return ActionService._patch_action(source_action, action, conditional, False)
 
     @staticmethod
     @retry_stale_data
-    def delete_action(action_id):
-        action_dao = ActionDao.query.get(action_id)
-        db.session.delete(action_dao)
-        db.session.commit()
+    def _patch_action_retryable(source_action, action, conditional):
+        return ActionService._patch_action(source_action, action, conditional, True)
 
     @staticmethod
-    def delete_actions_in_workflow(workflow_id):
-        ActionDao.query.filter(ActionDao.data['workflow_id'].astext == workflow_id).delete(False)
-        db.session.commit()
+    def _patch_action(source_action, action, conditional, commit):
+        dest_action = action.copy()
+        dest_payload = ActionService._pop_payload(dest_action)
+        payload = {}
+        for field in ACTION_PAYLOAD_FIELDS:
+            if dest_payload.get(field) != getattr(source_action.data, field):
+                payload[field] = dest_payload.get(field)
+        # an action saved before the payload table existed keeps its payload in the action row, which is cleared
+        # below, so the whole payload is written rather than only the fields that changed
+        if dest_payload and not ActionPayloadDao.query.get(action.id):
+            payload.update(dest_payload)
+
+        # the source payload fields are left in place so that any still stored in the action row are cleared
+        updated_action = patch_difference(ActionDao, source_action, dest_action, False, conditional)
+        if payload:
+            ActionService._save_payload(action.id, payload)
+        if commit:
+            db.session.commit()
+
+        for field in ACTION_PAYLOAD_FIELDS:
+            setattr(updated_action.data, field, getattr(action.data, field))
+        return updated_action
 
     @staticmethod
-    def delete_actions_in_workflow_instance(workflow_instance_id):
-        ActionDao.query.filter(ActionDao.data['workflow_instance_id'].astext == workflow_instance_id).delete(False)
-        db.session.commit()
+    def _pop_payload(action):
+        """ removes the payload fields from the action data
+
+            :type action: dart.model.action.Action
+            :return: the payload fields that were set
+            :rtype: dict """
+        payload = {}
+        for field in ACTION_PAYLOAD_FIELDS:
+            value = getattr(action.data, field)
+            if value is not None:
+                payload[field] = value
+            setattr(action.data, field, None)
+        return payload
 
-    def clone_workflow_actions(self, source_actions, target_datastore_id, **data_property_overrides):
-        max_order_idx = self._get_max_order_idx(target_datastore_id)
-        for action in source_actions:
-            max_order_idx += 1
-            action.data.order_idx = max_order_idx
-            db.session.add(self._clone_workflow_action_to_dao(action, **data_property_overrides))
+    @staticmethod
+    def _save_payload(action_id, payload):
+        payload_dao = ActionPayloadDao.query.get(action_id)
+        if not payload_dao:
+            payload_dao = ActionPayloadDao()
+            payload_dao.id = action_id
+            db.session.add(payload_dao)
+        for field, value in payload.iteritems():
+            setattr(payload_dao, field, value)
+
+    @staticmethod
+    @retry_stale_data
+    def delete_action(action_id):
+        action_dao = ActionDao.query.get(action_id)
+        db.session.delete(action_dao)
+        payload_dao = ActionPayloadDao.query.get(action_id)
+        if payload_dao:
+            db.session.delete(payload_dao)
         db.session.commit()
 
     @staticmethod
-    def _clone_workflow_action_to_dao(source_action, **data_property_overrides):
-        action = source_action.copy()
-        assert isinstance(action, Action)
-        action.data.workflow_action_id = source_action.id
-        action.data.state = ActionState.HAS_NEVER_RUN
-        action.data.progress = None
-        action.data.queued_time = None
-        action.data.start_time = None
-        action.data.end_time = None
-        action.data.error_message = None
-        for k, v in data_property_overrides.iteritems():
-            setattr(action.data, k, v)
-        action_dao = ActionDao()
-        action_dao.id = random_id()
-        action_dao.data = action.data.to_dict()
-        return action_dao
+    def clone_workflow_template_actions(workflow_id, datastore_id, workflow_instance_id, commit=True):
+        """ copies the TEMPLATE actions of a workflow into a new workflow instance with a single INSERT ... SELECT,
+            appending them (in template order) after any existing actions on the datastore
+
+            :rtype: int
+            :return: the number of actions created """
+        sql = """
+            SELECT id
+            FROM action
+            WHERE data->>'workflow_id' = :workflow_id AND data->>'state' = :template_state
+            ORDER BY CAST(data->>'order_idx' AS FLOAT), created
+            """
+        statement = text(sql).bindparams(workflow_id=workflow_id, template_state=ActionState.TEMPLATE)
+        source_ids = [r.id for r in db.session.execute(statement)]
+        if not source_ids:
+            return 0
+
+        # postgres 9.4 has no jsonb_set or "||", so the new data is reassembled key by key from the template's data,
+        # and depends_on is rewritten from template action ids to the new instance action ids.  the templates'
+        # extra_data is copied to the new action_payload rows in the same statement.
+        sql = """
+            WITH c AS (
+                SELECT *
+                FROM unnest(CAST(:source_ids AS TEXT[]), CAST(:new_ids AS TEXT[]))
+                     WITH ORDINALITY AS c(source_id, id, idx)
+            ),
+            cloned AS (
+                INSERT INTO action (id, version_id, created, updated, data)
+                SELECT c.id, 0, NOW(), NOW(), (
+                    SELECT CAST(json_object_agg(e.key, e.value) AS JSONB)
+                    FROM (
+                        SELECT key, value FROM jsonb_each(a.data) WHERE key <> ALL(:overridden_keys)
+                        UNION ALL SELECT 'state', CAST(to_json(CAST(:state AS TEXT)) AS JSONB)
+                        UNION ALL SELECT 'order_idx', CAST(to_json(m.max_order_idx + c.idx) AS JSONB)
+                        UNION ALL SELECT 'first_in_workflow', CAST(to_json(c.idx = 1) AS JSONB)
+                        UNION ALL SELECT 'last_in_workflow', CAST(to_json(c.idx = :count) AS JSONB)
+                        UNION ALL SELECT 'workflow_action_id', CAST(to_json(a.id) AS JSONB)
+                        UNION ALL SELECT 'datastore_id', CAST(to_json(CAST(:datastore_id AS TEXT)) AS JSONB)
+                        UNION ALL SELECT 'workflow_instance_id',
+                                         CAST(to_json(CAST(:workflow_instance_id AS TEXT)) AS JSONB)
+                        UNION ALL SELECT 'depends_on', CASE
+                            WHEN jsonb_typeof(a.data->'depends_on') = 'array' THEN (
+                                SELECT CAST(COALESCE(json_agg(dc.id ORDER BY dc.idx), '[]') AS JSONB)
+                                FROM jsonb_array_elements_text(a.data->'depends_on') dependency_id
+                                JOIN c dc ON dc.source_id = dependency_id)
+                            ELSE CAST('null' AS JSONB)
+                        END
+                        UNION ALL SELECT k, CAST('null' AS JSONB) FROM unnest(:null_keys) k
+                    ) e
+                )
+                FROM c
+                JOIN action a ON a.id = c.source_id
+                CROSS JOIN (
+                    SELECT COALESCE(MAX(CAST(data->>'order_idx' AS FLOAT)), 0) AS max_order_idx
+                    FROM action
+                    WHERE data->>'datastore_id' = :datastore_id
+                ) m
+                RETURNING id
+            ),
+            cloned_payload AS (
+                INSERT INTO action_payload (id, version_id, created, updated, extra_data, error_message)
+                SELECT c.id, 0, NOW(), NOW(), p.extra_data, NULL
+                FROM c
+                JOIN action_payload p ON p.id = c.source_id
+                WHERE p.extra_data IS NOT NULL
+            )
+            SELECT COUNT(*) FROM cloned
+            """
+        overridden_values = ['state', 'order_idx', 'first_in_workflow', 'last_in_workflow', 'workflow_action_id',
+                             'datastore_id', 'workflow_instance_id', 'depends_on']
+        null_keys = ['progress', 'queued_time', 'start_time', 'end_time', 'error_message']
+        statement = text(sql).bindparams(
+            overridden_keys=overridden_values + null_keys,
+            null_keys=null_keys,
+            state=ActionState.HAS_NEVER_RUN,
+            count=len(source_ids),
+            datastore_id=datastore_id,
+            workflow_instance_id=workflow_instance_id,
+            source_ids=source_ids,
+            new_ids=[new_id() for _ in source_ids],
+        )
+        count = db.session.execute(statement).scalar()
+        if commit:
+            db.session.commit()
+        return count
@@ -0,0 +1,161 @@
+import json
+import logging
+import threading
+import traceback
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.action import ActionState
+from dart.model.orm import ActionDao, WorkflowInstanceDao, SubscriptionElementDao, AccountingDao, ActionPayloadDao
+from dart.model.subscription import SubscriptionElementState
+from dart.model.workflow import WorkflowInstanceState
+from dart.util.query_stream import query_results
+
+_logger = logging.getLogger(__name__)
+
+
+@injectable
+class Archiver(object):
+    """ moves rows that are finished with (and older than the configured retention) out of the high churn tables and
+        into archive tables with the same columns, e.g. action -> action_archive.  Each batch is a single
+        "DELETE ... RETURNING" feeding an "INSERT", so rows are never in both tables or lost, and several processes
+        can run an archiver at once.  Archived rows are only read when an API caller asks for include_archived. """
+
+    def __init__(self, dart_config):
+        archive_config = dart_config['dart'].get('archive', {})
+        self._enabled = archive_config.get('enabled', False)
+        self._poll_seconds = archive_config.get('poll_seconds', 3600)
+        self._batch_size = archive_config.get('batch_size', 1000)
+        self._max_batches = archive_config.get('max_batches_per_run', 100)
+        self._retention_days = {
+            'action': archive_config.get('action_retention_days', 30),
+            'workflow_instance': archive_config.get('workflow_instance_retention_days', 30),
+            'subscription_element': archive_config.get('subscription_element_retention_days', 30),
+            'accounting': archive_config.get('accounting_retention_days', 90),
+        }
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self._enabled or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='archiver')
+        self._thread.daemon = True
+        self._thread.start()
+        _logger.info('started the archiver')
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.archive()
+            except Exception:
+                _logger.error(json.dumps(traceback.format_exc()))
+            finally:
+                db.session.rollback()
+            self._stopped.wait(self._poll_seconds)
+        db.session.remove()
+
+    def archive(self):
+        """ :return: the number of rows archived per table
+            :rtype: dict[str, int] """
+        finished_instance = """
+            SELECT NULL
+            FROM workflow_instance wfi
+            WHERE wfi.id = action.data->>'workflow_instance_id'
+              AND wfi.data->>'state' IN ('{completed}', '{failed}')
+              AND wfi.updated < NOW() - :retention_days * INTERVAL '1 day'
+            """.format(completed=WorkflowInstanceState.COMPLETED, failed=WorkflowInstanceState.FAILED)
+        # workflow instance actions are archived along with their instance, whatever their state, since the
+        # scheduling queries treat missing actions as finished
+        action_condition = """
+            data->>'state' <> '{template}'
+            AND (
+                (data->>'workflow_instance_id' IS NULL AND data->>'state' IN ({finished})
+                 AND updated < NOW() - :retention_days * INTERVAL '1 day')
+                OR EXISTS ({finished_instance})
+            )
+            """.format(finished=', '.join("'%s'" % s for s in ActionState.finished()),
+                       finished_instance=finished_instance, template=ActionState.TEMPLATE)
+        workflow_instance_condition = """
+            data->>'state' IN ('{completed}', '{failed}')
+            AND updated < NOW() - :retention_days * INTERVAL '1 day'
+            AND NOT EXISTS (SELECT NULL FROM action a WHERE a.data->>'workflow_instance_id' = workflow_instance.id)
+            """.format(completed=WorkflowInstanceState.COMPLETED, failed=WorkflowInstanceState.FAILED)
+        subscription_element_condition = """
+            state = '{consumed}' AND updated < NOW() - :retention_days * INTERVAL '1 day'
+            """.format(consumed=SubscriptionElementState.CONSUMED)
+        accounting_condition = "created < NOW() - :retention_days * INTERVAL '1 day'"
+        # payloads follow their actions, so this runs after the actions are archived (payloads of actions that were
+        # never archived, e.g. of a deleted action, are left alone)
+        action_payload_condition = "EXISTS (SELECT NULL FROM action_archive a WHERE a.id = action_payload.id)"
+
+        return {
+            'action': self._archive_in_batches(ActionDao, action_condition),
+            'action_payload': self._archive_in_batches(ActionPayloadDao, action_payload_condition),
+            'workflow_instance': self._archive_in_batches(WorkflowInstanceDao, workflow_instance_condition),
+            'subscription_element': self._archive_in_batches(SubscriptionElementDao, subscription_element_condition),
+            'accounting': self._archive_in_batches(AccountingDao, accounting_condition),
+        }
+
+    def _archive_in_batches(self, dao, condition):
+        table_name = dao.__tablename__
+        columns = ', '.join(dao.__table__.columns.keys())
+        sql = """
+            WITH moved AS (
+                DELETE FROM {table_name}
+                WHERE id IN (
+                    SELECT id
+                    FROM {table_name}
+                    WHERE {condition}
+                    LIMIT :batch_size
+                )
+                RETURNING {columns}
+            )
+            INSERT INTO {table_name}_archive ({columns})
+            SELECT {columns} FROM moved
+            """.format(table_name=table_name, condition=condition, columns=columns)
+        total = 0
+        for i in range(self._max_batches):
+            if self._stopped.is_set():
+                break
+            params = {'batch_size': self._batch_size}
+            if table_name in self._retention_days:
+                params['retention_days'] = self._retention_days[table_name]
+            statement = text(sql).bindparams(**params)
+            count = db.session.execute(statement).rowcount
+            db.session.commit()
+            total += count
+            if count < self._batch_size:
+                break
+        if total:
+            _logger.info('archived %s %s rows' % (total, table_name))
+        return total
+
+
+def query_with_archive(query, archive_query, limit, offset, stream=False):
+    """ pages through the results of a query followed by the results of the same query against the archive table,
+        so that archived rows come after all of the current ones
+
+        :param stream: whether to return an iterator over server side cursors (see query_results) instead of a list
+        :rtype: list """
+    results = _iterate_with_archive(query, archive_query, limit, offset, stream)
+    return results if stream else list(results)
+
+
+def _iterate_with_archive(query, archive_query, limit, offset, stream):
+    query_count = query.order_by(None).count()
+    count = 0
+    if offset < query_count:
+        for result in query_results((query.limit(limit) if limit else query).offset(offset), stream):
+            count += 1
+            yield result
+    if limit and count >= limit:
+        return
+    archive_query = archive_query.offset(max(0, offset - query_count))
+    for result in query_results(archive_query.limit(limit - count) if limit else archive_query, stream):
+        yield result
@@ -0,0 +1,30 @@
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.util.rand import new_id
+
+
+# In-process caches of rarely changing entities (e.g. the trigger registry) check these counters to find out whether
+# another process has modified the entities they were built from.  Any code path that modifies such entities should
+# call increment_cache_version after doing so.
+
+
+def get_cache_version(name):
+    """ :rtype: long
+        :return: the current version, or None if the counter has never been created """
+    result = db.session.execute(text('SELECT version FROM cache_version WHERE name = :name').bindparams(name=name))
+    row = result.fetchone()
+    return row[0] if row else None
+
+
+def increment_cache_version(name, commit=True):
+    statement = text('UPDATE cache_version SET version = version + 1 WHERE name = :name').bindparams(name=name)
+    if db.session.execute(statement).rowcount == 0:
+        sql = """
+            INSERT INTO cache_version (id, version_id, created, updated, name, version)
+            SELECT :id, 0, NOW(), NOW(), :name, 1
+            WHERE NOT EXISTS (SELECT NULL FROM cache_version WHERE name = :name)
+            """
+        db.session.execute(text(sql).bindparams(id=new_id(), name=name))
+    if commit:
+        db.session.commit()
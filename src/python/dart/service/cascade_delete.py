@@ -0,0 +1,159 @@
+import logging
+import time
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.datastore import DatastoreState
+from dart.service.entity_edge import GRAPH_DAOS, delete_edges_statement
+from dart.service.entity_search import ENTITY_SEARCH_ENABLED
+
+_logger = logging.getLogger(__name__)
+
+# tables whose rows share the id of (and are deleted along with) a row in another table
+_DEPENDENT_TABLES = {
+    'action': ['action_payload'],
+    'action_archive': ['action_payload_archive'],
+}
+if ENTITY_SEARCH_ENABLED:
+    for _table_name in ['action', 'datastore', 'subscription', 'workflow']:
+        _DEPENDENT_TABLES.setdefault(_table_name, []).append('entity_search')
+
+
+class _TimeLimitReached(Exception):
+    pass
+
+
+@injectable
+class CascadeDeleteService(object):
+    """ deletes entities along with everything that hangs off of them.  The ids of each table's matching rows are
+        found with a single query (most of the conditions are on unindexed action data), then deleted in batches,
+        each in its own transaction, so that row locks are held briefly and no models are loaded into the session.
+
+        Deletes are idempotent, so a delete that was cut short (see delete_or_defer) can simply be run again. """
+
+    def __init__(self, dart_config, trigger_proxy):
+        dart_config = dart_config.get('dart', {})
+        self._batch_size = dart_config.get('cascade_delete_batch_size', 5000)
+        self._request_seconds = dart_config.get('cascade_delete_request_seconds', 10)
+        self._trigger_proxy = trigger_proxy
+        self._deletes = {
+            'workflow': self.delete_workflow,
+            'workflow_instances': self.delete_workflow_instances,
+            'datastore': self.delete_datastore,
+            'subscription': self.delete_subscription,
+        }
+
+    def delete(self, delete_name, entity_id):
+        """ :param delete_name: workflow, workflow_instances, datastore or subscription (the delete_* methods) """
+        return self._deletes[delete_name](entity_id)
+
+    def delete_or_defer(self, delete_name, entity_id):
+        """ runs a delete (see delete) for at most dart.cascade_delete_request_seconds, then hands the rest of it to
+            the trigger worker, so that deleting a long-lived entity does not time out the web request
+
+            :return: whether the delete finished (rather than was deferred)
+            :rtype: bool """
+        deadline = time.time() + self._request_seconds
+
+        # noinspection PyUnusedLocal
+        def check_time_limit(table_name, total):
+            if time.time() > deadline:
+                raise _TimeLimitReached()
+
+        try:
+            self._deletes[delete_name](entity_id, check_time_limit)
+            return True
+        except _TimeLimitReached:
+            _logger.info('deferring the rest of the %s delete (id=%s) to the trigger worker' % (delete_name, entity_id))
+            self._trigger_proxy.cascade_delete(delete_name, entity_id)
+            return False
+
+    def delete_workflow(self, workflow_id, progress_callback=None):
+        """ deletes a workflow and all of its actions (TEMPLATE and instance actions, live and archived)
+
+            :return: the number of rows deleted per table
+            :rtype: dict[str, int] """
+        params = {'workflow_id': workflow_id}
+        action_condition = "data->>'workflow_id' = :workflow_id"
+        counts = {
+            'action': self._delete_in_batches('action', action_condition, params, progress_callback),
+            'action_archive': self._delete_in_batches('action_archive', action_condition, params, progress_callback),
+        }
+        counts['workflow'] = self._delete_in_batches('workflow', 'id = :workflow_id', {'workflow_id': workflow_id})
+        return counts
+
+    def delete_workflow_instances(self, workflow_id, progress_callback=None):
+        """ deletes the instances of a workflow (live and archived), their actions (live and archived), and the
+            datastores cloned for them (unless still ACTIVE, since those may own running resources)
+
+            :return: the number of rows deleted per table
+            :rtype: dict[str, int] """
+        params = {'workflow_id': workflow_id}
+        workflow_condition = "data->>'workflow_id' = :workflow_id"
+        instance_condition = workflow_condition + " AND data->>'workflow_instance_id' IS NOT NULL"
+        datastore_condition = instance_condition + " AND data->>'state' <> '%s'" % DatastoreState.ACTIVE
+        return {
+            'action': self._delete_in_batches('action', instance_condition, params, progress_callback),
+            'action_archive': self._delete_in_batches('action_archive', instance_condition, params,
+                                                      progress_callback),
+            'datastore': self._delete_in_batches('datastore', datastore_condition, params, progress_callback),
+            'workflow_instance': self._delete_in_batches('workflow_instance', workflow_condition, params,
+                                                         progress_callback),
+            'workflow_instance_archive': self._delete_in_batches('workflow_instance_archive', workflow_condition,
+                                                                 params, progress_callback),
+        }
+
+    def delete_datastore(self, datastore_id, progress_callback=None):
+        """ deletes a datastore and its archived actions (live actions are left to their workflows, see
+            delete_workflow and delete_workflow_instances)
+
+            :return: the number of rows deleted per table
+            :rtype: dict[str, int] """
+        params = {'datastore_id': datastore_id}
+        counts = {
+            'action_archive': self._delete_in_batches('action_archive', "data->>'datastore_id' = :datastore_id",
+                                                      params, progress_callback),
+        }
+        counts['datastore'] = self._delete_in_batches('datastore', 'id = :datastore_id', params)
+        return counts
+
+    def delete_subscription(self, subscription_id, progress_callback=None):
+        """ deletes a subscription and all of its subscription elements (live and archived)
+
+            :return: the number of rows deleted per table
+            :rtype: dict[str, int] """
+        params = {'subscription_id': subscription_id}
+        element_condition = 'subscription_id = :subscription_id'
+        counts = {
+            'subscription_element': self._delete_in_batches('subscription_element', element_condition, params,
+                                                            progress_callback),
+            'subscription_element_archive': self._delete_in_batches('subscription_element_archive',
+                                                                    element_condition, params, progress_callback),
+        }
+        counts['subscription'] = self._delete_in_batches('subscription', 'id = :subscription_id', params)
+        return counts
+
+    def _delete_in_batches(self, table_name, condition, params, progress_callback=None):
+        """ :param progress_callback: called with (table_name, rows deleted so far) after each batch """
+        sql = 'SELECT id FROM {table_name} WHERE {condition} ORDER BY id'.format(table_name=table_name,
+                                                                                  condition=condition)
+        ids = [r.id for r in db.session.execute(text(sql).bindparams(**params))]
+        delete_sql = 'DELETE FROM %s WHERE id = ANY(:ids)' % table_name
+        total = 0
+        for i in range(0, len(ids), self._batch_size):
+            batch_ids = ids[i:i + self._batch_size]
+            count = db.session.execute(text(delete_sql).bindparams(ids=batch_ids)).rowcount
+            for dependent_table_name in _DEPENDENT_TABLES.get(table_name, []):
+                dependent_sql = 'DELETE FROM %s WHERE id = ANY(:ids)' % dependent_table_name
+                db.session.execute(text(dependent_sql).bindparams(ids=batch_ids))
+            if table_name in GRAPH_DAOS.values():
+                db.session.execute(delete_edges_statement(table_name, batch_ids))
+            db.session.commit()
+            total += count
+            _logger.info('deleted %s %s rows so far' % (total, table_name))
+            if progress_callback:
+                progress_callback(table_name, total)
+        db.session.commit()
+        return total
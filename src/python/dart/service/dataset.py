@@ -7,13 +7,15 @@ from dart.context.database import db
 from dart.schema.base import default_and_validate
 from dart.schema.dataset import dataset_schema
 from dart.service.patcher import retry_stale_data
-from dart.util.rand import random_id
+from dart.util.rand import new_id
 
 
 @injectable
 class DatasetService(object):
     def __init__(self, filter_service):
         self._filter_service = filter_service
+        # built once, since the filter service caches its work by the schemas' identity
+        self._filter_schemas = [dataset_schema()]
 
     @staticmethod
     def save_dataset(dataset, commit=True, flush=False):
@@ -21,7 +23,7 @@ class DatasetService(object):
         dataset = default_and_validate(dataset, dataset_schema())
 
         dataset_dao = DatasetDao()
-        dataset_dao.id = random_id()
+        dataset_dao.id = new_id()
         dataset_dao.name = dataset.data.name
         dataset.data.location = dataset.data.location.rstrip('/')
         dataset_dao.data = dataset.data.to_dict()
@@ -76,7 +78,7 @@ class DatasetService(object):
     def _query_dataset_query(self, filters):
         query = DatasetDao.query.order_by(DatasetDao.updated)
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, DatasetDao, [dataset_schema()])
+            query = self._filter_service.apply_filter(f, query, DatasetDao, self._filter_schemas)
         return query
 
     def update_dataset(self, dataset_id, dataset):
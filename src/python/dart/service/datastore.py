@@ -1,22 +1,21 @@
 from sqlalchemy import desc
 from dart.context.locator import injectable
 from dart.model.datastore import DatastoreState, Datastore
-from dart.model.engine import Engine
 from dart.model.orm import DatastoreDao
 from dart.context.database import db
 from dart.schema.base import default_and_validate
-from dart.schema.datastore import datastore_schema
-from dart.service.patcher import patch_difference, retry_stale_data
-from dart.util.rand import random_id
+from dart.service.patcher import patch_difference
+from dart.util.rand import new_id
 from dart.util.secrets import purge_secrets
 
 
 @injectable
 class DatastoreService(object):
-    def __init__(self, trigger_proxy, dart_config, engine_service, filter_service, secrets):
+    def __init__(self, trigger_proxy, dart_config, engine_cache, filter_service, secrets, cascade_delete_service):
         self._trigger_proxy = trigger_proxy
+        self._cascade_delete_service = cascade_delete_service
         self._dart_config = dart_config
-        self._engine_service = engine_service
+        self._engine_cache = engine_cache
         self._filter_service = filter_service
         self._secrets = secrets
 
@@ -24,7 +23,7 @@ class DatastoreService(object):
         """ :type datastore: dart.model.datastore.Datastore """
         schema = self.get_schema(datastore)
         datastore = self.default_and_validate_datastore(datastore, schema)
-        datastore.id = random_id()
+        datastore.id = new_id()
 
         secrets = {}
         datastore_dict = datastore.to_dict()
@@ -51,9 +50,10 @@ class DatastoreService(object):
         return default_and_validate(datastore, schema or self.get_schema(datastore))
 
     def get_schema(self, datastore):
-        engine = self._engine_service.get_engine_by_name(datastore.data.engine_name)
-        assert isinstance(engine, Engine)
-        schema = datastore_schema(engine.data.options_json_schema)
+        schema = self._engine_cache.get_datastore_schema(datastore.data.engine_name)
+        if not schema:
+            # raises for an unknown engine
+            self._engine_cache.get_engine_by_name(datastore.data.engine_name)
         return schema
 
     def patch_datastore(self, source_datastore, datastore):
@@ -114,17 +114,11 @@ class DatastoreService(object):
 
     def _query_datastore_query(self, filters):
         query = DatastoreDao.query.order_by(desc(DatastoreDao.updated))
+        datastore_schemas = self._engine_cache.all_datastore_schemas() if filters else []
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, DatastoreDao, self._get_datastore_schemas())
+            query = self._filter_service.apply_filter(f, query, DatastoreDao, datastore_schemas)
         return query
 
-    def _get_datastore_schemas(self):
-        options_schemas = []
-        for engine in self._engine_service.query_engines([], 1000, 0):
-            options_schemas.append(engine.data.options_json_schema)
-        datastore_schemas = [datastore_schema(s) for s in options_schemas]
-        return datastore_schemas
-
     def update_datastore_state(self, datastore, state):
         source_datastore = datastore.copy()
         datastore.data.state = state
@@ -146,18 +140,15 @@ class DatastoreService(object):
         datastore.data.connection_url = connection_url
         return patch_difference(DatastoreDao, source_datastore, datastore)
 
-    @staticmethod
-    @retry_stale_data
-    def delete_datastore(datastore_id):
-        datastore_dao = DatastoreDao.query.get(datastore_id)
-        db.session.delete(datastore_dao)
-        db.session.commit()
+    def delete_datastore(self, datastore_id):
+        """ deletes the datastore along with its archived actions """
+        return self._cascade_delete_service.delete_or_defer('datastore', datastore_id)
 
     def handle_datastore_state_change(self, datastore, previous_state, updated_state):
         if previous_state != DatastoreState.ACTIVE and updated_state == DatastoreState.ACTIVE:
             self._trigger_proxy.try_next_action(datastore.id)
 
-    def clone_datastore(self, source_datastore, **data_property_overrides):
+    def clone_datastore(self, source_datastore, commit=True, **data_property_overrides):
         datastore = Datastore.from_dict(source_datastore.to_dict())
         datastore.data.state = DatastoreState.INACTIVE
         datastore.data.host = None
@@ -171,8 +162,11 @@ class DatastoreService(object):
             setattr(datastore.data, k, v)
 
         datastore_dao = DatastoreDao()
-        datastore_dao.id = random_id()
+        datastore_dao.id = new_id()
         datastore_dao.data = datastore.data.to_dict()
         db.session.add(datastore_dao)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
         return datastore_dao.to_model()
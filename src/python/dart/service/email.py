@@ -1,7 +1,11 @@
+import json
 import logging
 from mailer import Mailer, Message
-from retrying import retry
+from sqlalchemy import text
+from dart.context.database import db
 from dart.context.locator import injectable
+from dart.model.email import OutboxEmailState
+from dart.util.rand import new_id
 
 
 _logger = logging.getLogger(__name__)
@@ -17,30 +21,60 @@ class Emailer(object):
         self._cc_on_error = email_config['cc_on_error']
         self._debug = email_config.get('debug', False)
         self._suppress_send = email_config.get('suppress_send', False)
+        # emails sharing a digest key (e.g. failures within one workflow instance) are held this long so that a
+        # burst of them is delivered as a single email
+        self._digest_window_seconds = email_config.get('outbox', {}).get('digest_window_seconds', 60)
 
-    # we experience occasional gmail API issues, so we will retry a few times
-    @retry(wait_fixed=10000, stop_max_attempt_number=12)
-    def send_email(self, subject, body, to, cc=None):
-        msg = Message(From=self._from, To=to, Subject=self._env_name + ' - ' + subject, Body=body, CC=cc)
+    def send_email(self, subject, body, to, cc=None, digest_key=None):
+        """ adds the email to the outbox, from which the EmailOutboxSender delivers it asynchronously.  The caller
+            commits, so that the email is only sent if the change it reports is committed too. """
+        sql = """
+            INSERT INTO email_outbox (id, version_id, created, updated, subject, body, to_addresses, cc_addresses,
+                                      digest_key, state, attempts, next_attempt)
+            SELECT :id, 0, NOW(), NOW(), :subject, :body, CAST(:to_addresses AS JSONB), CAST(:cc_addresses AS JSONB),
+                   :digest_key, :state, 0,
+                   CASE WHEN :digest_key IS NULL THEN NOW()
+                        ELSE COALESCE((SELECT MIN(next_attempt)
+                                       FROM email_outbox
+                                       WHERE digest_key = :digest_key AND state = :state),
+                                      NOW() + :digest_window_seconds * INTERVAL '1 second')
+                   END
+            """
+        statement = text(sql).bindparams(
+            id=new_id(),
+            subject=self._env_name + ' - ' + subject,
+            body=body,
+            to_addresses=json.dumps(_as_list(to)),
+            cc_addresses=json.dumps(_as_list(cc)),
+            digest_key=digest_key,
+            state=OutboxEmailState.PENDING,
+            digest_window_seconds=self._digest_window_seconds,
+        )
+        db.session.execute(statement)
+
+    def deliver_email(self, subject, body, to, cc=None):
+        """ sends the email immediately, raising on failure (see EmailOutboxSender) """
+        msg = Message(From=self._from, To=to, Subject=subject, Body=body, CC=cc or None)
         if self._suppress_send:
             _logger.info('email suppressed: subject=%s' % msg.Subject)
             return
         self._mailer.send(msg, self._debug)
 
-    def send_error_email(self, subject, body, to=None):
+    def send_error_email(self, subject, body, to=None, digest_key=None):
         cc = None
         if to:
             cc = self._cc_on_error
         else:
             to = self._cc_on_error
-        self.send_email(subject, body, to, cc=cc)
+        self.send_email(subject, body, to, cc=cc, digest_key=digest_key)
 
     def send_action_failed_email(self, action, datastore):
         values = (action.id, action.data.action_type_name, datastore.id, datastore.data.name, action.data.error_message)
         self.send_error_email(
             'Dart: action (id=%s, name=%s) FAILED' % (action.id, action.data.action_type_name),
             'action (id=%s, name=%s) FAILED for datastore (id=%s, name=%s)\n\n%s' % values,
-            action.data.on_failure_email
+            action.data.on_failure_email,
+            _workflow_instance_failure_digest_key(action.data.workflow_instance_id)
         )
 
     def send_action_completed_email(self, action, datastore):
@@ -56,7 +90,8 @@ class Emailer(object):
         self.send_error_email(
             'Dart: workflow (id=%s, name=%s) FAILED' % (workflow.id, workflow.data.name),
             'workflow (id=%s, name=%s) FAILED for instance (id=%s)\n\n%s' % values,
-            workflow.data.on_failure_email
+            workflow.data.on_failure_email,
+            _workflow_instance_failure_digest_key(wf_instance.id)
         )
 
     def send_workflow_completed_email(self, workflow, wf_instance):
@@ -90,3 +125,13 @@ class Emailer(object):
             'subscription (id=%s, name=%s) COMPLETED' % values,
             subscription.data.on_success_email
         )
+
+
+def _as_list(addresses):
+    if not addresses:
+        return []
+    return [addresses] if isinstance(addresses, basestring) else list(addresses)
+
+
+def _workflow_instance_failure_digest_key(workflow_instance_id):
+    return 'workflow_instance_failure:%s' % workflow_instance_id if workflow_instance_id else None
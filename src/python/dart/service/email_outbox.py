@@ -0,0 +1,149 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.email import OutboxEmailState
+
+_logger = logging.getLogger(__name__)
+
+
+@injectable
+class EmailOutboxSender(object):
+    """ delivers the emails queued by Emailer.send_email from a background thread, so that mail server problems
+        delay emails rather than trigger processing.  Several processes can run a sender, since emails are claimed
+        with a lease before they are sent.  Claimed emails with the same digest key and recipients are combined. """
+
+    def __init__(self, emailer, dart_config):
+        self._emailer = emailer
+        outbox_config = dart_config['email'].get('outbox', {})
+        self._poll_seconds = outbox_config.get('poll_seconds', 5)
+        self._batch_size = outbox_config.get('batch_size', 50)
+        self._lease_seconds = outbox_config.get('lease_seconds', 300)
+        self._max_attempts = outbox_config.get('max_attempts', 12)
+        self._max_retry_delay_seconds = outbox_config.get('max_retry_delay_seconds', 3600)
+        self._retention_days = outbox_config.get('retention_days', 7)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._purged_at = 0
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='email-outbox-sender')
+        self._thread.daemon = True
+        self._thread.start()
+        _logger.info('started the email outbox sender')
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                # keep going without waiting while there is a backlog
+                if self.send_pending_emails() >= self._batch_size:
+                    continue
+                if time.time() - self._purged_at > 3600:
+                    self._purge_sent_emails()
+                    self._purged_at = time.time()
+            except Exception:
+                _logger.error(json.dumps(traceback.format_exc()))
+            finally:
+                db.session.rollback()
+            self._stopped.wait(self._poll_seconds)
+        db.session.remove()
+
+    def send_pending_emails(self):
+        """ :return: the number of outbox emails that were claimed
+            :rtype: int """
+        rows = self._claim_emails()
+        groups = OrderedDict()
+        for row in rows:
+            key = (row.digest_key or row.id, json.dumps(row.to_addresses), json.dumps(row.cc_addresses))
+            groups.setdefault(key, []).append(row)
+
+        for group in groups.values():
+            ids = [row.id for row in group]
+            subject, body = _combine(group)
+            try:
+                self._emailer.deliver_email(subject, body, group[0].to_addresses, group[0].cc_addresses)
+                self._mark_sent(ids)
+            except Exception as e:
+                _logger.error(json.dumps(traceback.format_exc()))
+                self._mark_failed_attempt(ids, max(row.attempts for row in group), str(e))
+        return len(rows)
+
+    def _claim_emails(self):
+        # the state/next_attempt conditions are repeated outside of the subquery because postgres re-evaluates them
+        # against rows that a concurrent sender has just claimed, which keeps two senders from claiming the same row
+        sql = """
+            UPDATE email_outbox
+            SET state = :sending, attempts = attempts + 1, updated = NOW(), version_id = version_id + 1,
+                next_attempt = NOW() + :lease_seconds * INTERVAL '1 second'
+            WHERE id IN (
+                SELECT id
+                FROM email_outbox
+                WHERE state IN (:pending, :sending) AND next_attempt <= NOW()
+                ORDER BY next_attempt, created
+                LIMIT :batch_size
+            )
+            AND state IN (:pending, :sending) AND next_attempt <= NOW()
+            RETURNING id, created, subject, body, to_addresses, cc_addresses, digest_key, attempts
+            """
+        statement = text(sql).bindparams(
+            sending=OutboxEmailState.SENDING,
+            pending=OutboxEmailState.PENDING,
+            lease_seconds=self._lease_seconds,
+            batch_size=self._batch_size,
+        )
+        rows = db.session.execute(statement).fetchall()
+        db.session.commit()
+        return sorted(rows, key=lambda r: r.created)
+
+    @staticmethod
+    def _mark_sent(ids):
+        sql = """
+            UPDATE email_outbox
+            SET state = :state, updated = NOW(), version_id = version_id + 1, error_message = NULL
+            WHERE id = ANY(:ids)
+            """
+        db.session.execute(text(sql).bindparams(state=OutboxEmailState.SENT, ids=ids))
+        db.session.commit()
+
+    def _mark_failed_attempt(self, ids, attempts, error_message):
+        if attempts >= self._max_attempts:
+            _logger.error('giving up on outbox emails %s after %s attempts' % (ids, attempts))
+            state, retry_delay_seconds = OutboxEmailState.FAILED, 0
+        else:
+            state = OutboxEmailState.PENDING
+            retry_delay_seconds = min(30 * 2 ** (attempts - 1), self._max_retry_delay_seconds)
+        sql = """
+            UPDATE email_outbox
+            SET state = :state, updated = NOW(), version_id = version_id + 1, error_message = :error_message,
+                next_attempt = NOW() + :retry_delay_seconds * INTERVAL '1 second'
+            WHERE id = ANY(:ids)
+            """
+        statement = text(sql).bindparams(state=state, error_message=error_message,
+                                         retry_delay_seconds=retry_delay_seconds, ids=ids)
+        db.session.execute(statement)
+        db.session.commit()
+
+    def _purge_sent_emails(self):
+        sql = "DELETE FROM email_outbox WHERE state = :state AND updated < NOW() - :days * INTERVAL '1 day'"
+        db.session.execute(text(sql).bindparams(state=OutboxEmailState.SENT, days=self._retention_days))
+        db.session.commit()
+
+
+def _combine(rows):
+    if len(rows) == 1:
+        return rows[0].subject, rows[0].body
+    subject = '%s (and %s more)' % (rows[0].subject, len(rows) - 1)
+    body = ('\n\n' + '-' * 80 + '\n\n').join(row.subject + '\n\n' + row.body for row in rows)
+    return subject, body
@@ -6,6 +6,7 @@ from psycopg2._psycopg import IntegrityError as PostgresIntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
 from dart.context.locator import injectable
+from dart.model.cache_version import CacheVersions
 from dart.model.exception import DartValidationException
 from dart.model.orm import EngineDao, SubGraphDefinitionDao
 from dart.context.database import db
@@ -13,14 +14,18 @@ from dart.schema.action import action_schema
 from dart.schema.base import default_and_validate
 from dart.schema.datastore import datastore_schema
 from dart.schema.engine import engine_schema, subgraph_definition_schema
+from dart.service.cache_version import increment_cache_version
 from dart.service.patcher import retry_stale_data
-from dart.util.rand import random_id
+from dart.util.rand import new_id
 
 
 @injectable
 class EngineService(object):
-    def __init__(self, filter_service, dart_config):
+    def __init__(self, filter_service, dart_config, engine_cache):
         self._filter_service = filter_service
+        self._engine_cache = engine_cache
+        # built once, since the filter service caches its work by the schemas' identity
+        self._filter_schemas = [engine_schema()]
         self._engine_taskrunner_ecs_cluster = dart_config['dart'].get('engine_taskrunner_ecs_cluster')
         self._engine_task_definition_max_total_memory_mb =\
             dart_config['dart'].get('engine_task_definition_max_total_memory_mb')
@@ -31,12 +36,14 @@ class EngineService(object):
         self._validate_ecs_task_definition(engine.data.ecs_task_definition)
 
         engine_dao = EngineDao()
-        engine_dao.id = random_id()
+        engine_dao.id = new_id()
         engine_dao.name = engine.data.name
         engine_dao.data = engine.data.to_dict()
         db.session.add(engine_dao)
         try:
+            increment_cache_version(CacheVersions.ENGINES, commit=False)
             db.session.commit()
+            self._engine_cache.invalidate()
             engine = engine_dao.to_model()
             engine.data.ecs_task_definition_arn = self._register_ecs_task_definition(engine)
             return self.update_engine_data(engine.id, engine.data)
@@ -81,7 +88,7 @@ class EngineService(object):
         schema = subgraph_definition_schema(trigger_schemas, action_schemas, ds_schema)
         subgraph_definition = default_and_validate(subgraph_definition, schema)
         subgraph_definition_dao = SubGraphDefinitionDao()
-        subgraph_definition_dao.id = random_id()
+        subgraph_definition_dao.id = new_id()
         subgraph_definition_dao.data = subgraph_definition.data.to_dict()
         subgraph_definition_dao.data['engine_name'] = engine.data.name
         db.session.add(subgraph_definition_dao)
@@ -128,7 +135,7 @@ class EngineService(object):
             return None
 
     def all_engine_names(self):
-        return [e.data.name for e in self.query_engines([], 1000, 0)]
+        return self._engine_cache.all_engine_names()
 
     def query_engines(self, filters, limit=20, offset=0):
         """ :type filters: list[dart.model.query.Filter] """
@@ -144,7 +151,7 @@ class EngineService(object):
     def _query_engine_query(self, filters):
         query = EngineDao.query.order_by(EngineDao.updated)
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, EngineDao, [engine_schema()])
+            query = self._filter_service.apply_filter(f, query, EngineDao, self._filter_schemas)
         return query
 
     def update_engine(self, engine, updated_engine):
@@ -159,18 +166,25 @@ class EngineService(object):
 
         return self.update_engine_data(engine.id, updated_engine.data)
 
+    def update_engine_data(self, engine_id, engine_data):
+        engine = self._update_engine_data(engine_id, engine_data)
+        self._engine_cache.invalidate()
+        return engine
+
     @staticmethod
     @retry_stale_data
-    def update_engine_data(engine_id, engine_data):
+    def _update_engine_data(engine_id, engine_data):
         engine_dao = EngineDao.query.get(engine_id)
         engine_dao.name = engine_data.name
         engine_dao.data = engine_data.to_dict()
+        increment_cache_version(CacheVersions.ENGINES, commit=False)
         db.session.commit()
         return engine_dao.to_model()
 
     def delete_engine(self, engine):
         self._deregister_task_definition(engine.data.ecs_task_definition_arn)
         self._delete_engine(engine)
+        self._engine_cache.invalidate()
 
     @staticmethod
     @retry_stale_data
@@ -180,4 +194,5 @@ class EngineService(object):
             .delete(synchronize_session='fetch')
         engine_dao = EngineDao.query.get(engine.id)
         db.session.delete(engine_dao)
+        increment_cache_version(CacheVersions.ENGINES, commit=False)
         db.session.commit()
@@ -0,0 +1,101 @@
+import logging
+import time
+
+from dart.context.locator import injectable
+from dart.model.cache_version import CacheVersions
+from dart.model.orm import EngineDao
+from dart.schema.action import action_schema
+from dart.schema.datastore import datastore_schema
+from dart.service.cache_version import get_cache_version
+
+_logger = logging.getLogger(__name__)
+
+
+class _EngineSnapshot(object):
+    def __init__(self, engines, version):
+        """ :type engines: list[dart.model.engine.Engine] """
+        self.engines = engines
+        self.version = version
+        self.loaded_at = time.time()
+        self.checked_at = self.loaded_at
+        self.engines_by_name = {e.data.name: e for e in engines}
+        self.action_types = {}
+        self.action_schemas = {}
+        self.datastore_schemas = {}
+        for engine in engines:
+            self.datastore_schemas[engine.data.name] = datastore_schema(engine.data.options_json_schema)
+            for action_type in engine.data.supported_action_types:
+                key = (engine.data.name, action_type.name)
+                self.action_types[key] = action_type
+                self.action_schemas[key] = action_schema(action_type.params_json_schema)
+
+
+@injectable
+class EngineCache(object):
+    """ an in-process copy of the engines, with their action types and the action and datastore schemas built from
+        them, for the code paths that read them on every request (e.g. validating new actions and applying filters).
+        It is reloaded when the ENGINES cache version has changed (see EngineService), which is checked at most once
+        per dart.engine_cache.version_check_seconds, so other processes see engine changes after that long.
+
+        The schemas are shared, so callers must not modify them. """
+
+    def __init__(self, dart_config):
+        engine_cache_config = dart_config['dart'].get('engine_cache', {})
+        # a safety net for engine modifications that bypass EngineService (e.g. migration tools)
+        self._max_age_seconds = engine_cache_config.get('max_age_seconds', 300)
+        self._version_check_seconds = engine_cache_config.get('version_check_seconds', 1)
+        self._snapshot = None
+
+    def get_engine_by_name(self, engine_name, raise_when_missing=True):
+        """ :rtype: dart.model.engine.Engine """
+        engine = self._current().engines_by_name.get(engine_name)
+        if not engine and raise_when_missing:
+            raise Exception('engine with name=%s not found' % engine_name)
+        # copies are returned since callers are free to modify the engines they are handed
+        return engine.copy() if engine else None
+
+    def all_engine_names(self):
+        return [e.data.name for e in self._current().engines]
+
+    def get_action_type(self, engine_name, action_type_name):
+        """ :rtype: dart.model.action.ActionType """
+        action_type = self._current().action_types.get((engine_name, action_type_name))
+        return action_type.copy() if action_type else None
+
+    def get_action_schema(self, engine_name, action_type_name):
+        """ :return: the action schema of the action type, or None if the engine does not support it """
+        return self._current().action_schemas.get((engine_name, action_type_name))
+
+    def all_action_schemas(self):
+        """ :return: the action schemas of every action type of every engine """
+        snapshot = self._current()
+        return [snapshot.action_schemas[(e.data.name, at.name)]
+                for e in snapshot.engines for at in e.data.supported_action_types]
+
+    def get_datastore_schema(self, engine_name):
+        return self._current().datastore_schemas.get(engine_name)
+
+    def all_datastore_schemas(self):
+        snapshot = self._current()
+        return [snapshot.datastore_schemas[e.data.name] for e in snapshot.engines]
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _current(self):
+        """ :rtype: _EngineSnapshot """
+        # a single reference is read (and replaced), so concurrent requests each see a complete snapshot
+        snapshot = self._snapshot
+        now = time.time()
+        fresh = snapshot is not None and now - snapshot.loaded_at < self._max_age_seconds
+        if fresh and now - snapshot.checked_at < self._version_check_seconds:
+            return snapshot
+        version = get_cache_version(CacheVersions.ENGINES)
+        if fresh and version is not None and version == snapshot.version:
+            snapshot.checked_at = now
+            return snapshot
+        engines = [e.to_model() for e in EngineDao.query.order_by(EngineDao.updated).all()]
+        snapshot = _EngineSnapshot(engines, version)
+        self._snapshot = snapshot
+        _logger.info('loaded %s engines into the engine cache (version=%s)' % (len(engines), version))
+        return snapshot
@@ -0,0 +1,280 @@
+import hashlib
+
+from sqlalchemy import event, text
+from sqlalchemy.orm.attributes import get_history
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.action import ActionState
+from dart.model.graph import EntityType
+from dart.model.orm import ActionDao, DatasetDao, DatastoreDao, EventDao, SubscriptionDao, TriggerDao, WorkflowDao
+
+
+class EdgeDefinition(object):
+    def __init__(self, relationship, owner_type, other_type, owner_is_parent, path, is_array=False):
+        """ an edge between an entity (the owner) and the entity whose id is at the path in the owner's data
+
+        :type relationship: str
+        :type owner_type: str
+        :type other_type: str
+        :type owner_is_parent: bool
+        :type path: list[str]
+        :type is_array: bool
+        """
+        self.relationship = relationship
+        self.owner_type = owner_type
+        self.other_type = other_type
+        self.owner_is_parent = owner_is_parent
+        self.path = path
+        self.is_array = is_array
+
+
+# the relationships of the entity graph, which the graph view used to find by scanning the entity tables at every step.
+# Only TEMPLATE actions are part of the graph.
+EDGE_DEFINITIONS = [
+    EdgeDefinition('dataset_id', EntityType.action, EntityType.dataset, False, ['args', 'dataset_id']),
+    EdgeDefinition('subscription_id', EntityType.action, EntityType.subscription, False, ['args', 'subscription_id']),
+    EdgeDefinition('workflow_id', EntityType.action, EntityType.workflow, False, ['workflow_id']),
+    EdgeDefinition('dataset_id', EntityType.subscription, EntityType.dataset, False, ['dataset_id']),
+    EdgeDefinition('datastore_id', EntityType.workflow, EntityType.datastore, False, ['datastore_id']),
+    EdgeDefinition('workflow_ids', EntityType.trigger, EntityType.workflow, True, ['workflow_ids'], True),
+    EdgeDefinition('completed_workflow_id', EntityType.trigger, EntityType.workflow, False,
+                   ['args', 'completed_workflow_id']),
+    EdgeDefinition('subscription_id', EntityType.trigger, EntityType.subscription, False, ['args', 'subscription_id']),
+    EdgeDefinition('event_id', EntityType.trigger, EntityType.event, False, ['args', 'event_id']),
+    EdgeDefinition('completed_trigger_ids', EntityType.trigger, EntityType.trigger, False,
+                   ['args', 'completed_trigger_ids'], True),
+]
+
+# dataset -> (TEMPLATE) action edges for actions whose args.destination_s3_path starts with the dataset's location.
+# Both entities own these edges, so they are refreshed when either one changes.
+DESTINATION_RELATIONSHIP = 'destination_s3_path'
+DESTINATION_PATH = ['args', 'destination_s3_path']
+
+GRAPH_DAOS = {
+    ActionDao: EntityType.action,
+    DatasetDao: EntityType.dataset,
+    DatastoreDao: EntityType.datastore,
+    EventDao: EntityType.event,
+    SubscriptionDao: EntityType.subscription,
+    TriggerDao: EntityType.trigger,
+    WorkflowDao: EntityType.workflow,
+}
+
+EDGE_ID_SQL = "md5({src_type} || '-' || {src_id} || ' ' || {dst_type} || '-' || {dst_id} || ' ' || {relationship})"
+
+_INSERT_SQL = """
+    INSERT INTO entity_edge (id, version_id, created, updated, src_type, src_id, dst_type, dst_id, relationship)
+    SELECT :id, 0, NOW(), NOW(), :src_type, :src_id, :dst_type, :dst_id, :relationship
+    WHERE NOT EXISTS (SELECT NULL FROM entity_edge WHERE id = :id)
+    """
+_DELETE_OWNED_SQL = """
+    DELETE FROM entity_edge
+    WHERE (src_type = :entity_type AND src_id = :id AND relationship = ANY(:src_relationships))
+       OR (dst_type = :entity_type AND dst_id = :id AND relationship = ANY(:dst_relationships))
+    """
+_DELETE_ALL_SQL = """
+    DELETE FROM entity_edge
+    WHERE (src_type = :entity_type AND src_id = ANY(:ids))
+       OR (dst_type = :entity_type AND dst_id = ANY(:ids))
+    """
+_INSERT_DESTINATION_SQL = """
+    INSERT INTO entity_edge (id, version_id, created, updated, src_type, src_id, dst_type, dst_id, relationship)
+    SELECT e.id, 0, NOW(), NOW(), e.src_type, e.src_id, e.dst_type, e.dst_id, e.relationship
+    FROM (
+        SELECT {edge_id} AS id, 'dataset' AS src_type, d.id AS src_id, 'action' AS dst_type, a.id AS dst_id,
+               CAST(:relationship AS TEXT) AS relationship
+        FROM dataset d, action a
+        WHERE {condition}
+          AND a.data->>'state' = :template_state
+          AND a.data #>> '{{args,destination_s3_path}}' LIKE ((d.data->>'location') || '%')
+    ) e
+    WHERE NOT EXISTS (SELECT NULL FROM entity_edge x WHERE x.id = e.id)
+    """
+_REBUILD_SQL = """
+    INSERT INTO entity_edge (id, version_id, created, updated, src_type, src_id, dst_type, dst_id, relationship)
+    SELECT e.id, 0, NOW(), NOW(), e.src_type, e.src_id, e.dst_type, e.dst_id, e.relationship
+    FROM (
+        SELECT DISTINCT {edge_id} AS id, {src_type} AS src_type, {src_id} AS src_id, {dst_type} AS dst_type,
+               {dst_id} AS dst_id, CAST(:relationship AS TEXT) AS relationship
+        FROM {owner_type} o
+        CROSS JOIN LATERAL {other_ids} v(other_id)
+        WHERE {condition}
+          AND COALESCE(v.other_id, '') <> ''
+    ) e
+    WHERE NOT EXISTS (SELECT NULL FROM entity_edge x WHERE x.id = e.id)
+    """
+
+
+def edge_id(src_type, src_id, dst_type, dst_id, relationship):
+    """ the same as EDGE_ID_SQL """
+    value = u'%s-%s %s-%s %s' % (src_type, src_id, dst_type, dst_id, relationship)
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def destination_sql(condition):
+    """ :param condition: restricts the dataset d and action a pairs, e.g. to one dataset
+        :return: the insert of the destination_s3_path edges """
+    edge_id_sql = EDGE_ID_SQL.format(src_type="'dataset'", src_id='d.id', dst_type="'action'", dst_id='a.id',
+                                     relationship='CAST(:relationship AS TEXT)')
+    return _INSERT_DESTINATION_SQL.format(edge_id=edge_id_sql, condition=condition)
+
+
+def delete_edges_statement(entity_type, ids):
+    """ :return: the delete of every edge of the entities, for entities deleted without the ORM """
+    return text(_DELETE_ALL_SQL).bindparams(entity_type=entity_type, ids=ids)
+
+
+def _value(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _is_graph_entity(entity_type, data):
+    return entity_type != EntityType.action or data.get('state') == ActionState.TEMPLATE
+
+
+def _owned_edges(entity_type, entity_id, data):
+    """ :return: the (src_type, src_id, dst_type, dst_id, relationship) edges that the entity's data defines, except
+                 for the destination_s3_path edges """
+    edges = set()
+    for d in EDGE_DEFINITIONS:
+        if d.owner_type != entity_type:
+            continue
+        value = _value(data, d.path)
+        other_ids = (value if isinstance(value, list) else []) if d.is_array else [value]
+        for other_id in other_ids:
+            if not other_id:
+                continue
+            if d.owner_is_parent:
+                edges.add((entity_type, entity_id, d.other_type, other_id, d.relationship))
+            else:
+                edges.add((d.other_type, other_id, entity_type, entity_id, d.relationship))
+    return edges
+
+
+def _edge_key(entity_type, data):
+    """ :return: everything in the data that the entity's edges depend on """
+    key = [_is_graph_entity(entity_type, data)] + [_value(data, d.path) for d in EDGE_DEFINITIONS
+                                                     if d.owner_type == entity_type]
+    if entity_type == EntityType.action:
+        key.append(_value(data, DESTINATION_PATH))
+    if entity_type == EntityType.dataset:
+        key.append(data.get('location'))
+    return key
+
+
+def _owned_relationships(entity_type, owner_is_parent):
+    relationships = [d.relationship for d in EDGE_DEFINITIONS
+                     if d.owner_type == entity_type and d.owner_is_parent == owner_is_parent]
+    if entity_type == EntityType.dataset and owner_is_parent:
+        relationships.append(DESTINATION_RELATIONSHIP)
+    if entity_type == EntityType.action and not owner_is_parent:
+        relationships.append(DESTINATION_RELATIONSHIP)
+    return relationships
+
+
+def _refresh_edges(connection, entity_type, entity_id, data):
+    for src_type, src_id, dst_type, dst_id, relationship in _owned_edges(entity_type, entity_id, data):
+        connection.execute(text(_INSERT_SQL).bindparams(
+            id=edge_id(src_type, src_id, dst_type, dst_id, relationship), src_type=src_type, src_id=src_id,
+            dst_type=dst_type, dst_id=dst_id, relationship=relationship))
+
+    if entity_type == EntityType.action and _value(data, DESTINATION_PATH):
+        statement = text(destination_sql('a.id = :id')).bindparams(
+            id=entity_id, relationship=DESTINATION_RELATIONSHIP, template_state=ActionState.TEMPLATE)
+        connection.execute(statement)
+    if entity_type == EntityType.dataset and data.get('location'):
+        statement = text(destination_sql('d.id = :id')).bindparams(
+            id=entity_id, relationship=DESTINATION_RELATIONSHIP, template_state=ActionState.TEMPLATE)
+        connection.execute(statement)
+
+
+def _insert_listener(entity_type):
+    def listener(mapper, connection, target):
+        data = target.data or {}
+        if _is_graph_entity(entity_type, data):
+            _refresh_edges(connection, entity_type, target.id, data)
+    return listener
+
+
+def _update_listener(entity_type):
+    def listener(mapper, connection, target):
+        data = target.data or {}
+        history = get_history(target, 'data')
+        if not history.has_changes():
+            return
+        previous_data = (history.deleted[0] if history.deleted else None) or {}
+        if not _is_graph_entity(entity_type, data) and not _is_graph_entity(entity_type, previous_data):
+            return
+        # most updates are state changes, which leave the edges as they are
+        if history.deleted and _edge_key(entity_type, previous_data) == _edge_key(entity_type, data):
+            return
+        connection.execute(text(_DELETE_OWNED_SQL).bindparams(
+            entity_type=entity_type, id=target.id,
+            src_relationships=_owned_relationships(entity_type, True),
+            dst_relationships=_owned_relationships(entity_type, False)))
+        if _is_graph_entity(entity_type, data):
+            _refresh_edges(connection, entity_type, target.id, data)
+    return listener
+
+
+def _delete_listener(entity_type):
+    def listener(mapper, connection, target):
+        if _is_graph_entity(entity_type, target.data or {}):
+            connection.execute(delete_edges_statement(entity_type, [target.id]))
+    return listener
+
+
+for _dao, _entity_type in GRAPH_DAOS.items():
+    event.listen(_dao, 'after_insert', _insert_listener(_entity_type))
+    event.listen(_dao, 'after_update', _update_listener(_entity_type))
+    event.listen(_dao, 'after_delete', _delete_listener(_entity_type))
+
+
+@injectable
+class EntityEdgeService(object):
+    """ the entity_edge table holds the parent -> child edges between the entities of the graph view (see
+        EDGE_DEFINITIONS), kept in the same transactions as the entities by ORM events (and by CascadeDeleteService),
+        so that dart.service.graph.entity.GraphEntityService walks indexed edges rather than the entity tables """
+
+    @staticmethod
+    def rebuild():
+        """ replaces every edge with the edges derived from the entities, in one transaction (e.g. to backfill the
+            table, see dart.tool.migration.build_entity_edges)
+
+            :return: the number of edges per relationship
+            :rtype: dict[str, int] """
+        counts = {}
+        db.session.execute('DELETE FROM entity_edge')
+        for d in EDGE_DEFINITIONS:
+            owner = ("'%s'" % d.owner_type, 'o.id')
+            other = ("'%s'" % d.other_type, 'v.other_id')
+            (src_type, src_id), (dst_type, dst_id) = (owner, other) if d.owner_is_parent else (other, owner)
+            path = "'{%s}'" % ','.join(d.path)
+            if d.is_array:
+                other_ids = "jsonb_array_elements_text(CASE WHEN jsonb_typeof(o.data #> {path}) = 'array' " \
+                            "THEN o.data #> {path} ELSE CAST('[]' AS JSONB) END)".format(path=path)
+            else:
+                other_ids = '(SELECT o.data #>> {path})'.format(path=path)
+            params = {'relationship': d.relationship}
+            condition = 'TRUE'
+            if d.owner_type == EntityType.action:
+                condition = "o.data ->> 'state' = :template_state"
+                params['template_state'] = ActionState.TEMPLATE
+            sql = _REBUILD_SQL.format(
+                edge_id=EDGE_ID_SQL.format(src_type=src_type, src_id=src_id, dst_type=dst_type, dst_id=dst_id,
+                                           relationship='CAST(:relationship AS TEXT)'),
+                src_type=src_type, src_id=src_id, dst_type=dst_type, dst_id=dst_id, owner_type=d.owner_type,
+                other_ids=other_ids, condition=condition)
+            count = db.session.execute(text(sql).bindparams(**params)).rowcount
+            counts[d.relationship] = counts.get(d.relationship, 0) + count
+
+        statement = text(destination_sql('TRUE')).bindparams(relationship=DESTINATION_RELATIONSHIP,
+                                                             template_state=ActionState.TEMPLATE)
+        counts[DESTINATION_RELATIONSHIP] = db.session.execute(statement).rowcount
+        db.session.commit()
+        return counts
@@ -0,0 +1,135 @@
+from sqlalchemy import event, func, select, text
+
+from dart.context.database import db, config
+from dart.context.locator import injectable
+from dart.model.action import ActionState
+from dart.model.graph import GraphEntityIdentifier
+from dart.model.orm import ActionDao, DatasetDao, DatastoreDao, EntitySearchDao, EventDao, SubscriptionDao, \
+    TriggerDao, WorkflowDao
+from dart.service.graph.sql_misc import ENTITY_IDENTIFIER_SQL
+
+# until this is set, the entity_search table is neither read nor written and searches scan the entity tables as
+# before.  Existing deployments set it once dart.tool.migration.build_entity_search has built the table.
+ENTITY_SEARCH_ENABLED = config['dart'].get('entity_search_enabled', False)
+
+# the entities that are searchable, by dao.  Only TEMPLATE actions are searchable, since the others are numerous
+# and are found through their workflows and datastores.
+SEARCHABLE_DAOS = {
+    ActionDao: 'action',
+    DatasetDao: 'dataset',
+    DatastoreDao: 'datastore',
+    EventDao: 'event',
+    SubscriptionDao: 'subscription',
+    TriggerDao: 'trigger',
+    WorkflowDao: 'workflow',
+}
+
+_INSERT_SQL = """
+    INSERT INTO entity_search (id, version_id, created, updated, entity_type, name, search_text)
+    VALUES (:id, 0, NOW(), NOW(), :entity_type, :name, :search_text)
+    """
+# rows for entities that predate the entity_search table are added by dart.tool.migration.build_entity_search, so
+# an update never has to insert (and so never races another transaction's insert)
+_UPDATE_SQL = """
+    UPDATE entity_search
+    SET version_id = version_id + 1, updated = NOW(), name = :name, search_text = :search_text
+    WHERE id = :id AND name IS DISTINCT FROM :name
+    """
+_DELETE_SQL = 'DELETE FROM entity_search WHERE id = :id'
+
+_SEARCH_SQL = """
+    SELECT entity_type, id, name
+    FROM entity_search
+    WHERE search_text LIKE :pattern
+    ORDER BY CASE WHEN lower(id) = :search OR lower(name) = :search THEN 0
+                  WHEN lower(id) LIKE :prefix OR lower(name) LIKE :prefix THEN 1
+                  ELSE 2
+             END,
+             similarity(search_text, :search) DESC,
+             name
+    LIMIT :limit
+    """
+
+
+def search_text(entity_id, name):
+    return ('%s %s' % (entity_id, name or '')).lower()
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _is_searchable(entity_type, target):
+    return entity_type != 'action' or (target.data or {}).get('state') == ActionState.TEMPLATE
+
+
+def _insert_listener(entity_type):
+    def listener(mapper, connection, target):
+        if _is_searchable(entity_type, target):
+            name = (target.data or {}).get('name')
+            connection.execute(text(_INSERT_SQL).bindparams(id=target.id, entity_type=entity_type, name=name,
+                                                            search_text=search_text(target.id, name)))
+    return listener
+
+
+def _update_listener(entity_type):
+    def listener(mapper, connection, target):
+        if _is_searchable(entity_type, target):
+            name = (target.data or {}).get('name')
+            statement = text(_UPDATE_SQL).bindparams(id=target.id, name=name, search_text=search_text(target.id, name))
+            connection.execute(statement)
+    return listener
+
+
+def _delete_listener(entity_type):
+    def listener(mapper, connection, target):
+        if _is_searchable(entity_type, target):
+            connection.execute(text(_DELETE_SQL).bindparams(id=target.id))
+    return listener
+
+
+if ENTITY_SEARCH_ENABLED:
+    for _dao, _entity_type in SEARCHABLE_DAOS.items():
+        event.listen(_dao, 'after_insert', _insert_listener(_entity_type))
+        event.listen(_dao, 'after_update', _update_listener(_entity_type))
+        event.listen(_dao, 'after_delete', _delete_listener(_entity_type))
+
+
+@injectable
+class EntitySearchService(object):
+    """ the entity_search table holds the id and name of every searchable entity (see SEARCHABLE_DAOS), kept in the
+        same transactions as the entities by ORM events (and by CascadeDeleteService), with a trigram index on
+        lower(id || ' ' || name) so that substring searches do not scan the entity tables (once
+        dart.entity_search_enabled is set) """
+
+    @staticmethod
+    def search(search, limit=20):
+        """ :return: the entities whose id or name contains the search string
+            :rtype: list[dart.model.graph.GraphEntityIdentifier] """
+        if ENTITY_SEARCH_ENABLED:
+            return EntitySearchService.search_entity_search(search, limit)
+        return EntitySearchService.search_entity_tables(search, limit)
+
+    @staticmethod
+    def search_entity_search(search, limit):
+        """ :return: the matches in the entity_search table, with exact matches first, then prefix matches, then by
+                     trigram similarity
+            :rtype: list[dart.model.graph.GraphEntityIdentifier] """
+        search = search.lower()
+        statement = text(_SEARCH_SQL).bindparams(search=search, pattern='%' + escape_like(search) + '%',
+                                                 prefix=escape_like(search) + '%', limit=limit)
+        return [GraphEntityIdentifier(*r) for r in db.session.execute(statement)]
+
+    @staticmethod
+    def search_entity_tables(search, limit):
+        """ :return: the matches found by scanning each entity table, in no particular order
+            :rtype: list[dart.model.graph.GraphEntityIdentifier] """
+        statement = text(ENTITY_IDENTIFIER_SQL).bindparams(search=search, limit=limit)
+        return [GraphEntityIdentifier(*r) for r in db.session.execute(statement)]
+
+    @staticmethod
+    def searchable_ids(dao, pattern):
+        """ :return: a select of the ids of the dao's entities whose lowercase name is LIKE the pattern """
+        return select([EntitySearchDao.id])\
+            .where(EntitySearchDao.entity_type == SEARCHABLE_DAOS[dao])\
+            .where(func.lower(EntitySearchDao.name).like(pattern))
@@ -5,13 +5,15 @@ from dart.context.database import db
 from dart.schema.base import default_and_validate
 from dart.schema.event import event_schema
 from dart.service.patcher import patch_difference, retry_stale_data
-from dart.util.rand import random_id
+from dart.util.rand import new_id
 
 
 @injectable
 class EventService(object):
     def __init__(self, filter_service):
         self._filter_service = filter_service
+        # built once, since the filter service caches its work by the schemas' identity
+        self._filter_schemas = [event_schema()]
 
     @staticmethod
     def save_event(event, commit=True, flush=False):
@@ -19,7 +21,7 @@ class EventService(object):
         event = default_and_validate(event, event_schema())
 
         event_dao = EventDao()
-        event_dao.id = random_id()
+        event_dao.id = new_id()
         event_dao.data = event.data.to_dict()
         db.session.add(event_dao)
         if flush:
@@ -62,12 +64,12 @@ class EventService(object):
     def _query_event_query(self, filters):
         query = EventDao.query.order_by(desc(EventDao.updated))
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, EventDao, [event_schema()])
+            query = self._filter_service.apply_filter(f, query, EventDao, self._filter_schemas)
         return query
 
     @staticmethod
-    def patch_event(source_event, event):
-        event = patch_difference(EventDao, source_event, event)
+    def patch_event(source_event, event, commit=True):
+        event = patch_difference(EventDao, source_event, event, commit)
         return event
 
     @staticmethod
@@ -1,6 +1,7 @@
 from abc import abstractmethod
 import copy
 import re
+import threading
 
 from sqlalchemy import Float, Integer, text, exists, select, or_
 from sqlalchemy.dialects.postgresql import JSONB
@@ -9,7 +10,10 @@ from sqlalchemy.sql.operators import is_
 
 from dart.context.locator import injectable
 from dart.model.exception import DartValidationException
+from dart.model.orm import ActionDao
 from dart.model.query import Operator, Filter
+from dart.service.entity_search import ENTITY_SEARCH_ENABLED, SEARCHABLE_DAOS, EntitySearchService
+from dart.util.lru_cache import LruCache
 
 
 @injectable
@@ -27,10 +31,11 @@ class FilterService(object):
             Operator.LIKE: OperatorLike(),
             Operator.SEARCH: OperatorSearch(),
         }
+        self._pattern = re.compile(r'\s*(\S+?)\s*(' + '|'.join(self._operator_handlers.keys()) + ')\s*(\S+)\s*')
+        self._plans = SchemaPlanCache()
 
     def from_string(self, f_string):
-        pattern = re.compile(r'\s*(\S+?)\s*(' + '|'.join(self._operator_handlers.keys()) + ')\s*(\S+)\s*')
-        m = pattern.match(f_string)
+        m = self._pattern.match(f_string)
         try:
             return Filter(m.group(1), m.group(2), m.group(3))
         except:
@@ -42,9 +47,22 @@ class FilterService(object):
         if f.key in ['id', 'created', 'updated']:
             return query.filter(op.evaluate(lambda v: v, getattr(dao, f.key), str, f.value))
 
+        # name searches read the narrow entity_search table rather than the JSONB of every row (except for actions,
+        # since only the TEMPLATE actions are in it)
+        if ENTITY_SEARCH_ENABLED and f.operator == Operator.SEARCH and f.key == 'name' and dao in SEARCHABLE_DAOS \
+                and dao is not ActionDao:
+            pattern = OperatorSearch.pattern(f.value).lower()
+            return query.filter(dao.id.in_(EntitySearchService.searchable_ids(dao, pattern)))
+
         # at this point, assume we are dealing with a data/JSONB filter
-        path_keys = f.key.split('.')
-        filters = []
+        plan = self._plans.get(dao, schemas, f.key, self._plan)
+        filters = [self.expr(0, dao.data, p, f.value, op) for p in plan]
+        return query.filter(filters[0]) if len(filters) == 1 else query.filter(or_(*filters))
+
+    def _plan(self, schemas, key):
+        """ :return: a _FilterPlan for each distinct (type, array indexes) that the key has in the schemas """
+        path_keys = key.split('.')
+        plan = []
         visited = {}
         for schema in schemas:
             type_, array_indexes = self._get_type(path_keys, schema)
@@ -54,29 +72,27 @@ class FilterService(object):
             visited[identifier] = 1
             key_groups = self.get_key_groups(array_indexes, path_keys)
             last_is_array = array_indexes[-1] == len(path_keys) - 1 if len(array_indexes) > 0 else False
-            filters.append(self.expr(0, 'data', dao.data, key_groups, type_, f.value, op, last_is_array))
-        return query.filter(filters[0]) if len(filters) == 1 else query.filter(or_(*filters))
-
-    def expr(self, i, alias, col, key_groups, t, v, op, last_is_array):
-        if i < len(key_groups) - 1:
-            subq, c = self.get_subquery(alias, i, key_groups)
-            subq = subq.where(self.expr(i + 1, 'dart_a_%s.value' % i, c, key_groups, t, v, op, last_is_array))
+            plan.append(_FilterPlan(type_, key_groups, last_is_array))
+        return plan
+
+    def expr(self, i, col, plan, v, op):
+        """ :type plan: _FilterPlan """
+        if i < len(plan.key_groups) - 1:
+            subq, c = plan.subquery(i)
+            subq = subq.where(self.expr(i + 1, c, plan, v, op))
             return exists(subq)
-        if last_is_array:
-            subq, c = self.get_subquery(alias, i, key_groups, True)
-            subq = subq.where(op.evaluate(lambda x: x, c, _python_cast(t), v))
+        if plan.last_is_array:
+            subq, c = plan.subquery(i, True)
+            subq = subq.where(op.evaluate(lambda x: x, c, plan.python_cast, v))
             return exists(subq)
-        return op.evaluate(_pg_cast(t), col[key_groups[i]], _python_cast(t), v)
+        return op.evaluate(plan.pg_cast, col[plan.key_groups[i]], plan.python_cast, v)
 
     @staticmethod
-    def get_subquery(alias, i, key_groups, as_text=False):
-        c = column('value', JSONB)
+    def get_subquery_from(alias, i, key_groups, as_text=False):
         bindvars = {'dart_var_%s' % i: '{' + ','.join(key_groups[i]) + '}'}
         suffix = '_text' if as_text else ''
         from_expr = text('jsonb_array_elements%s(%s #> :dart_var_%s) as dart_a_%s' % (suffix, alias, i, i))
-        from_expr = from_expr.bindparams(**bindvars)
-        subq = select([c]).select_from(from_expr)
-        return subq, c
+        return from_expr.bindparams(**bindvars)
 
     @staticmethod
     def get_key_groups(array_indexes, path_keys):
@@ -120,6 +136,45 @@ class FilterService(object):
         return type_, array_indexes
 
 
+class _FilterPlan(object):
+    def __init__(self, type_, key_groups, last_is_array):
+        self.type_ = type_
+        self.key_groups = key_groups
+        self.last_is_array = last_is_array
+        self.pg_cast = _pg_cast(type_)
+        self.python_cast = _python_cast(type_)
+        # the FROM clauses of the jsonb_array_elements subqueries, by (level, as_text)
+        self._from_exprs = {}
+
+    def subquery(self, i, as_text=False):
+        from_expr = self._from_exprs.get((i, as_text))
+        if from_expr is None:
+            alias = 'data' if i == 0 else 'dart_a_%s.value' % (i - 1)
+            from_expr = FilterService.get_subquery_from(alias, i, self.key_groups, as_text)
+            self._from_exprs[(i, as_text)] = from_expr
+        c = column('value', JSONB)
+        return select([c]).select_from(from_expr), c
+
+
+class SchemaPlanCache(object):
+    """ a bounded cache of what FilterService and OrderByService work out from the schemas for a key, by (dao,
+        schemas, key), with the schemas identified as in LruCache.put_by_identity """
+
+    def __init__(self, max_size=1024):
+        self._lock = threading.Lock()
+        self._entries = LruCache(max_size)
+
+    def get(self, dao, schemas, key, build):
+        """ :param build: computes the value from (schemas, key) when it is not cached """
+        with self._lock:
+            value = self._entries.get_by_identity(schemas, (dao, key))
+        if value is None:
+            value = build(schemas, key)
+            with self._lock:
+                self._entries.put_by_identity(schemas, value, (dao, key))
+        return value
+
+
 class OperatorEvaluator(object):
     @abstractmethod
     def evaluate(self, lhs_cast, lhs, rhs_cast, rhs):
@@ -173,9 +228,13 @@ class OperatorLike(OperatorEvaluator):
 
 class OperatorSearch(OperatorEvaluator):
     def evaluate(self, lhs_cast, lhs, rhs_cast, rhs):
+        return lhs_cast(lhs).ilike(self.pattern(rhs))
+
+    @staticmethod
+    def pattern(rhs):
+        """ :return: a LIKE pattern matching the alphanumeric characters of rhs in order, e.g. %a%b%c% for "abc" """
         only_alphanum = re.sub(r'\W+', '', rhs)
-        search_string = '%' + '%'.join(only_alphanum) + '%'
-        return lhs_cast(lhs).ilike(search_string)
+        return '%' + '%'.join(only_alphanum) + '%'
 
 
 def _pg_cast(js_type):
@@ -1,5 +1,5 @@
 # coding=utf-8
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import json
 
 from sqlalchemy import text
@@ -10,14 +10,14 @@ from dart.model.action import Action
 from dart.model.dataset import Dataset
 from dart.model.datastore import Datastore
 from dart.model.event import Event
-from dart.model.graph import GraphEntity, Graph, Node, Edge, Relationship, GraphEntityIdentifier, SubGraph, EntityType, \
+from dart.model.graph import Graph, Node, Edge, SubGraph, EntityType, \
     SubGraphDefinition
 from dart.model.orm import SubGraphDefinitionDao
 from dart.model.subscription import Subscription
 from dart.model.trigger import Trigger
 from dart.model.workflow import Workflow
-from dart.service.graph.sql_recursive import RECURSIVE_SQL
-from dart.service.graph.sql_misc import ENTITY_IDENTIFIER_SQL, DATASTORE_ONE_OFFS_SQL, WORKFLOW_INSTANCE_SQL
+from dart.service.graph.sql_recursive import RECURSIVE_SQL, NODE_SQL, NODE_SUB_TYPES
+from dart.service.graph.sql_misc import DATASTORE_ONE_OFFS_SQL, WORKFLOW_INSTANCE_SQL
 from dart.service.graph.sub_graph import get_static_subgraphs_by_engine_name, \
     get_static_subgraphs_by_engine_name_all_engines_related_none
 from dart.util.rand import random_id
@@ -25,8 +25,10 @@ from dart.util.rand import random_id
 
 @injectable
 class GraphEntityService(object):
-    def __init__(self, engine_service, datastore_service, action_service):
+    def __init__(self, dart_config, engine_service, datastore_service, action_service, entity_search_service):
+        self._max_nodes = dart_config['dart'].get('entity_graph_max_nodes', 5000)
         self._engine_service = engine_service
+        self._entity_search_service = entity_search_service
         self._datastore_service = datastore_service
         self._action_service = action_service
 
@@ -150,10 +152,8 @@ class GraphEntityService(object):
 
         return Graph(nodes, edges)
 
-    @staticmethod
-    def get_entity_identifiers(search):
-        statement = text(ENTITY_IDENTIFIER_SQL).bindparams(search=search)
-        return [GraphEntityIdentifier(*r) for r in db.session.execute(statement)]
+    def get_entity_identifiers(self, search):
+        return self._entity_search_service.search(search)
 
     def get_entity_graph(self, entity):
         """ :type entity: dart.model.graph.GraphEntity
@@ -162,30 +162,31 @@ class GraphEntityService(object):
         statement = text(RECURSIVE_SQL).bindparams(
             entity_type=entity.entity_type,
             entity_id=entity.entity_id,
-            name=entity.name,
-            state=entity.state,
-            sub_type=entity.sub_type
+            max_nodes=self._max_nodes
         )
 
+        node_keys = set()
+        edge_keys = []
+        for entity_type, entity_id, dst_type, dst_id in db.session.execute(statement):
+            node_keys.add((entity_type, entity_id))
+            if dst_id:
+                edge_keys.append((entity_type, entity_id, dst_type, dst_id))
+
+        # an entity can refer to one that does not exist, which is left out along with its edges
+        found = self._get_nodes(node_keys)
+        root_key = (entity.entity_type, entity.entity_id)
+        root = found.get(root_key) or Node(entity.entity_type, entity.entity_id, entity.name, entity.state,
+                                           entity.sub_type)
+        found[root_key] = root
+
         visited_nodes = set()
         visited_edges = set()
         nodes = []
         edges = []
-        for e in [GraphEntity(*r) for r in db.session.execute(statement)]:
-            self._add_node(nodes, visited_nodes, e.entity_type, e.entity_id, e.name, e.state, e.sub_type)
-
-            if e.related_id:
-                if e.related_is_a == Relationship.CHILD:
-                    src_type = e.entity_type
-                    src_id = e.entity_id
-                    dst_type = e.related_type
-                    dst_id = e.related_id
-                else:
-                    src_type = e.related_type
-                    src_id = e.related_id
-                    dst_type = e.entity_type
-                    dst_id = e.entity_id
-
+        for n in [root] + found.values():
+            self._add_node(nodes, visited_nodes, n.entity_type, n.entity_id, n.name, n.state, n.sub_type)
+        for src_type, src_id, dst_type, dst_id in edge_keys:
+            if (src_type, src_id) in found and (dst_type, dst_id) in found:
                 self._add_edge(edges, visited_edges, src_type, src_id, dst_type, dst_id)
 
         # now that we have the base graph, add in the most recent workflow_instances and their actions,
@@ -224,6 +225,32 @@ class GraphEntityService(object):
 
         return Graph(nodes, edges)
 
+    @staticmethod
+    def _get_nodes(node_keys):
+        """ :return: the nodes of the entities that exist, by (entity_type, entity_id), ordered by type, then
+                     order_idx (for actions), then name
+            :rtype: dict[(str, str), dart.model.graph.Node] """
+        ids_by_type = defaultdict(list)
+        for entity_type, entity_id in node_keys:
+            ids_by_type[entity_type].append(entity_id)
+        if not ids_by_type:
+            return OrderedDict()
+
+        sql_parts = []
+        for entity_type in sorted(ids_by_type.keys()):
+            sql_parts.append('(' + NODE_SQL.format(
+                entity_type=entity_type,
+                sub_type=NODE_SUB_TYPES.get(entity_type, 'NULL'),
+                order_idx="CAST(e.data ->> 'order_idx' AS FLOAT)" if entity_type == 'action' else 'NULL'
+            ) + ')')
+        sql = '\nUNION ALL\n'.join(sql_parts) + '\nORDER BY 1, 6, 3'
+        statement = text(sql).bindparams(**{t + '_ids': ids for t, ids in ids_by_type.iteritems()})
+
+        nodes = OrderedDict()
+        for entity_type, entity_id, name, state, sub_type, order_idx in db.session.execute(statement):
+            nodes[(entity_type, entity_id)] = Node(entity_type, entity_id, name, state, sub_type)
+        return nodes
+
     @staticmethod
     def _get_datastore_one_offs(nodes):
         d_sql = ''
@@ -4,7 +4,7 @@ ENTITY_IDENTIFIER_SQL = """
         SELECT 'action', id, data ->> 'name'
           FROM action
          WHERE data ->> 'state' = 'TEMPLATE'
-           AND id iLIKE '%' || :search || '%' OR data ->> 'name' iLIKE '%' || :search || '%'
+           AND (id iLIKE '%' || :search || '%' OR data ->> 'name' iLIKE '%' || :search || '%')
 
           UNION ALL
 
@@ -30,7 +30,7 @@ ENTITY_IDENTIFIER_SQL = """
 
         SELECT 'workflow', id, data ->> 'name' FROM workflow WHERE id iLIKE '%' || :search || '%' OR data ->> 'name' iLIKE '%' || :search || '%'
     ) t
-    LIMIT 20
+    LIMIT :limit
 """
 
 DATASTORE_ONE_OFFS_SQL = """
@@ -8,15 +8,19 @@ from sqlalchemy.sql.expression import nullslast
 from dart.context.locator import injectable
 from dart.model.exception import DartValidationException
 from dart.model.query import OrderBy, Direction
+from dart.service.filter import SchemaPlanCache
+
+_PATTERN = re.compile(r'\s*(\S+?)\s+((ASC)|(DESC))\s*')
 
 
 @injectable
 class OrderByService(object):
+    def __init__(self):
+        self._types = SchemaPlanCache()
 
     @staticmethod
     def from_string(o_string):
-        pattern = re.compile(r'\s*(\S+?)\s+((ASC)|(DESC))\s*')
-        m = pattern.match(o_string)
+        m = _PATTERN.match(o_string)
         try:
             return OrderBy(m.group(1), m.group(2))
         except:
@@ -29,16 +33,16 @@ class OrderByService(object):
             return query.order_by(nullslast(dir_fn(field)))
 
         field = dao.data[order_by.key]
-        path_keys = order_by.key.split('.')
-        type_ = 'string'
+        cast = _pg_cast(self._types.get(dao, schemas, order_by.key, self._type))
+        return query.order_by(nullslast(dir_fn(cast(field))))
+
+    def _type(self, schemas, key):
+        path_keys = key.split('.')
         for schema in schemas:
             result = self._get_type(path_keys, schema)
             if result:
-                type_ = result
-                break
-        cast = _pg_cast(type_)
-        dir_fn = self._dir_fn(order_by)
-        return query.order_by(nullslast(dir_fn(cast(field))))
+                return result
+        return 'string'
 
     @staticmethod
     def _dir_fn(order_by):
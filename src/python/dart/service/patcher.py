@@ -20,13 +20,26 @@ def _retry_stale_data_error(exception):
 retry_stale_data = retry(wait_random_min=1, wait_random_max=500, retry_on_exception=_retry_stale_data_error)
 
 
-@retry_stale_data
 def patch_data(dao, model_id, patch, commit=True, conditional=None):
+    """ with commit=False the caller's transaction may hold other changes, which a rollback would silently discard,
+        so a StaleDataError is left for the caller to handle rather than rolled back and retried here """
+    if commit:
+        return _patch_data_retryable(dao, model_id, patch, conditional)
+    return _patch_data(dao, model_id, patch, False, conditional)
+
+
+@retry_stale_data
+def _patch_data_retryable(dao, model_id, patch, conditional):
+    return _patch_data(dao, model_id, patch, True, conditional)
+
+
+def _patch_data(dao, model_id, patch, commit, conditional):
     dao_instance = dao.query.get(model_id)
     model = dao_instance.to_model()
     if conditional and not conditional(model):
         raise DartConditionalUpdateFailedException('specified conditional failed')
-    patched_dict = patch.apply(model.to_dict())
+    # to_dict returns a new dict, so the patch can skip its deep copy
+    patched_dict = patch.apply(model.to_dict(), in_place=True)
     for k, v in patched_dict.iteritems():
         setattr(dao_instance, k, v)
     if commit:
@@ -0,0 +1,166 @@
+import json
+import logging
+import select
+import threading
+import time
+import traceback
+from Queue import Queue, Empty
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import event, text
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.orm import ActionDao, DatastoreDao, SubscriptionDao, WorkflowDao, WorkflowInstanceDao
+from dart.util import json_util
+
+_logger = logging.getLogger(__name__)
+
+STATE_CHANGE_CHANNEL = 'dart_state_change'
+
+# the entity types that send notifications, along with the data fields naming the other entities they belong to
+_NOTIFYING_DAOS = {
+    'action': (ActionDao, [('datastore', 'datastore_id'), ('workflow', 'workflow_id'),
+                           ('workflow_instance', 'workflow_instance_id')]),
+    'datastore': (DatastoreDao, []),
+    'workflow': (WorkflowDao, [('datastore', 'datastore_id')]),
+    'workflow_instance': (WorkflowInstanceDao, [('workflow', 'workflow_id'), ('datastore', 'datastore_id')]),
+    'subscription': (SubscriptionDao, [('dataset', 'dataset_id')]),
+}
+NOTIFYING_ENTITY_TYPES = sorted(_NOTIFYING_DAOS.keys())
+
+
+def _notify_listener(entity_type, related_fields):
+    def listener(mapper, connection, target):
+        data = target.data or {}
+        keys = [[entity_type, target.id]]
+        keys.extend([related_type, data[field]] for related_type, field in related_fields if data.get(field))
+        payload = {
+            'entity_type': entity_type,
+            'id': target.id,
+            'version_id': target.version_id,
+            'state': data.get('state'),
+            'keys': keys,
+        }
+        # delivered to listeners when (and only if) the transaction commits
+        statement = text('SELECT pg_notify(:channel, :payload)')
+        connection.execute(statement.bindparams(channel=STATE_CHANGE_CHANNEL, payload=json_util.dumps(payload)))
+    return listener
+
+
+for _entity_type, (_dao, _related_fields) in _NOTIFYING_DAOS.items():
+    event.listen(_dao, 'after_insert', _notify_listener(_entity_type, _related_fields))
+    event.listen(_dao, 'after_update', _notify_listener(_entity_type, _related_fields))
+
+
+@injectable
+class StateChangeListener(object):
+    """ every insert or update of the entities in NOTIFYING_ENTITY_TYPES (made through the ORM) sends a postgres
+        NOTIFY on the dart_state_change channel, naming the entity and the datastore/workflow/etc. it belongs to.
+        A web process LISTENs on a single connection, from a thread started by the first request that waits, and
+        hands each notification to the queues subscribed to the entities it names.  This backs the long polls
+        (wait_for_change_since) and the server-sent event streams of dart.web.api.state_change. """
+
+    def __init__(self, dart_config):
+        state_change_config = dart_config['dart'].get('state_change', {})
+        self._long_poll_max_seconds = state_change_config.get('long_poll_max_seconds', 25)
+        self._stream_max_seconds = state_change_config.get('stream_max_seconds', 300)
+        # a waiter rechecks at least this often, in case a change was made without a notification
+        self._recheck_seconds = state_change_config.get('recheck_seconds', 5)
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._thread = None
+
+    @property
+    def stream_max_seconds(self):
+        return self._stream_max_seconds
+
+    def subscribe(self, entity_type, entity_id):
+        """ :return: a queue that receives the notifications (dicts) naming the entity, and a notification without
+                     an entity_type whenever notifications may have been missed
+            :rtype: Queue.Queue """
+        queue = Queue()
+        with self._lock:
+            self._subscribers.setdefault((entity_type, entity_id), set()).add(queue)
+            if not self._thread:
+                self._thread = threading.Thread(target=self._listen, args=(db.engine,), name='state-change-listener')
+                self._thread.daemon = True
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, entity_type, entity_id, queue):
+        with self._lock:
+            queues = self._subscribers.get((entity_type, entity_id), set())
+            queues.discard(queue)
+            if not queues:
+                self._subscribers.pop((entity_type, entity_id), None)
+
+    def wait_for_change(self, entity_type, entity_id, since_version_id, get_version_id, timeout_seconds=None):
+        """ blocks until the version_id of the entity differs from since_version_id, or the timeout passes
+
+            :param get_version_id: returns the current version_id of the entity
+            :return: the current version_id """
+        max_seconds = self._long_poll_max_seconds
+        deadline = time.time() + (min(timeout_seconds, max_seconds) if timeout_seconds is not None else max_seconds)
+        queue = self.subscribe(entity_type, entity_id)
+        try:
+            while True:
+                version_id = get_version_id()
+                # do not hold a database connection while waiting
+                db.session.rollback()
+                remaining = deadline - time.time()
+                if version_id != since_version_id or remaining <= 0:
+                    return version_id
+                try:
+                    queue.get(timeout=min(remaining, self._recheck_seconds))
+                except Empty:
+                    pass
+        finally:
+            self.unsubscribe(entity_type, entity_id, queue)
+
+    def wait_for_notification(self, entity_type, entity_id, timeout_seconds=None):
+        """ :return: the next notification naming the entity, or None if the timeout passes first
+            :rtype: dict """
+        max_seconds = self._long_poll_max_seconds
+        timeout_seconds = min(timeout_seconds, max_seconds) if timeout_seconds is not None else max_seconds
+        queue = self.subscribe(entity_type, entity_id)
+        try:
+            return queue.get(timeout=timeout_seconds)
+        except Empty:
+            return None
+        finally:
+            self.unsubscribe(entity_type, entity_id, queue)
+
+    def _publish(self, notification, keys=None):
+        with self._lock:
+            if keys is None:
+                queues = set.union(set(), *self._subscribers.values())
+            else:
+                queues = set.union(set(), *[self._subscribers.get(tuple(k), set()) for k in keys])
+        for queue in queues:
+            queue.put(notification)
+
+    def _listen(self, engine):
+        while True:
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                pg_connection = connection.connection
+                pg_connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                pg_connection.cursor().execute('LISTEN %s' % STATE_CHANGE_CHANNEL)
+                # anything sent before the LISTEN was missed, so every waiter rechecks
+                self._publish({'entity_type': None, 'reconnected': True})
+                while True:
+                    if select.select([pg_connection], [], [], 60) == ([], [], []):
+                        continue
+                    pg_connection.poll()
+                    while pg_connection.notifies:
+                        notification = json_util.loads(pg_connection.notifies.pop(0).payload)
+                        self._publish(notification, notification['keys'])
+
+            except Exception:
+                _logger.error(json.dumps(traceback.format_exc()))
+                if connection:
+                    # the connection is in autocommit mode, so it must not go back to the pool
+                    connection.invalidate()
+                time.sleep(5)
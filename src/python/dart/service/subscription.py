@@ -1,20 +1,24 @@
 import logging
 
+from collections import OrderedDict
 from datetime import datetime
 import boto
-from sqlalchemy import insert, literal, not_, func, text, update, cast, String, or_, desc
+from sqlalchemy import insert, literal, not_, func, text, update, cast, String, or_, desc, table, column
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm.exc import NoResultFound
 from dart.context.locator import injectable
 from dart.model.exception import DartValidationException
-from dart.model.orm import SubscriptionDao, DatasetDao, SubscriptionElementDao, TriggerDao
+from dart.model.orm import SubscriptionDao, DatasetDao, SubscriptionElementDao, TriggerDao, \
+    SubscriptionElementArchiveDao
 from dart.context.database import db
 from dart.model.subscription import SubscriptionElementState, SubscriptionState, SubscriptionElementStats
 from dart.schema.base import default_and_validate
 from dart.schema.subscription import subscription_schema
-from dart.service.patcher import patch_difference, retry_stale_data
+from dart.service.archive import query_with_archive
+from dart.service.patcher import patch_difference
 from dart.trigger.subscription import subscription_batch_trigger
-from dart.util.rand import random_id
+from dart.util.query_stream import query_results
+from dart.util.rand import new_id
 from dart.util.s3 import yield_s3_keys, get_bucket, get_s3_path
 
 
@@ -24,17 +28,20 @@ _logger = logging.getLogger(__name__)
 
 @injectable
 class SubscriptionService(object):
-    def __init__(self, dataset_service, subscription_proxy, filter_service):
+    def __init__(self, dataset_service, subscription_proxy, filter_service, cascade_delete_service):
         self._dataset_service = dataset_service
         self._subscription_proxy = subscription_proxy
         self._filter_service = filter_service
+        self._cascade_delete_service = cascade_delete_service
+        # built once, since the filter service caches its work by the schemas' identity
+        self._filter_schemas = [subscription_schema()]
 
     def save_subscription(self, subscription, commit_and_generate=True, flush=False):
         """ :type subscription: dart.model.subscription.Subscription """
         subscription = default_and_validate(subscription, subscription_schema())
 
         subscription_dao = SubscriptionDao()
-        subscription_dao.id = random_id()
+        subscription_dao.id = new_id()
         subscription.data.state = SubscriptionState.QUEUED
         subscription.data.queued_time = datetime.now()
         subscription_dao.data = subscription.data.to_dict()
@@ -81,6 +88,25 @@ class SubscriptionService(object):
             .all()
         return [s.to_model() for s in subscription_daos]
 
+    @staticmethod
+    def find_active_subscriptions_with_locations():
+        """ :rtype: list[(dart.model.subscription.Subscription, str)] """
+        results = db.session\
+            .query(SubscriptionDao, DatasetDao.data['location'].astext)\
+            .join(DatasetDao, DatasetDao.id == SubscriptionDao.data['dataset_id'].astext)\
+            .filter(SubscriptionDao.data['state'].astext == SubscriptionState.ACTIVE)\
+            .all()
+        return [(s.to_model(), location) for s, location in results]
+
+    @staticmethod
+    def get_subscription_matching_version():
+        """ a cheap fingerprint that changes whenever a subscription or dataset is added, modified or deleted """
+        sql = """
+            SELECT (SELECT COUNT(*) FROM subscription), (SELECT MAX(updated) FROM subscription),
+                   (SELECT COUNT(*) FROM dataset), (SELECT MAX(updated) FROM dataset)
+            """
+        return tuple(db.session.execute(text(sql)).fetchone())
+
     @staticmethod
     def get_subscription(subscription_id, raise_when_missing=True):
         subscription_dao = SubscriptionDao.query.get(subscription_id)
@@ -114,12 +140,12 @@ class SubscriptionService(object):
     def _query_subscription_query(self, filters):
         query = SubscriptionDao.query.order_by(desc(SubscriptionDao.updated))
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, SubscriptionDao, [subscription_schema()])
+            query = self._filter_service.apply_filter(f, query, SubscriptionDao, self._filter_schemas)
         return query
 
     @staticmethod
-    def patch_subscription(source_subscription, subscription):
-        subscription = patch_difference(SubscriptionDao, source_subscription, subscription)
+    def patch_subscription(source_subscription, subscription, commit=True):
+        subscription = patch_difference(SubscriptionDao, source_subscription, subscription, commit)
         return subscription
 
     @staticmethod
@@ -137,21 +163,16 @@ class SubscriptionService(object):
         subscription.data.message_id = message_id
         return patch_difference(SubscriptionDao, source_subscription, subscription)
 
-    @staticmethod
-    @retry_stale_data
-    def delete_subscription(subscription_id):
-        SubscriptionElementDao.query\
-            .filter(SubscriptionElementDao.subscription_id == subscription_id)\
-            .delete(synchronize_session='fetch')
-        subscription_dao = SubscriptionDao.query.get(subscription_id)
-        db.session.delete(subscription_dao)
-        db.session.commit()
+    def delete_subscription(self, subscription_id):
+        """ deletes the subscription along with its subscription elements """
+        return self._cascade_delete_service.delete_or_defer('subscription', subscription_id)
 
 
 @injectable
 class SubscriptionElementService(object):
-    def __init__(self, dataset_service):
+    def __init__(self, dataset_service, subscription_element_partitioner):
         self._dataset_service = dataset_service
+        self._partitioner = subscription_element_partitioner
 
     def generate_subscription_elements(self, subscription):
         """ :type subscription: dart.model.subscription.Subscription """
@@ -175,7 +196,7 @@ class SubscriptionElementService(object):
             state = SubscriptionElementState.UNCONSUMED
             now = datetime.now()
             subscription_element_dict = {
-                'id': random_id(),
+                'id': new_id(),
                 'version_id': 0,
                 'created': now,
                 'updated': now,
@@ -207,24 +228,27 @@ class SubscriptionElementService(object):
             subscription.data.s3_path_end_prefix_exclusive,
             subscription.data.s3_path_regex_filter,
         )
-        for key_obj in s3_keys:
-            self.conditional_insert_subscription_element(subscription, get_s3_path(key_obj), key_obj.size)
-
-    @staticmethod
-    def _insert_elements(elements):
-        # this will produce one multi-valued insert statement (rather than multiple single inserts)
-        db.session.execute(insert(SubscriptionElementDao).values(elements))
+        self.conditional_insert_subscription_elements([(subscription.id, get_s3_path(k), k.size) for k in s3_keys])
+
+    def _insert_elements(self, elements):
+        # this will produce one multi-valued insert statement (rather than multiple single inserts), all of the
+        # elements being for the same subscription
+        sid = elements[0]['subscription_id']
+        if self._partitioner.enabled:
+            for element in elements:
+                element['partition_key'] = self._partitioner.partition_key(sid)
+        partition_table = table(self._partitioner.table_name(sid), *[column(c) for c in elements[0].keys()])
+        db.session.execute(insert(partition_table).values(elements))
         db.session.commit()
 
-    @staticmethod
-    def conditional_insert_subscription_element(subscription, s3_path, size):
+    def conditional_insert_subscription_element(self, subscription, s3_path, size):
         # SQLAlchemy does not support conditional inserts as a part of its expression language.  Furthermore,
         # this form of conditional update is required until postgres 9.5 is out and supported by RDS:
         #
         #    http://www.postgresql.org/docs/devel/static/sql-insert.html#SQL-ON-CONFLICT
         #
         sql = """
-            INSERT INTO subscription_element (
+            INSERT INTO {table_name} (
                 id,
                 version_id,
                 created,
@@ -232,15 +256,24 @@ class SubscriptionElementService(object):
                 subscription_id,
                 s3_path,
                 file_size,
-                state
+                state{key_column}
             )
-            SELECT :id, 0, NOW(), NOW(), :sid, :s3_path, :size, :state
+            SELECT :id, 0, NOW(), NOW(), :sid, :s3_path, :size, :state{key_value}
             WHERE NOT EXISTS
-                (SELECT NULL FROM subscription_element WHERE subscription_id = :sid AND s3_path = :s3_path)
+                (SELECT NULL FROM subscription_element
+                 WHERE subscription_id = :sid AND s3_path = :s3_path AND {key_condition})
+              AND NOT EXISTS
+                (SELECT NULL FROM subscription_element_archive WHERE subscription_id = :sid AND s3_path = :s3_path)
             """
         sid = subscription.id
+        key_condition, key_params = self._partitioner.key_condition(sid)
+        key_column, key_value, insert_params = self._partitioner.insert_sql(sid)
+        key_params.update(insert_params)
+        sql = sql.format(table_name=self._partitioner.table_name(sid), key_condition=key_condition,
+                         key_column=key_column, key_value=key_value)
         state = SubscriptionElementState.UNCONSUMED
-        statement = text(sql).bindparams(id=random_id(), sid=sid, s3_path=s3_path, size=size, state=state)
+        statement = text(sql).bindparams(id=new_id(), sid=sid, s3_path=s3_path, size=size, state=state,
+                                         **key_params)
         results = db.session.execute(statement)
         if results.rowcount != 1:
             db.session.rollback()
@@ -249,79 +282,182 @@ class SubscriptionElementService(object):
             db.session.commit()
             return True
 
-    @staticmethod
-    def get_subscription_element(subscription_id, s3_path):
+    def conditional_insert_subscription_elements(self, elements):
+        """ inserts the elements that do not already exist, in chunks of one multi-valued statement each
+
+            :type elements: list[(str, str, long)]
+            :param elements: (subscription_id, s3_path, size) tuples
+            :rtype: dict[str, int]
+            :return: the number of newly inserted elements by subscription_id """
+        # see conditional_insert_subscription_element for why this is not an "INSERT ... ON CONFLICT"
+        sql = """
+            INSERT INTO {table_name} (
+                id,
+                version_id,
+                created,
+                updated,
+                subscription_id,
+                s3_path,
+                file_size,
+                state{key_column}
+            )
+            SELECT v.id, 0, NOW(), NOW(), v.sid, v.s3_path, v.size, :state{key_value}
+            FROM (VALUES {values}) AS v (id, sid, s3_path, size)
+            WHERE NOT EXISTS
+                (SELECT NULL FROM subscription_element se
+                 WHERE se.subscription_id = v.sid AND se.s3_path = v.s3_path AND {key_condition})
+              AND NOT EXISTS
+                (SELECT NULL FROM subscription_element_archive sea
+                 WHERE sea.subscription_id = v.sid AND sea.s3_path = v.s3_path)
+            RETURNING subscription_id
+            """
+        inserted_counts = {}
+        unique_elements = list(OrderedDict(((sid, s3_path), size) for sid, s3_path, size in elements).iteritems())
+        # each statement inserts into a single partition
+        elements_by_table_name = OrderedDict()
+        for element in unique_elements:
+            elements_by_table_name.setdefault(self._partitioner.table_name(element[0][0]), []).append(element)
+
+        for table_name, table_elements in elements_by_table_name.iteritems():
+            partition_sid = table_elements[0][0][0]
+            key_condition, key_params = self._partitioner.key_condition(partition_sid, 'se')
+            key_column, key_value, insert_params = self._partitioner.insert_sql(partition_sid)
+            key_params.update(insert_params)
+            for i in range(0, len(table_elements), _batch_size):
+                chunk = table_elements[i:i + _batch_size]
+                values_sql = []
+                params = {'state': SubscriptionElementState.UNCONSUMED}
+                params.update(key_params)
+                for j, ((sid, s3_path), size) in enumerate(chunk):
+                    values_sql.append('(:id_%s, :sid_%s, :s3_path_%s, CAST(:size_%s AS BIGINT))' % (j, j, j, j))
+                    params['id_%s' % j] = new_id()
+                    params['sid_%s' % j] = sid
+                    params['s3_path_%s' % j] = s3_path
+                    params['size_%s' % j] = size
+                statement_sql = sql.format(table_name=table_name, values=', '.join(values_sql),
+                                           key_condition=key_condition, key_column=key_column, key_value=key_value)
+                results = db.session.execute(text(statement_sql).bindparams(**params))
+                for row in results:
+                    inserted_counts[row[0]] = inserted_counts.get(row[0], 0) + 1
+                db.session.commit()
+        return inserted_counts
+
+    def get_subscription_element(self, subscription_id, s3_path):
         """ :rtype: dart.model.subscription.SubscriptionElement """
         try:
-            return SubscriptionElementDao.query\
+            query = SubscriptionElementDao.query\
                 .filter(SubscriptionElementDao.subscription_id == subscription_id)\
-                .filter(SubscriptionElementDao.s3_path == s3_path)\
-                .one()\
-                .to_model()
+                .filter(SubscriptionElementDao.s3_path == s3_path)
+            return self._partitioner.filter_query(query, subscription_id).one().to_model()
         except NoResultFound:
             values = (subscription_id, s3_path)
             raise DartValidationException('no elements found for subscription (id=%s) key: %s' % values)
 
     def find_subscription_elements(self, subscription_id, state=SubscriptionElementState.UNCONSUMED, limit=None,
-                                   offset=None, gt_s3_path=None, action_id=None, gte_processed=None):
+                                   offset=None, gt_s3_path=None, action_id=None, gte_processed=None,
+                                   include_archived=False, stream=False):
+        """ :param stream: whether to return an iterator that reads the elements from a server side cursor """
         query = self._find_subscription_elements_query(action_id, gt_s3_path, state, subscription_id, gte_processed)
         query = query.order_by(SubscriptionElementDao.s3_path)
-        query = query.limit(limit) if limit else query
-        query = query.offset(offset) if offset else query
-        return [se.to_model() for se in query.all()]
+        if include_archived:
+            archive_query = self._find_subscription_elements_query(action_id, gt_s3_path, state, subscription_id,
+                                                                   gte_processed, SubscriptionElementArchiveDao)
+            archive_query = archive_query.order_by(SubscriptionElementArchiveDao.s3_path)
+            daos = query_with_archive(query, archive_query, limit, offset or 0, stream)
+        else:
+            query = query.limit(limit) if limit else query
+            query = query.offset(offset) if offset else query
+            daos = query_results(query, stream)
+        elements = (se.to_model() for se in daos)
+        return elements if stream else list(elements)
 
     def find_subscription_elements_count(self, subscription_id, state=SubscriptionElementState.UNCONSUMED,
-                                         gt_s3_path=None, action_id=None, gte_processed=None):
+                                         gt_s3_path=None, action_id=None, gte_processed=None, include_archived=False):
         query = self._find_subscription_elements_query(action_id, gt_s3_path, state, subscription_id, gte_processed)
-        return query.count()
-
-    @staticmethod
-    def _find_subscription_elements_query(action_id, gt_s3_path, state, subscription_id, gte_processed=None):
-        query = SubscriptionElementDao.query
-        query = query.filter(SubscriptionElementDao.subscription_id == subscription_id) if subscription_id else query
-        query = query.filter(SubscriptionElementDao.state == state) if state else query
-        query = query.filter(SubscriptionElementDao.s3_path > gt_s3_path) if gt_s3_path else query
-        query = query.filter(SubscriptionElementDao.processed >= gte_processed) if gte_processed else query
-        query = query.filter(SubscriptionElementDao.action_id == action_id) if action_id else query
+        count = query.count()
+        if include_archived:
+            count += self._find_subscription_elements_query(action_id, gt_s3_path, state, subscription_id,
+                                                            gte_processed, SubscriptionElementArchiveDao).count()
+        return count
+
+    def _find_subscription_elements_query(self, action_id, gt_s3_path, state, subscription_id, gte_processed=None,
+                                          dao=SubscriptionElementDao):
+        query = dao.query
+        if subscription_id:
+            query = query.filter(dao.subscription_id == subscription_id)
+            query = self._partitioner.filter_query(query, subscription_id, dao)
+        query = query.filter(dao.state == state) if state else query
+        query = query.filter(dao.s3_path > gt_s3_path) if gt_s3_path else query
+        query = query.filter(dao.processed >= gte_processed) if gte_processed else query
+        query = query.filter(dao.action_id == action_id) if action_id else query
         return query
 
-    @staticmethod
-    def get_subscription_element_file_size_sum_and_avg(subscription_id, state=SubscriptionElementState.UNCONSUMED):
-        return db.session\
-            .query(func.sum(SubscriptionElementDao.file_size), func.avg(SubscriptionElementDao.file_size))\
-            .filter(SubscriptionElementDao.subscription_id == subscription_id)\
-            .filter(SubscriptionElementDao.state == state)\
-            .all()[0] or [0, 0]
-
-    @staticmethod
-    def get_subscription_element_stats(subscription_id):
-        """ :rtype: dart.model.subscription.SubscriptionElementStats """
-        results = db.session\
-            .query(
-                SubscriptionElementDao.state,
-                func.count(),
-                func.sum(SubscriptionElementDao.file_size),
-            )\
-            .filter(SubscriptionElementDao.subscription_id == subscription_id)\
-            .group_by(SubscriptionElementDao.state)\
-            .all()
-        return [SubscriptionElementStats(r[0], int(r[1]), long(r[2])) for r in results]
-
-    @staticmethod
-    def reserve_subscription_elements(element_ids):
+    def get_subscription_element_stats(self, subscription_id, include_archived=False):
+        """ :rtype: list[dart.model.subscription.SubscriptionElementStats] """
+        stats_by_state = OrderedDict()
+        daos = [SubscriptionElementDao, SubscriptionElementArchiveDao] if include_archived else [SubscriptionElementDao]
+        for dao in daos:
+            query = db.session\
+                .query(
+                    dao.state,
+                    func.count(),
+                    func.sum(dao.file_size),
+                )\
+                .filter(dao.subscription_id == subscription_id)
+            results = self._partitioner.filter_query(query, subscription_id, dao).group_by(dao.state).all()
+            for state, count, file_size_sum in results:
+                stats = stats_by_state.setdefault(state, SubscriptionElementStats(state, 0, 0L))
+                stats.count += int(count)
+                stats.file_size_sum += long(file_size_sum)
+        return stats_by_state.values()
+
+    def reserve_subscription_elements(self, subscription_id, unconsumed_data_size_in_bytes):
+        """ :rtype: (int, long)
+            :return: the count and file size sum of the reserved elements (0, 0 if the threshold was not met) """
         # because this is called by the trigger worker (always a single consumer),
         # we shouldn't have to deal with optimistic locking
-        db.session.execute(
-            update(SubscriptionElementDao)
-            .where(SubscriptionElementDao.id.in_(element_ids))
-            .values(
-                state=SubscriptionElementState.RESERVED,
-                batch_id=random_id()
+        #
+        # an element belongs to the batch if the elements before it (preceding_bytes) have not yet reached the
+        # threshold, which matches "keep adding files until the threshold is crossed"
+        sql = """
+            WITH ranked AS (
+                SELECT
+                    id,
+                    SUM(file_size) OVER (ORDER BY s3_path ROWS UNBOUNDED PRECEDING) - file_size AS preceding_bytes,
+                    SUM(file_size) OVER () AS total_bytes
+                FROM subscription_element
+                WHERE subscription_id = :sid
+                  AND state = :unconsumed
+                  AND {key_condition}
+            ),
+            reserved AS (
+                UPDATE subscription_element se
+                SET state = :reserved, batch_id = :batch_id
+                FROM ranked
+                WHERE se.id = ranked.id
+                  AND {se_key_condition}
+                  AND ranked.total_bytes >= :size
+                  AND ranked.preceding_bytes < :size
+                RETURNING se.file_size
             )
+            SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM reserved
+            """
+        key_condition, key_params = self._partitioner.key_condition(subscription_id)
+        se_key_condition, _ = self._partitioner.key_condition(subscription_id, 'se')
+        sql = sql.format(key_condition=key_condition, se_key_condition=se_key_condition)
+        statement = text(sql).bindparams(
+            sid=subscription_id,
+            unconsumed=SubscriptionElementState.UNCONSUMED,
+            reserved=SubscriptionElementState.RESERVED,
+            batch_id=new_id(),
+            size=unconsumed_data_size_in_bytes,
+            **key_params
         )
+        count, file_size_sum = db.session.execute(statement).fetchone()
         db.session.commit()
+        return int(count), long(file_size_sum)
 
-    def assign_subscription_elements(self, action):
+    def assign_subscription_elements(self, action, commit=True):
         """ :type action: dart.model.action.Action """
         # because this is called by the trigger worker (always a single consumer),
         # we shouldn't have to deal with optimistic locking
@@ -343,24 +479,27 @@ class SubscriptionElementService(object):
             state = SubscriptionElementState.UNCONSUMED
             batch_id = None
 
-        db.session.execute(
-            update(SubscriptionElementDao)
-            .where(SubscriptionElementDao.subscription_id == s_id)
-            .where(SubscriptionElementDao.state == state)
+        statement = update(SubscriptionElementDao)\
+            .where(SubscriptionElementDao.subscription_id == s_id)\
+            .where(SubscriptionElementDao.state == state)\
             .where(SubscriptionElementDao.batch_id == batch_id)
-            .values(
+        key_clause = self._partitioner.key_clause(s_id)
+        statement = statement if key_clause is None else statement.where(key_clause)
+        db.session.execute(
+            statement.values(
                 action_id=action.id,
                 state=SubscriptionElementState.ASSIGNED
             )
         )
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
-    @staticmethod
-    def _find_next_batch_id(s_id):
-        batch_id_results = db.session \
+    def _find_next_batch_id(self, s_id):
+        query = db.session \
             .query(SubscriptionElementDao.batch_id) \
             .filter(SubscriptionElementDao.subscription_id == s_id) \
-            .filter(SubscriptionElementDao.state == SubscriptionElementState.RESERVED) \
+            .filter(SubscriptionElementDao.state == SubscriptionElementState.RESERVED)
+        batch_id_results = self._partitioner.filter_query(query, s_id) \
             .order_by(SubscriptionElementDao.s3_path) \
             .limit(1) \
             .all()
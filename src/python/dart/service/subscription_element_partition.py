@@ -0,0 +1,135 @@
+import hashlib
+import logging
+
+from sqlalchemy import or_, text
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.orm import SubscriptionElementDao
+
+_logger = logging.getLogger(__name__)
+
+
+@injectable
+class SubscriptionElementPartitioner(object):
+    """ hash partitions subscription_element by subscription_id (dart.subscription_element_partitions > 0).
+
+        Postgres 9.4 has no declarative partitioning, so the partitions are child tables that INHERIT from
+        subscription_element, named subscription_element_p<n>, each with a CHECK constraint on its partition_key.
+        Rows are inserted directly into their partition, while updates, deletes and reads against
+        subscription_element see every partition.  Queries for a subscription filter on its partition_key, which
+        lets constraint exclusion skip the other partitions.  Rows inserted before partitioning have no
+        partition_key and stay in subscription_element itself until tool/migration/partition_subscription_elements
+        moves them, which is why the filter also accepts a NULL partition_key (the partitions cannot hold those). """
+
+    def __init__(self, dart_config):
+        self._partition_count = dart_config['dart'].get('subscription_element_partitions', 0)
+
+    @property
+    def enabled(self):
+        return self._partition_count > 0
+
+    def partition_key(self, subscription_id):
+        """ :rtype: int """
+        if not self.enabled:
+            return None
+        # the same value as the partition_key_sql expression
+        return int(hashlib.md5(subscription_id).hexdigest()[:8], 16) % self._partition_count
+
+    def partition_key_sql(self, column='subscription_id'):
+        return "('x' || substr(md5(%s), 1, 8))::bit(32)::bigint %% %s" % (column, self._partition_count)
+
+    def insert_sql(self, subscription_id):
+        """ :return: the partition_key column and value to append to the columns and values of an INSERT, along with
+                     the bind parameters they need, or empty strings when partitioning is disabled (and the column
+                     may not exist, see SubscriptionElementColumns)
+            :rtype: (str, str, dict) """
+        if not self.enabled:
+            return '', '', {}
+        params = {'element_partition_key': self.partition_key(subscription_id)}
+        return ', partition_key', ', CAST(:element_partition_key AS INTEGER)', params
+
+    def table_name(self, subscription_id):
+        """ :return: the table that new elements of the subscription are inserted into """
+        if not self.enabled:
+            return SubscriptionElementDao.__tablename__
+        return self._partition_table_name(self.partition_key(subscription_id))
+
+    def key_condition(self, subscription_id, alias=None):
+        """ :return: a SQL condition (using the :partition_key bind parameter) that prunes the partitions of other
+                     subscriptions, along with the bind parameters it needs
+            :rtype: (str, dict) """
+        if not self.enabled:
+            return 'TRUE', {}
+        column = '%s.partition_key' % alias if alias else 'partition_key'
+        condition = '(%s = :partition_key OR %s IS NULL)' % (column, column)
+        return condition, {'partition_key': self.partition_key(subscription_id)}
+
+    def key_clause(self, subscription_id, dao=SubscriptionElementDao):
+        """ :return: the key_condition as a SQLAlchemy clause, or None when there is nothing to prune """
+        if not self.enabled or dao is not SubscriptionElementDao:
+            return None
+        partition_key = self.partition_key(subscription_id)
+        return or_(dao.partition_key == partition_key, dao.partition_key.is_(None))
+
+    def filter_query(self, query, subscription_id, dao=SubscriptionElementDao):
+        clause = self.key_clause(subscription_id, dao)
+        return query if clause is None else query.filter(clause)
+
+    def ensure_partitions(self):
+        """ creates any partitions (and their indexes) that do not exist yet """
+        for partition_key in range(self._partition_count):
+            table_name = self._partition_table_name(partition_key)
+            statement = text('SELECT to_regclass(:table_name) IS NOT NULL').bindparams(table_name=table_name)
+            if db.session.execute(statement).scalar():
+                continue
+            _logger.info('creating subscription_element partition %s' % table_name)
+            db.session.execute("""
+                CREATE TABLE {table_name} (
+                    PRIMARY KEY (id),
+                    CHECK (partition_key IS NOT NULL AND partition_key = {partition_key})
+                ) INHERITS (subscription_element)
+                """.format(table_name=table_name, partition_key=partition_key))
+            db.session.execute('CREATE INDEX {t}_sid_state_s3_path ON {t} (subscription_id, state, s3_path)'
+                               .format(t=table_name))
+            db.session.execute('CREATE INDEX {t}_sid_s3_path ON {t} (subscription_id, s3_path)'.format(t=table_name))
+            db.session.execute('CREATE INDEX {t}_action_id ON {t} (action_id)'.format(t=table_name))
+            db.session.commit()
+
+    def move_unpartitioned_rows(self, batch_size=1000):
+        """ moves rows that are still in subscription_element itself into their partitions, in batches
+
+            :return: the number of rows moved
+            :rtype: int """
+        columns = [c for c in SubscriptionElementDao.__table__.columns.keys() if c != 'partition_key']
+        columns_sql = ', '.join(columns)
+        total = 0
+        for partition_key in range(self._partition_count):
+            sql = """
+                WITH moved AS (
+                    DELETE FROM ONLY subscription_element
+                    WHERE id IN (
+                        SELECT id
+                        FROM ONLY subscription_element
+                        WHERE {key_sql} = :partition_key
+                        LIMIT :batch_size
+                    )
+                    RETURNING {columns}
+                )
+                INSERT INTO {table_name} ({columns}, partition_key)
+                SELECT {columns}, :partition_key FROM moved
+                """.format(key_sql=self.partition_key_sql(), columns=columns_sql,
+                           table_name=self._partition_table_name(partition_key))
+            while True:
+                statement = text(sql).bindparams(partition_key=partition_key, batch_size=batch_size)
+                count = db.session.execute(statement).rowcount
+                db.session.commit()
+                total += count
+                if count < batch_size:
+                    break
+            _logger.info('moved %s rows into subscription_element partitions so far' % total)
+        return total
+
+    @staticmethod
+    def _partition_table_name(partition_key):
+        return 'subscription_element_p%s' % partition_key
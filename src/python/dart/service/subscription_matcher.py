@@ -0,0 +1,122 @@
+import logging
+import re
+import time
+
+from dart.context.locator import injectable
+
+
+_logger = logging.getLogger(__name__)
+
+
+@injectable
+class SubscriptionMatcher(object):
+    def __init__(self, subscription_service, dart_config):
+        self._subscription_service = subscription_service
+        matcher_config = dart_config.get('subscriptions', {}).get('matcher', {})
+        self._refresh_check_seconds = matcher_config.get('refresh_check_seconds', 5)
+        self._max_age_seconds = matcher_config.get('max_age_seconds', 300)
+        self._index = None
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+
+    def find_matching_subscriptions(self, s3_path):
+        """ in-memory equivalent of SubscriptionService.find_matching_subscriptions
+
+            :rtype: list[dart.model.subscription.Subscription] """
+        self._refresh_if_needed()
+        return self._index.match(s3_path)
+
+    def invalidate(self):
+        self._index = None
+
+    def _refresh_if_needed(self):
+        now = time.time()
+        if self._index is not None and now - self._loaded_at < self._max_age_seconds:
+            if now - self._checked_at < self._refresh_check_seconds:
+                return
+            self._checked_at = now
+            if self._subscription_service.get_subscription_matching_version() == self._version:
+                return
+        self._load(now)
+
+    def _load(self, now):
+        # the version is read first so that a concurrent change results in a reload on the next check
+        version = self._subscription_service.get_subscription_matching_version()
+        index = SubscriptionMatchIndex()
+        for subscription, location in self._subscription_service.find_active_subscriptions_with_locations():
+            index.add(subscription, location)
+        self._index = index
+        self._version = version
+        self._loaded_at = now
+        self._checked_at = now
+        _logger.info('loaded %s active subscriptions into the subscription matcher' % index.size)
+
+
+class SubscriptionMatchIndex(object):
+    """ a character trie over dataset locations, where each node that ends a location holds the subscriptions
+        (with their s3 path ranges and compiled regexes) on datasets at that location """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self.size = 0
+
+    def add(self, subscription, location):
+        """ :type subscription: dart.model.subscription.Subscription
+            :type location: str """
+        try:
+            entry = _SubscriptionEntry(subscription)
+        except re.error:
+            _logger.error('subscription (id=%s) has an invalid s3_path_regex_filter' % subscription.id)
+            return
+        node = self._root
+        for c in location:
+            node = node.children.setdefault(c, _TrieNode())
+        node.entries.append(entry)
+        self.size += 1
+
+    def match(self, s3_path):
+        """ :rtype: list[dart.model.subscription.Subscription] """
+        results = []
+        node = self._root
+        self._collect(node, s3_path, results)
+        for c in s3_path:
+            node = node.children.get(c)
+            if not node:
+                break
+            self._collect(node, s3_path, results)
+        return results
+
+    @staticmethod
+    def _collect(node, s3_path, results):
+        for entry in node.entries:
+            if entry.matches(s3_path):
+                results.append(entry.subscription)
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+
+
+class _SubscriptionEntry(object):
+    def __init__(self, subscription):
+        """ :type subscription: dart.model.subscription.Subscription """
+        data = subscription.data
+        self.subscription = subscription
+        self.start_inclusive = data.s3_path_start_prefix_inclusive
+        self.end_exclusive = data.s3_path_end_prefix_exclusive
+        # postgres "~" is an unanchored match, which is what re.search does
+        self.regex = re.compile(data.s3_path_regex_filter) if data.s3_path_regex_filter else None
+
+    def matches(self, s3_path):
+        if self.start_inclusive and s3_path < self.start_inclusive:
+            return False
+        if self.end_exclusive and s3_path >= self.end_exclusive:
+            return False
+        if self.regex and not self.regex.search(s3_path):
+            return False
+        return True
@@ -1,23 +1,29 @@
+import copy
+from datetime import datetime
+
 from sqlalchemy import cast, desc
 from sqlalchemy.dialects.postgresql import JSONB
 
 from dart.context.locator import injectable
+from dart.model.cache_version import CacheVersions
 from dart.model.exception import DartValidationException
 from dart.model.orm import TriggerDao
 from dart.context.database import db
 from dart.model.trigger import TriggerState
 from dart.schema.base import default_and_validate
 from dart.schema.trigger import trigger_schema
+from dart.service.cache_version import increment_cache_version
 from dart.service.patcher import retry_stale_data, patch_difference
 from dart.trigger.base import TriggerProcessor
-from dart.util.rand import random_id
+from dart.util.rand import new_id
 
 
 @injectable
 class TriggerService(object):
     def __init__(self, action_service, datastore_service, workflow_service, manual_trigger_processor,
                  subscription_batch_trigger_processor, workflow_completion_trigger_processor,
-                 event_trigger_processor, scheduled_trigger_processor, super_trigger_processor, filter_service):
+                 event_trigger_processor, scheduled_trigger_processor, super_trigger_processor, filter_service,
+                 trigger_registry):
         self._action_service = action_service
         self._datastore_service = datastore_service
         self._workflow_service = workflow_service
@@ -28,6 +34,7 @@ class TriggerService(object):
         self._scheduled_trigger_processor = scheduled_trigger_processor
         self._super_trigger_processor = super_trigger_processor
         self._filter_service = filter_service
+        self._trigger_registry = trigger_registry
 
         self._trigger_processors = {
             manual_trigger_processor.trigger_type().name: manual_trigger_processor,
@@ -75,9 +82,10 @@ class TriggerService(object):
         trigger = default_and_validate(trigger, trigger_schema(trigger_processor.trigger_type().params_json_schema))
 
         trigger_dao = TriggerDao()
-        trigger_dao.id = random_id()
+        trigger_dao.id = new_id()
         trigger_dao.data = trigger.data.to_dict()
         db.session.add(trigger_dao)
+        increment_cache_version(CacheVersions.TRIGGERS, commit=False)
         if flush:
             db.session.flush()
         trigger = trigger_dao.to_model()
@@ -88,6 +96,7 @@ class TriggerService(object):
                 trigger_processor.initialize_trigger(trigger, self)
             except:
                 db.session.delete(trigger_dao)
+                increment_cache_version(CacheVersions.TRIGGERS, commit=False)
                 db.session.commit()
                 raise
         return trigger
@@ -112,6 +121,12 @@ class TriggerService(object):
         query = query.offset(offset) if offset else query
         return [d.to_model() for d in query.all()]
 
+    def find_active_triggers_with_arg(self, trigger_type_name, arg_name, arg_value):
+        """ a cached alternative to find_triggers(trigger_type_name, {arg_name: arg_value}) for ACTIVE triggers
+
+            :rtype: list[dart.model.trigger.Trigger] """
+        return self._trigger_registry.find_triggers(trigger_type_name, arg_name, arg_value)
+
     def find_triggers_count(self):
         return self.find_triggers_query(None, None, None).count()
 
@@ -145,13 +160,14 @@ class TriggerService(object):
             query = self._filter_service.apply_filter(f, query, TriggerDao, self._trigger_schemas)
         return query
 
-    def patch_trigger(self, source_trigger, trigger):
+    def patch_trigger(self, source_trigger, trigger, commit=True):
         trigger_type_name = trigger.data.trigger_type_name
         if trigger_type_name == self._manual_trigger_processor.trigger_type().name:
             raise DartValidationException('manual triggers cannot be saved')
 
         trigger_processor = self._trigger_processors.get(trigger_type_name)
-        trigger = patch_difference(TriggerDao, source_trigger, trigger)
+        trigger = patch_difference(TriggerDao, source_trigger, trigger, commit)
+        _trigger_definitions_changed(commit)
         return trigger_processor.update_trigger(source_trigger, trigger)
 
     def default_and_validate_trigger(self, trigger):
@@ -164,13 +180,17 @@ class TriggerService(object):
         """ :type trigger: dart.model.trigger.Trigger """
         source_trigger = trigger.copy()
         trigger.data.workflow_ids = workflow_ids
-        return patch_difference(TriggerDao, source_trigger, trigger)
+        trigger = patch_difference(TriggerDao, source_trigger, trigger)
+        _trigger_definitions_changed()
+        return trigger
 
     @staticmethod
     def update_trigger_args(trigger, args):
         source_trigger = trigger.copy()
         trigger.data.args = args
-        return patch_difference(TriggerDao, source_trigger, trigger)
+        trigger = patch_difference(TriggerDao, source_trigger, trigger)
+        _trigger_definitions_changed()
+        return trigger
 
     @staticmethod
     def update_trigger_extra_data(trigger, extra_data):
@@ -178,6 +198,48 @@ class TriggerService(object):
         trigger.data.extra_data = extra_data
         return patch_difference(TriggerDao, source_trigger, trigger)
 
+    @staticmethod
+    def record_super_trigger_completion(super_trigger_id, completed_trigger_id):
+        """ records (under a row lock, so concurrent evaluations cannot overwrite each other) that one of an ALL super
+            trigger's completed_trigger_ids has fired, resetting the recorded times once all of them have fired
+
+            :rtype: bool
+            :return: whether all of the super trigger's completed_trigger_ids have now fired """
+        trigger_dao = TriggerDao.query.filter(TriggerDao.id == super_trigger_id).with_for_update().first()
+        if not trigger_dao:
+            db.session.rollback()
+            return False
+
+        data = copy.deepcopy(trigger_dao.data)
+        extra_data = data.get('extra_data') or {}
+        completed_trigger_id_times = extra_data.get('completed_trigger_id_times') or {}
+        completed_trigger_id_times[completed_trigger_id] = datetime.utcnow().isoformat()
+
+        all_completed = all(ctid in completed_trigger_id_times for ctid in data['args']['completed_trigger_ids'])
+        extra_data['completed_trigger_id_times'] = {} if all_completed else completed_trigger_id_times
+        data['extra_data'] = extra_data
+        trigger_dao.data = data
+        db.session.commit()
+        return all_completed
+
+    @staticmethod
+    def record_scheduled_fire_time(trigger_id, fire_time):
+        """ records (under a row lock) the last time the LocalCronScheduler fired a scheduled trigger, so that fires
+            missed while no scheduler was running can be caught up
+
+            :type fire_time: datetime.datetime """
+        trigger_dao = TriggerDao.query.filter(TriggerDao.id == trigger_id).with_for_update().first()
+        if not trigger_dao:
+            db.session.rollback()
+            return
+
+        data = copy.deepcopy(trigger_dao.data)
+        extra_data = data.get('extra_data') or {}
+        extra_data['last_scheduled_fire_time'] = fire_time.isoformat()
+        data['extra_data'] = extra_data
+        trigger_dao.data = data
+        db.session.commit()
+
     def delete_trigger(self, trigger_id):
         trigger = TriggerDao.query.get(trigger_id).to_model()
         trigger_handler = self._trigger_processors[trigger.data.trigger_type_name]
@@ -189,6 +251,7 @@ class TriggerService(object):
     def delete_trigger_retryable(trigger_id):
         trigger_dao = TriggerDao.query.get(trigger_id)
         db.session.delete(trigger_dao)
+        increment_cache_version(CacheVersions.TRIGGERS, commit=False)
         db.session.commit()
 
     def trigger_workflow_async(self, workflow_id):
@@ -196,6 +259,11 @@ class TriggerService(object):
 
     def evaluate_subscription_triggers(self, subscription):
         """ :type subscription: dart.model.subscription.Subscription """
-        arg = {'subscription_id': subscription.id}
-        for trigger in self.find_triggers(self._subscription_batch_trigger_processor.trigger_type().name, arg):
-            self._subscription_batch_trigger_processor.send_evaluation_message(trigger.id)
+        trigger_type_name = self._subscription_batch_trigger_processor.trigger_type().name
+        for trigger in self.find_active_triggers_with_arg(trigger_type_name, 'subscription_id', subscription.id):
+            self._subscription_batch_trigger_processor.request_evaluation(trigger.id)
+
+
+def _trigger_definitions_changed(commit=True):
+    # lets the trigger registries in every process know that they need to reload
+    increment_cache_version(CacheVersions.TRIGGERS, commit)
@@ -0,0 +1,59 @@
+import logging
+import time
+
+from dart.context.locator import injectable
+from dart.model.cache_version import CacheVersions
+from dart.model.orm import TriggerDao
+from dart.model.trigger import TriggerState
+from dart.service.cache_version import get_cache_version
+
+
+_logger = logging.getLogger(__name__)
+
+
+@injectable
+class TriggerRegistry(object):
+    """ an in-process index of ACTIVE triggers by (trigger_type_name, arg name, arg value), which answers lookups
+        such as "super triggers waiting on trigger X" or "event triggers for event Y" without a JSONB containment
+        query.  It is rebuilt whenever the TRIGGERS cache version changes (see TriggerService). """
+
+    def __init__(self, dart_config):
+        registry_config = dart_config.get('triggers', {}).get('registry', {})
+        # a safety net for trigger modifications that bypass TriggerService (e.g. migration tools)
+        self._max_age_seconds = registry_config.get('max_age_seconds', 300)
+        self._triggers_by_arg = None
+        self._version = None
+        self._loaded_at = 0
+
+    def find_triggers(self, trigger_type_name, arg_name, arg_value):
+        """ :return: the ACTIVE triggers whose args[arg_name] equals arg_value (or contains it, for list args)
+            :rtype: list[dart.model.trigger.Trigger] """
+        self._refresh_if_needed()
+        # copies are returned since callers are free to modify the triggers they are handed
+        return [t.copy() for t in self._triggers_by_arg.get((trigger_type_name, arg_name, arg_value), [])]
+
+    def invalidate(self):
+        self._triggers_by_arg = None
+
+    def _refresh_if_needed(self):
+        version = get_cache_version(CacheVersions.TRIGGERS)
+        if self._triggers_by_arg is not None and version is not None and version == self._version:
+            if time.time() - self._loaded_at < self._max_age_seconds:
+                return
+        self._load(version)
+
+    def _load(self, version):
+        triggers_by_arg = {}
+        trigger_daos = TriggerDao.query.filter(TriggerDao.data['state'].astext == TriggerState.ACTIVE).all()
+        for trigger_dao in trigger_daos:
+            trigger = trigger_dao.to_model()
+            for arg_name, arg_value in (trigger.data.args or {}).iteritems():
+                values = arg_value if isinstance(arg_value, list) else [arg_value]
+                for value in values:
+                    if isinstance(value, (dict, list)):
+                        continue
+                    triggers_by_arg.setdefault((trigger.data.trigger_type_name, arg_name, value), []).append(trigger)
+        self._triggers_by_arg = triggers_by_arg
+        self._version = version
+        self._loaded_at = time.time()
+        _logger.info('loaded %s active triggers into the trigger registry (version=%s)' % (len(trigger_daos), version))
@@ -4,14 +4,17 @@ from sqlalchemy import DateTime, desc
 from dart.context.locator import injectable
 from dart.model.action import ActionState
 from dart.model.datastore import DatastoreState
-from dart.model.orm import WorkflowDao, WorkflowInstanceDao
+from dart.model.exception import DartConditionalUpdateFailedException
+from dart.model.orm import WorkflowDao, WorkflowInstanceDao, WorkflowInstanceArchiveDao
 from dart.context.database import db
 from dart.model.subscription import SubscriptionElementState
 from dart.model.workflow import WorkflowState, WorkflowInstanceState, WorkflowInstanceData
 from dart.schema.base import default_and_validate
 from dart.schema.workflow import workflow_schema, workflow_instance_schema
-from dart.service.patcher import patch_difference, retry_stale_data
-from dart.util.rand import random_id
+from dart.service.archive import query_with_archive
+from dart.service.patcher import patch_difference
+from dart.util.query_stream import query_results
+from dart.util.rand import new_id
 
 
 _logger = logging.getLogger(__name__)
@@ -20,7 +23,7 @@ _logger = logging.getLogger(__name__)
 @injectable
 class WorkflowService(object):
     def __init__(self, datastore_service, action_service, trigger_proxy, filter_service, subscription_service,
-                 subscription_element_service, emailer):
+                 subscription_element_service, emailer, cascade_delete_service):
         self._datastore_service = datastore_service
         self._action_service = action_service
         self._trigger_proxy = trigger_proxy
@@ -28,6 +31,10 @@ class WorkflowService(object):
         self._subscription_service = subscription_service
         self._subscription_element_service = subscription_element_service
         self._emailer = emailer
+        self._cascade_delete_service = cascade_delete_service
+        # built once, since the filter service caches its work by the schemas' identity
+        self._workflow_filter_schemas = [workflow_schema()]
+        self._workflow_instance_filter_schemas = [workflow_instance_schema()]
 
     @staticmethod
     def save_workflow(workflow, commit=True, flush=False):
@@ -35,7 +42,7 @@ class WorkflowService(object):
         workflow = default_and_validate(workflow, workflow_schema())
 
         workflow_dao = WorkflowDao()
-        workflow_dao.id = random_id()
+        workflow_dao.id = new_id()
         workflow_dao.data = workflow.data.to_dict()
         db.session.add(workflow_dao)
         if flush:
@@ -46,11 +53,11 @@ class WorkflowService(object):
         return workflow
 
     @staticmethod
-    def save_workflow_instance(workflow, trigger_type, trigger_id, state):
+    def save_workflow_instance(workflow, trigger_type, trigger_id, state, commit=True):
         """ :type workflow: dart.model.workflow.Workflow
             :type trigger_type: dart.model.trigger.TriggerType """
         wf_instance_dao = WorkflowInstanceDao()
-        wf_instance_dao.id = random_id()
+        wf_instance_dao.id = new_id()
         wf_data = workflow.data
         data = WorkflowInstanceData(
             workflow_id=workflow.id,
@@ -63,7 +70,10 @@ class WorkflowService(object):
         )
         wf_instance_dao.data = data.to_dict()
         db.session.add(wf_instance_dao)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
         return wf_instance_dao.to_model()
 
     @staticmethod
@@ -87,8 +97,10 @@ class WorkflowService(object):
         return WorkflowDao.query.order_by(WorkflowDao.data['name'])
 
     @staticmethod
-    def get_workflow_instance(workflow_instance_id, raise_when_missing=True):
+    def get_workflow_instance(workflow_instance_id, raise_when_missing=True, include_archived=False):
         workflow_instance_dao = WorkflowInstanceDao.query.get(workflow_instance_id)
+        if not workflow_instance_dao and include_archived:
+            workflow_instance_dao = WorkflowInstanceArchiveDao.query.get(workflow_instance_id)
         if not workflow_instance_dao and raise_when_missing:
             raise Exception('workflow_instance_id with id=%s not found' % workflow_instance_id)
         return workflow_instance_dao.to_model() if workflow_instance_dao else None
@@ -123,34 +135,51 @@ class WorkflowService(object):
     def _query_workflow_query(self, filters):
         query = WorkflowDao.query.order_by(desc(WorkflowDao.updated))
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, WorkflowDao, [workflow_schema()])
+            query = self._filter_service.apply_filter(f, query, WorkflowDao, self._workflow_filter_schemas)
         return query
 
-    def query_workflow_instances(self, filters, limit=20, offset=0):
-        """ :type filters: list[dart.model.query.Filter] """
+    def query_workflow_instances(self, filters, limit=20, offset=0, include_archived=False, stream=False):
+        """ :type filters: list[dart.model.query.Filter]
+            :param include_archived: whether archived workflow instances follow the current ones
+            :param stream: whether to return an iterator that reads the instances from a server side cursor """
         query = self._query_workflow_instance_query(filters)
-        query = query.limit(limit).offset(offset)
-        return [w.to_model() for w in query.all()]
-
-    def query_workflow_instances_count(self, filters):
+        if include_archived:
+            archive_query = self._query_workflow_instance_query(filters, WorkflowInstanceArchiveDao)
+            daos = query_with_archive(query, archive_query, limit, offset, stream)
+        else:
+            daos = query_results(query.limit(limit).offset(offset), stream)
+        workflow_instances = (w.to_model() for w in daos)
+        return workflow_instances if stream else list(workflow_instances)
+
+    def query_workflow_instances_count(self, filters, include_archived=False):
         """ :type filters: list[dart.model.query.Filter] """
-        query = self._query_workflow_instance_query(filters)
-        return query.count()
+        count = self._query_workflow_instance_query(filters).count()
+        if include_archived:
+            count += self._query_workflow_instance_query(filters, WorkflowInstanceArchiveDao).count()
+        return count
 
-    def _query_workflow_instance_query(self, filters):
-        query = WorkflowInstanceDao.query.order_by(desc(WorkflowInstanceDao.updated))
+    def _query_workflow_instance_query(self, filters, dao=WorkflowInstanceDao):
+        query = dao.query.order_by(desc(dao.updated))
         for f in filters:
-            query = self._filter_service.apply_filter(f, query, WorkflowInstanceDao, [workflow_instance_schema()])
+            query = self._filter_service.apply_filter(f, query, dao, self._workflow_instance_filter_schemas)
         return query
 
     def action_checkout(self, action):
         action = self._action_service.update_action_state(action, ActionState.RUNNING, action.data.error_message)
-        if action.data.workflow_instance_id and action.data.first_in_workflow:
+        if action.data.workflow_instance_id:
+            # with parallel branches, several actions can be the first to start
             wf_instance = self.get_workflow_instance(action.data.workflow_instance_id)
-            self.update_workflow_instance_state(wf_instance, WorkflowInstanceState.RUNNING)
+            if wf_instance.data.state != WorkflowInstanceState.QUEUED:
+                return action
+            try:
+                self.update_workflow_instance_state(wf_instance, WorkflowInstanceState.RUNNING,
+                                                    conditional=lambda i: i.data.state == WorkflowInstanceState.QUEUED)
+            except DartConditionalUpdateFailedException:
+                return action
             wf = self.get_workflow(action.data.workflow_id)
             if wf.data.on_started_email:
                 self._emailer.send_workflow_started_email(wf, wf_instance)
+                db.session.commit()
         return action
 
     def action_checkin(self, action, action_state, consume_subscription_state=None):
@@ -163,8 +192,8 @@ class WorkflowService(object):
         return self._action_service.update_action_state(action, ActionState.FINISHING, action.data.error_message)
 
     @staticmethod
-    def patch_workflow(source_workflow, workflow):
-        workflow = patch_difference(WorkflowDao, source_workflow, workflow)
+    def patch_workflow(source_workflow, workflow, commit=True):
+        workflow = patch_difference(WorkflowDao, source_workflow, workflow, commit)
         return workflow
 
     @staticmethod
@@ -178,39 +207,23 @@ class WorkflowService(object):
         return patch_difference(WorkflowDao, source_workflow, workflow)
 
     @staticmethod
-    def update_workflow_instance(workflow_instance, datastore_id):
+    def update_workflow_instance(workflow_instance, datastore_id, commit=True):
         """ :type workflow_instance: dart.model.workflow.WorkflowInstance """
         source_workflow_instance = workflow_instance.copy()
         workflow_instance.data.datastore_id = datastore_id
-        return patch_difference(WorkflowInstanceDao, source_workflow_instance, workflow_instance)
+        return patch_difference(WorkflowInstanceDao, source_workflow_instance, workflow_instance, commit)
 
-    @staticmethod
-    @retry_stale_data
-    def delete_workflow(workflow_id):
-        workflow_dao = WorkflowDao.query.get(workflow_id)
-        db.session.delete(workflow_dao)
-        db.session.commit()
+    def delete_workflow(self, workflow_id):
+        """ deletes the workflow along with all of its actions """
+        return self._cascade_delete_service.delete_or_defer('workflow', workflow_id)
 
-    @retry_stale_data
     def delete_workflow_instances(self, workflow_id):
-        # We delete with synchronize_session=False here to avoid sqlalchemy blowing up.  It basically means
-        # sqlalchemy will not try to figure out which session objects to invalidate (which is fine since the
-        # session will expire after the commit anyways)
-        offset = 0
-        while True:
-            # Find all workflow instances
-            workflow_instances = self.find_workflow_instances(workflow_id, 20, offset)
-            if not workflow_instances:
-                break
-            # Iterate and delete all actions in each workflow instance
-            for workflow_instance in workflow_instances:
-                self._action_service.delete_actions_in_workflow_instance(workflow_instance.id)
-            offset += 20
-        WorkflowInstanceDao.query.filter(WorkflowInstanceDao.data['workflow_id'].astext == workflow_id).delete(False)
-        db.session.commit()
+        """ deletes the workflow's instances along with their actions and cloned datastores """
+        return self._cascade_delete_service.delete_or_defer('workflow_instances', workflow_id)
 
     @staticmethod
-    def update_workflow_instance_state(workflow_instance, state, commit_changes=True, error_message=None):
+    def update_workflow_instance_state(workflow_instance, state, commit_changes=True, error_message=None,
+                                       conditional=None):
         """ :type workflow_instance: dart.model.workflow.WorkflowInstance """
         source_workflow_instance = workflow_instance.copy()
         workflow_instance.data.state = state
@@ -223,7 +236,8 @@ class WorkflowService(object):
         elif state == WorkflowInstanceState.FAILED:
             workflow_instance.data.end_time = datetime.now()
             workflow_instance.data.error_message = error_message
-        return patch_difference(WorkflowInstanceDao, source_workflow_instance, workflow_instance, commit_changes)
+        return patch_difference(WorkflowInstanceDao, source_workflow_instance, workflow_instance, commit_changes,
+                                conditional)
 
     def run_triggered_workflow(self, workflow_id, trigger_type, trigger_id=None):
         wf = self.get_workflow(workflow_id, raise_when_missing=False)
@@ -239,7 +253,9 @@ class WorkflowService(object):
             _logger.info('workflow (id=%s) has already reached max concurrency of %s' % (wf.id, wf.data.concurrency))
             return
 
-        wf_instance = self.save_workflow_instance(wf, trigger_type, trigger_id, WorkflowInstanceState.QUEUED)
+        # the instance, its datastore and its actions are created in a single transaction (the failure paths below
+        # commit the instance as FAILED along with whatever was created before it)
+        wf_instance = self.save_workflow_instance(wf, trigger_type, trigger_id, WorkflowInstanceState.QUEUED, False)
 
         datastore = self._datastore_service.get_datastore(wf.data.datastore_id, raise_when_missing=False)
         if not datastore:
@@ -250,6 +266,7 @@ class WorkflowService(object):
         if datastore.data.state == DatastoreState.TEMPLATE:
             datastore = self._datastore_service.clone_datastore(
                 datastore,
+                commit=False,
                 state=DatastoreState.ACTIVE,
                 workflow_id=wf.id,
                 workflow_instance_id=wf_instance.id,
@@ -260,23 +277,18 @@ class WorkflowService(object):
             self.update_workflow_instance_state(wf_instance, WorkflowInstanceState.FAILED, error_message=error_msg)
             return
 
-        wf_instance = self.update_workflow_instance(wf_instance, datastore.id)
-
-        actions = self._action_service.find_actions(workflow_id=wf.id, states=[ActionState.TEMPLATE])
-        if len(actions) <= 0:
-            error_msg = 'no TEMPLATE actions were found for this workflow'
-            self.update_workflow_instance_state(wf_instance, WorkflowInstanceState.FAILED, error_message=error_msg)
-            return
-
-        actions[0].data.first_in_workflow = True
-        actions[-1].data.last_in_workflow = True
+        wf_instance = self.update_workflow_instance(wf_instance, datastore.id, commit=False)
 
-        self._action_service.clone_workflow_actions(
-            source_actions=actions,
-            target_datastore_id=datastore.id,
-            datastore_id=datastore.id,
+        action_count = self._action_service.clone_workflow_template_actions(
             workflow_id=wf.id,
+            datastore_id=datastore.id,
             workflow_instance_id=wf_instance.id,
+            commit=False,
         )
+        if action_count <= 0:
+            error_msg = 'no TEMPLATE actions were found for this workflow'
+            self.update_workflow_instance_state(wf_instance, WorkflowInstanceState.FAILED, error_message=error_msg)
+            return
 
+        db.session.commit()
         self._trigger_proxy.try_next_action(datastore.id)
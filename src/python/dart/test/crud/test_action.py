@@ -1,11 +1,15 @@
 import unittest
 
 from dart.client.python.dart_client import Dart
+from dart.context.database import db
 from dart.engine.no_op.metadata import NoOpActionTypes
 from dart.model.exception import DartRequestException
 from dart.model.action import Action, ActionData, ActionState
 from dart.model.datastore import Datastore, DatastoreData, DatastoreState
+from dart.model.orm import ActionDao, ActionPayloadDao
 from dart.model.workflow import Workflow, WorkflowData
+from dart.service.action import ActionService
+from dart.util.rand import new_id
 
 
 class TestActionCrud(unittest.TestCase):
@@ -105,5 +109,48 @@ class TestActionCrud(unittest.TestCase):
 
         self.fail('action should have been missing after delete!')
 
+    def test_update_action_saved_before_payload_table(self):
+        action = Action(data=ActionData(name=NoOpActionTypes.action_that_succeeds.name,
+                                        action_type_name=NoOpActionTypes.action_that_succeeds.name,
+                                        engine_name='no_op_engine', extra_data={'k': 'v'}))
+        action = self.dart.save_actions(actions=[action], datastore_id=self.datastore.id)[0]
+
+        # move the payload back into the action row, as it was stored before the action_payload table existed
+        action_dao = ActionDao.query.get(action.id)
+        action_dao.data = dict(action_dao.data, extra_data={'k': 'v'})
+        db.session.delete(ActionPayloadDao.query.get(action.id))
+        db.session.commit()
+
+        self.dart.patch_action(action, tags=['patched'])
+        patched = self.dart.get_action(action.id)
+        self.assertEqual(patched.data.tags, ['patched'])
+        self.assertEqual(patched.data.extra_data, {'k': 'v'})
+        db.session.expire_all()
+        self.assertIsNone(ActionDao.query.get(action.id).data.get('extra_data'))
+        self.assertEqual(ActionPayloadDao.query.get(action.id).extra_data, {'k': 'v'})
+
+        self.dart.delete_action(action.id)
+        db.session.commit()
+
+    def test_clone_workflow_template_actions_copies_payload(self):
+        template = Action(data=ActionData(name=NoOpActionTypes.action_that_succeeds.name,
+                                          action_type_name=NoOpActionTypes.action_that_succeeds.name,
+                                          engine_name='no_op_engine', state=ActionState.TEMPLATE,
+                                          extra_data={'k': 'v'}))
+        template = self.dart.save_actions(actions=[template], workflow_id=self.workflow.id)[0]
+
+        workflow_instance_id = new_id()
+        count = ActionService.clone_workflow_template_actions(self.workflow.id, self.datastore.id,
+                                                              workflow_instance_id)
+        self.assertEqual(count, 1)
+        clone = ActionDao.query.filter(ActionDao.data['workflow_instance_id'].astext == workflow_instance_id).one()
+        self.assertEqual(clone.data['workflow_action_id'], template.id)
+        self.assertEqual(ActionPayloadDao.query.get(clone.id).extra_data, {'k': 'v'})
+
+        self.dart.delete_action(clone.id)
+        self.dart.delete_action(template.id)
+        db.session.commit()
+
+
 if __name__ == '__main__':
     unittest.main()
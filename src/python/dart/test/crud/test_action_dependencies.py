@@ -0,0 +1,94 @@
+import unittest
+
+from dart.client.python.dart_client import Dart
+from dart.context.database import db
+from dart.engine.no_op.metadata import NoOpActionTypes
+from dart.model.action import Action, ActionData, ActionState
+from dart.model.datastore import Datastore, DatastoreData, DatastoreState
+from dart.model.exception import DartRequestException
+from dart.model.orm import ActionDao
+from dart.model.workflow import Workflow, WorkflowData
+from dart.service.action import ActionService
+from dart.util.rand import new_id
+
+
+class TestActionDependencies(unittest.TestCase):
+    def setUp(self):
+        self.dart = Dart(host='localhost', port=5000)
+        args = {'action_sleep_time_in_seconds': 0}
+        dst = Datastore(data=DatastoreData(name='test-datastore', engine_name='no_op_engine', args=args,
+                                           state=DatastoreState.TEMPLATE))
+        self.datastore = self.dart.save_datastore(dst)
+        wf = Workflow(data=WorkflowData(name='test-workflow', datastore_id=self.datastore.id))
+        self.workflow = self.dart.save_workflow(workflow=wf, datastore_id=self.datastore.id)
+
+    def tearDown(self):
+        db.session.rollback()
+        self.dart.delete_workflow(self.workflow.id)
+        self.dart.delete_datastore(self.datastore.id)
+
+    @staticmethod
+    def _template(name, depends_on=None):
+        return Action(id=name, data=ActionData(name, NoOpActionTypes.action_that_succeeds.name,
+                                               engine_name='no_op_engine', state=ActionState.TEMPLATE,
+                                               depends_on=depends_on))
+
+    def _save_templates(self, *templates):
+        saved = self.dart.save_actions(list(templates), workflow_id=self.workflow.id)
+        return {a.data.name: a for a in saved}
+
+    def test_depends_on_siblings_in_the_same_request(self):
+        saved = self._save_templates(self._template('a'), self._template('b', ['a']), self._template('c', ['a']))
+        self.assertEqual(saved['b'].data.depends_on, [saved['a'].id])
+        self.assertEqual(saved['c'].data.depends_on, [saved['a'].id])
+
+        # later requests refer to the saved ids
+        later = self._save_templates(self._template('d', [saved['b'].id, saved['c'].id]))
+        self.assertEqual(later['d'].data.depends_on, [saved['b'].id, saved['c'].id])
+
+    def test_unknown_depends_on_id(self):
+        with self.assertRaises(DartRequestException):
+            self._save_templates(self._template('a', ['unknown']))
+        with self.assertRaises(DartRequestException):
+            self._save_templates(self._template('a', ['a']))
+
+    def test_cycle(self):
+        with self.assertRaises(DartRequestException):
+            self._save_templates(self._template('a', ['c']), self._template('b', ['a']), self._template('c', ['b']))
+
+        saved = self._save_templates(self._template('a'), self._template('b', ['a']))
+        with self.assertRaises(DartRequestException):
+            self.dart.patch_action(saved['a'], depends_on=[saved['b'].id])
+
+    def test_runnable_actions(self):
+        self._save_templates(self._template('a'), self._template('b', ['a']), self._template('c', ['a']),
+                             self._template('d', ['b', 'c']), self._template('e', []))
+        workflow_instance_id = new_id()
+        ActionService.clone_workflow_template_actions(self.workflow.id, self.datastore.id, workflow_instance_id)
+        daos = ActionDao.query.filter(ActionDao.data['workflow_instance_id'].astext == workflow_instance_id).all()
+        daos_by_name = {dao.data['name']: dao for dao in daos}
+
+        def runnable_names():
+            db.session.expire_all()
+            return sorted(a.data.name for a in ActionService.find_runnable_actions(self.datastore.id, 10))
+
+        def finish(*names):
+            for name in names:
+                dao = daos_by_name[name]
+                dao.data = dict(dao.data, state=ActionState.COMPLETED)
+            db.session.commit()
+
+        self.assertEqual(runnable_names(), ['a', 'e'])
+        finish('a', 'e')
+        self.assertEqual(runnable_names(), ['b', 'c'])
+        finish('b')
+        self.assertEqual(runnable_names(), ['c'])
+        finish('c')
+        self.assertEqual(runnable_names(), ['d'])
+        finish('d')
+        self.assertEqual(runnable_names(), [])
+        self.dart.delete_workflow_instances(self.workflow.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
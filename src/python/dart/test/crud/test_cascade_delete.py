@@ -0,0 +1,91 @@
+import unittest
+
+from dart.client.python.dart_client import Dart
+from dart.context.database import db
+from dart.model.action import ActionState
+from dart.model.datastore import Datastore, DatastoreData, DatastoreState
+from dart.model.orm import ActionArchiveDao, ActionPayloadArchiveDao, WorkflowDao
+from dart.model.workflow import Workflow, WorkflowData
+from dart.service.cascade_delete import CascadeDeleteService
+from dart.util.rand import new_id
+
+
+class TestCascadeDelete(unittest.TestCase):
+    def setUp(self):
+        self.dart = Dart(host='localhost', port=5000)
+        args = {'action_sleep_time_in_seconds': 0}
+        dst = Datastore(data=DatastoreData(name='test-datastore',
+                                           engine_name='no_op_engine',
+                                           args=args,
+                                           state=DatastoreState.ACTIVE))
+        self.datastore = self.dart.save_datastore(dst)
+        wf = Workflow(data=WorkflowData(name='test-workflow', datastore_id=self.datastore.id,
+                                        engine_name='no_op_engine'))
+        self.workflow = self.dart.save_workflow(wf, self.datastore.id)
+
+    def tearDown(self):
+        db.session.rollback()
+
+    @staticmethod
+    def _archive_action(**data):
+        """ adds an archived action (and its archived payload) directly, as the archiver would have """
+        action_id = new_id()
+        data.update(name='test-archived-action', state=ActionState.COMPLETED, engine_name='no_op_engine')
+        db.session.add(ActionArchiveDao(id=action_id, data=data))
+        db.session.add(ActionPayloadArchiveDao(id=action_id, error_message='archived'))
+        db.session.commit()
+        return action_id
+
+    @staticmethod
+    def _archived_ids(action_ids):
+        db.session.expire_all()
+        return [i for i in action_ids
+                if ActionArchiveDao.query.get(i) or ActionPayloadArchiveDao.query.get(i)]
+
+    def test_delete_workflow_and_datastore_with_archived_actions(self):
+        workflow_action_id = self._archive_action(workflow_id=self.workflow.id, datastore_id=self.datastore.id)
+        one_off_action_id = self._archive_action(datastore_id=self.datastore.id)
+
+        self.dart.delete_workflow(self.workflow.id)
+        self.assertEqual(self._archived_ids([workflow_action_id, one_off_action_id]), [one_off_action_id])
+
+        self.dart.delete_datastore(self.datastore.id)
+        self.assertEqual(self._archived_ids([one_off_action_id]), [])
+
+    def test_delete_in_batches(self):
+        action_ids = [self._archive_action(workflow_id=self.workflow.id) for _ in range(5)]
+        progress = []
+        service = CascadeDeleteService({'dart': {'cascade_delete_batch_size': 2}}, _TriggerProxy())
+        counts = service.delete_workflow(self.workflow.id, lambda *args: progress.append(args))
+        self.assertEqual(counts, {'action': 0, 'action_archive': 5, 'workflow': 1})
+        self.assertEqual(progress, [('action_archive', 2), ('action_archive', 4), ('action_archive', 5)])
+        self.assertEqual(self._archived_ids(action_ids), [])
+        self.dart.delete_datastore(self.datastore.id)
+
+    def test_delete_or_defer(self):
+        action_ids = [self._archive_action(workflow_id=self.workflow.id) for _ in range(3)]
+        trigger_proxy = _TriggerProxy()
+        config = {'dart': {'cascade_delete_batch_size': 2, 'cascade_delete_request_seconds': -1}}
+        service = CascadeDeleteService(config, trigger_proxy)
+
+        self.assertFalse(service.delete_or_defer('workflow', self.workflow.id))
+        self.assertEqual(trigger_proxy.calls, [('workflow', self.workflow.id)])
+        self.assertEqual(len(self._archived_ids(action_ids)), 1)
+
+        # the trigger worker finishes the delete
+        service.delete('workflow', self.workflow.id)
+        self.assertEqual(self._archived_ids(action_ids), [])
+        self.assertIsNone(WorkflowDao.query.get(self.workflow.id))
+        self.dart.delete_datastore(self.datastore.id)
+
+
+class _TriggerProxy(object):
+    def __init__(self):
+        self.calls = []
+
+    def cascade_delete(self, delete_name, entity_id):
+        self.calls.append((delete_name, entity_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
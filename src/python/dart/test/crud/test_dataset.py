@@ -1,4 +1,5 @@
 import unittest
+import requests
 from dart.client.python.dart_client import Dart
 from dart.engine.no_op.metadata import NoOpActionTypes
 from dart.model.exception import DartRequestException
@@ -40,6 +41,29 @@ class TestDatasetCrud(unittest.TestCase):
 
         self.fail('dataset should have been missing after delete!')
 
+    def test_conditional_get(self):
+        ds = Dataset(data=DatasetData(name='test_conditional_get', table_name='test_conditional_get',
+                                      load_type=LoadType.INSERT, location='s3://bucket/prefix',
+                                      data_format=DataFormat(FileFormat.PARQUET, RowFormat.NONE),
+                                      columns=[Column('c1', DataType.VARCHAR, 50)]))
+        posted_dataset = self.dart.save_dataset(ds)
+        url = 'http://localhost:5000/api/1/dataset/%s' % posted_dataset.id
+
+        response = requests.get(url)
+        etag = response.headers['ETag']
+        self.assertEqual(requests.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        # the client answers repeated gets from its cache after a 304
+        self.assertEqual(self.dart.get_dataset(posted_dataset.id).to_dict(), posted_dataset.to_dict())
+        self.assertEqual(self.dart.get_dataset(posted_dataset.id).to_dict(), posted_dataset.to_dict())
+
+        posted_dataset.data.compression = Compression.GZIP
+        put_dataset = self.dart.save_dataset(posted_dataset)
+        self.assertEqual(requests.get(url, headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(self.dart.get_dataset(posted_dataset.id).to_dict(), put_dataset.to_dict())
+
+        self.dart.delete_dataset(posted_dataset.id)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+
+from sqlalchemy import text
+
+from dart.context.database import db, config
+from dart.model.email import OutboxEmailState
+from dart.model.orm import OutboxEmailDao
+from dart.service.email import Emailer
+from dart.service.email_outbox import EmailOutboxSender
+from dart.util.rand import random_id
+
+
+class TestEmailOutbox(unittest.TestCase):
+    def setUp(self):
+        self.emailer = Emailer(config)
+        # a unique subject, so that only the emails of this test are looked at
+        self.subject = 'test-outbox-' + random_id()
+        self.delivering_emailer = _DeliveringEmailer()
+        self.sender = EmailOutboxSender(self.delivering_emailer, {'email': {'outbox': {'max_attempts': 2,
+                                                                                        'batch_size': 1000}}})
+
+    def tearDown(self):
+        db.session.rollback()
+        OutboxEmailDao.query.filter(OutboxEmailDao.subject.like('%' + self.subject + '%')).delete(False)
+        db.session.commit()
+
+    def _emails(self):
+        db.session.expire_all()
+        return OutboxEmailDao.query\
+            .filter(OutboxEmailDao.subject.like('%' + self.subject + '%'))\
+            .order_by(OutboxEmailDao.created)\
+            .all()
+
+    def _deliveries(self):
+        return [d for d in self.delivering_emailer.deliveries if self.subject in d[0]]
+
+    @staticmethod
+    def _make_due(digest_key):
+        sql = 'UPDATE email_outbox SET next_attempt = NOW() WHERE digest_key = :digest_key'
+        db.session.execute(text(sql).bindparams(digest_key=digest_key))
+        db.session.commit()
+
+    def test_the_caller_commits(self):
+        self.emailer.send_email(self.subject, 'body', 'a@example.com')
+        db.session.rollback()
+        self.assertEqual(self._emails(), [])
+
+        self.emailer.send_email(self.subject, 'body', 'a@example.com', cc=['b@example.com', 'c@example.com'])
+        db.session.commit()
+        email, = self._emails()
+        self.assertTrue(email.subject.endswith(' - ' + self.subject))
+        self.assertEqual((email.to_addresses, email.cc_addresses), (['a@example.com'], ['b@example.com',
+                                                                                        'c@example.com']))
+        self.assertEqual((email.state, email.attempts), (OutboxEmailState.PENDING, 0))
+
+    def test_send(self):
+        self.emailer.send_email(self.subject, 'body', 'a@example.com')
+        db.session.commit()
+        self.sender.send_pending_emails()
+        self.assertEqual(self._deliveries(), [(self._emails()[0].subject, 'body', ['a@example.com'], [])])
+        self.assertEqual([(e.state, e.attempts) for e in self._emails()], [(OutboxEmailState.SENT, 1)])
+
+    def test_digest(self):
+        digest_key = self.subject + '-digest'
+        for i in range(3):
+            self.emailer.send_email('%s %s' % (self.subject, i), 'body %s' % i, 'a@example.com', digest_key=digest_key)
+            db.session.commit()
+        emails = self._emails()
+        self.assertEqual(len({e.next_attempt for e in emails}), 1)
+
+        # the emails are held for the digest window, then delivered as one
+        self.sender.send_pending_emails()
+        self.assertEqual(self._deliveries(), [])
+        self._make_due(digest_key)
+        self.sender.send_pending_emails()
+        (subject, body, to, cc), = self._deliveries()
+        self.assertTrue(subject.endswith('%s 0 (and 2 more)' % self.subject))
+        self.assertEqual([body.count('body %s' % i) for i in range(3)], [1, 1, 1])
+        self.assertEqual({e.state for e in self._emails()}, {OutboxEmailState.SENT})
+
+    def test_failed_delivery(self):
+        digest_key = self.subject + '-failure'
+        self.emailer.send_email(self.subject, 'body', 'a@example.com', digest_key=digest_key)
+        db.session.commit()
+        self._make_due(digest_key)
+        self.delivering_emailer.error = Exception('mail server is down')
+
+        # retried later, then given up on after max_attempts
+        self.sender.send_pending_emails()
+        email, = self._emails()
+        self.assertEqual((email.state, email.attempts, email.error_message),
+                         (OutboxEmailState.PENDING, 1, 'mail server is down'))
+        self.sender.send_pending_emails()
+        self.assertEqual(self._emails()[0].attempts, 1)
+
+        self._make_due(digest_key)
+        self.sender.send_pending_emails()
+        self.assertEqual([(e.state, e.attempts) for e in self._emails()], [(OutboxEmailState.FAILED, 2)])
+
+
+class _DeliveringEmailer(object):
+    def __init__(self):
+        self.deliveries = []
+        self.error = None
+
+    def deliver_email(self, subject, body, to, cc=None):
+        if self.error:
+            raise self.error
+        self.deliveries.append((subject, body, to, cc))
+
+
+if __name__ == '__main__':
+    unittest.main()
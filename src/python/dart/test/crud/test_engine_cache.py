@@ -0,0 +1,114 @@
+import unittest
+
+from dart.context.database import db
+from dart.model.action import ActionType
+from dart.model.cache_version import CacheVersions
+from dart.model.engine import EngineData
+from dart.model.orm import EngineDao
+from dart.service.cache_version import increment_cache_version
+from dart.service.engine_cache import EngineCache
+from dart.util.rand import new_id, random_id
+
+
+class TestEngineCache(unittest.TestCase):
+    def setUp(self):
+        self.engine_name = 'test-engine-' + random_id()
+        action_types = [
+            ActionType('load', params_json_schema={'type': 'object', 'properties': {'size': {'type': 'integer'}}}),
+            ActionType('noop'),
+        ]
+        options_schema = {'type': 'object', 'properties': {'region': {'type': 'string'}}}
+        self.engine_id = self._add_engine(EngineData(self.engine_name, 'test', options_schema, action_types))
+        # the cache reloads on every lookup while the counter does not exist
+        increment_cache_version(CacheVersions.ENGINES)
+        self.engine_cache = self._engine_cache(3600, 0)
+
+    def tearDown(self):
+        db.session.rollback()
+        db.session.delete(EngineDao.query.get(self.engine_id))
+        increment_cache_version(CacheVersions.ENGINES)
+
+    @staticmethod
+    def _engine_cache(max_age_seconds, version_check_seconds):
+        return EngineCache({'dart': {'engine_cache': {'max_age_seconds': max_age_seconds,
+                                                      'version_check_seconds': version_check_seconds}}})
+
+    @staticmethod
+    def _add_engine(engine_data):
+        """ adds an engine directly, bypassing EngineService (as a migration tool would) """
+        engine_id = new_id()
+        db.session.add(EngineDao(id=engine_id, name=engine_data.name, data=engine_data.to_dict()))
+        db.session.commit()
+        return engine_id
+
+    def _update_description(self, description):
+        dao = EngineDao.query.get(self.engine_id)
+        dao.data = dict(dao.data, description=description)
+        db.session.commit()
+
+    def test_engines(self):
+        self.assertIn(self.engine_name, self.engine_cache.all_engine_names())
+        self.assertEqual(self.engine_cache.get_engine_by_name(self.engine_name).id, self.engine_id)
+        self.assertIsNone(self.engine_cache.get_engine_by_name('missing-' + self.engine_name, False))
+        self.assertRaises(Exception, self.engine_cache.get_engine_by_name, 'missing-' + self.engine_name)
+        self.assertEqual(self.engine_cache.get_action_type(self.engine_name, 'load').name, 'load')
+        self.assertIsNone(self.engine_cache.get_action_type(self.engine_name, 'missing'))
+
+        # callers get copies
+        engine = self.engine_cache.get_engine_by_name(self.engine_name)
+        engine.data.supported_action_types.pop()
+        self.engine_cache.get_action_type(self.engine_name, 'load').params_json_schema['type'] = 'string'
+        self.assertEqual(len(self.engine_cache.get_engine_by_name(self.engine_name).data.supported_action_types), 2)
+        self.assertEqual(self.engine_cache.get_action_type(self.engine_name, 'load').params_json_schema['type'],
+                         'object')
+
+    def test_schemas_are_shared(self):
+        schema = self.engine_cache.get_action_schema(self.engine_name, 'load')
+        self.assertEqual(schema['properties']['data']['properties']['args']['properties']['size'], {'type': 'integer'})
+        self.assertIs(self.engine_cache.get_action_schema(self.engine_name, 'load'), schema)
+        self.assertIsNone(self.engine_cache.get_action_schema(self.engine_name, 'missing'))
+
+        # every action type has its schema in all_action_schemas, which holds the same objects
+        all_action_schemas = self.engine_cache.all_action_schemas()
+        action_type_count = sum(len(self.engine_cache.get_engine_by_name(name).data.supported_action_types)
+                                for name in self.engine_cache.all_engine_names())
+        self.assertEqual(len(all_action_schemas), action_type_count)
+        self.assertTrue(any(s is schema for s in all_action_schemas))
+        self.assertTrue(any(s is self.engine_cache.get_action_schema(self.engine_name, 'noop')
+                            for s in all_action_schemas))
+
+        datastore_schema = self.engine_cache.get_datastore_schema(self.engine_name)
+        self.assertTrue(any(s is datastore_schema for s in self.engine_cache.all_datastore_schemas()))
+
+    def test_reloads_when_the_version_changes(self):
+        schema = self.engine_cache.get_action_schema(self.engine_name, 'load')
+
+        # a change is not seen until the ENGINES cache version is incremented
+        self._update_description('changed')
+        self.assertEqual(self.engine_cache.get_engine_by_name(self.engine_name).data.description, 'test')
+        self.assertIs(self.engine_cache.get_action_schema(self.engine_name, 'load'), schema)
+        increment_cache_version(CacheVersions.ENGINES)
+        self.assertEqual(self.engine_cache.get_engine_by_name(self.engine_name).data.description, 'changed')
+        self.assertIsNot(self.engine_cache.get_action_schema(self.engine_name, 'load'), schema)
+
+        # invalidate reloads without a version change
+        self._update_description('changed again')
+        self.engine_cache.invalidate()
+        self.assertEqual(self.engine_cache.get_engine_by_name(self.engine_name).data.description, 'changed again')
+
+    def test_version_check_interval(self):
+        engine_cache = self._engine_cache(3600, 3600)
+        self.assertEqual(engine_cache.get_engine_by_name(self.engine_name).data.description, 'test')
+        self._update_description('changed')
+        increment_cache_version(CacheVersions.ENGINES)
+        self.assertEqual(engine_cache.get_engine_by_name(self.engine_name).data.description, 'test')
+
+    def test_reloads_after_max_age(self):
+        engine_cache = self._engine_cache(0, 3600)
+        self.assertEqual(engine_cache.get_engine_by_name(self.engine_name).data.description, 'test')
+        self._update_description('changed')
+        self.assertEqual(engine_cache.get_engine_by_name(self.engine_name).data.description, 'changed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from dart.client.python.dart_client import Dart
+from dart.context.database import db
+from dart.engine.no_op.metadata import NoOpActionTypes
+from dart.model.action import Action, ActionData, ActionState
+from dart.model.datastore import Datastore, DatastoreData, DatastoreState
+from dart.model.graph import GraphEntityIdentifier
+from dart.model.orm import EntitySearchDao
+from dart.model.workflow import Workflow, WorkflowData
+from dart.service.entity_search import ENTITY_SEARCH_ENABLED, EntitySearchService
+from dart.util.rand import random_id
+
+
+@unittest.skipUnless(ENTITY_SEARCH_ENABLED, 'dart.entity_search_enabled is not set')
+class TestEntitySearch(unittest.TestCase):
+    def setUp(self):
+        self.dart = Dart(host='localhost', port=5000)
+        # a unique name, so that the searches below only match the entities of this test
+        self.name = 'test-search-' + random_id()
+        dst = Datastore(data=DatastoreData(name=self.name + '-datastore', engine_name='no_op_engine',
+                                           state=DatastoreState.TEMPLATE))
+        self.datastore = self.dart.save_datastore(dst)
+        wf = Workflow(data=WorkflowData(name=self.name + '-workflow', datastore_id=self.datastore.id))
+        self.workflow = self.dart.save_workflow(wf, self.datastore.id)
+
+    def tearDown(self):
+        db.session.rollback()
+        self.dart.delete_workflow(self.workflow.id)
+        self.dart.delete_datastore(self.datastore.id)
+
+    @staticmethod
+    def _row(entity_id):
+        db.session.expire_all()
+        return EntitySearchDao.query.get(entity_id)
+
+    def test_listeners(self):
+        row = self._row(self.workflow.id)
+        self.assertEqual((row.entity_type, row.name), ('workflow', self.name + '-workflow'))
+        self.assertEqual(row.search_text, ('%s %s-workflow' % (self.workflow.id, self.name)).lower())
+
+        self.dart.patch_workflow(self.workflow, name=self.name + '-renamed')
+        self.assertEqual(self._row(self.workflow.id).name, self.name + '-renamed')
+
+        # only TEMPLATE actions are searchable
+        template = Action(data=ActionData(self.name + '-template', NoOpActionTypes.action_that_succeeds.name,
+                                          engine_name='no_op_engine'))
+        template = self.dart.save_actions([template], workflow_id=self.workflow.id)[0]
+        action = Action(data=ActionData(self.name + '-action', NoOpActionTypes.action_that_succeeds.name,
+                                        engine_name='no_op_engine', state=ActionState.HAS_NEVER_RUN))
+        action = self.dart.save_actions([action], datastore_id=self.datastore.id)[0]
+        self.assertEqual(self._row(template.id).entity_type, 'action')
+        self.assertIsNone(self._row(action.id))
+
+        self.dart.delete_action(template.id)
+        self.dart.delete_action(action.id)
+        self.assertIsNone(self._row(template.id))
+
+    def test_search(self):
+        workflow = GraphEntityIdentifier('workflow', self.workflow.id, self.name + '-workflow')
+        datastore = GraphEntityIdentifier('datastore', self.datastore.id, self.name + '-datastore')
+
+        # the exact match comes first
+        results = EntitySearchService.search_entity_search(self.name + '-workflow', 20)
+        self.assertEqual([r.to_dict() for r in results], [workflow.to_dict()])
+        results = EntitySearchService.search_entity_search(self.name.upper(), 20)
+        self.assertEqual(sorted(r.to_dict() for r in results), sorted([workflow.to_dict(), datastore.to_dict()]))
+        results = EntitySearchService.search_entity_search(self.datastore.id, 20)
+        self.assertEqual([r.to_dict() for r in results][:1], [datastore.to_dict()])
+
+        # the entity table scan used before the entity_search table is built finds the same entities
+        results = EntitySearchService.search_entity_tables(self.name.upper(), 20)
+        self.assertEqual(sorted(r.to_dict() for r in results), sorted([workflow.to_dict(), datastore.to_dict()]))
+
+        # LIKE wildcards in the search are matched literally
+        self.assertEqual(EntitySearchService.search_entity_search(self.name[:-1] + '_', 20), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+import requests
+
+from dart.client.python.dart_client import Dart
+from dart.context.database import db
+from dart.model.datastore import Datastore, DatastoreData, DatastoreState
+from dart.model.workflow import Workflow, WorkflowData
+from dart.service.state_change import StateChangeListener
+
+
+class TestStateChange(unittest.TestCase):
+    def setUp(self):
+        self.dart = Dart(host='localhost', port=5000)
+        self.listener = StateChangeListener({'dart': {'state_change': {'long_poll_max_seconds': 5,
+                                                                       'recheck_seconds': 1}}})
+        # starts the LISTEN thread, and waits for the notification it sends every waiter once it is listening
+        queue = self.listener.subscribe('datastore', 'none')
+        queue.get(timeout=10)
+        self.listener.unsubscribe('datastore', 'none', queue)
+        dst = Datastore(data=DatastoreData(name='test-datastore', engine_name='no_op_engine',
+                                           state=DatastoreState.TEMPLATE))
+        self.datastore = self.dart.save_datastore(dst)
+
+    def tearDown(self):
+        db.session.rollback()
+        self.dart.delete_datastore(self.datastore.id)
+
+    def _publish_later(self, notification, keys):
+        timer = threading.Timer(0.5, self.listener._publish, [notification, keys])
+        timer.start()
+        return timer
+
+    def test_wait_for_notification(self):
+        notification = {'entity_type': 'action', 'id': 'a', 'keys': [['datastore', self.datastore.id]]}
+        self._publish_later(notification, notification['keys'])
+        self.assertEqual(self.listener.wait_for_notification('datastore', self.datastore.id, 5), notification)
+
+        # notifications for other entities are not delivered
+        self._publish_later(notification, [['datastore', 'other']])
+        self.assertIsNone(self.listener.wait_for_notification('datastore', self.datastore.id, 1))
+        self.assertEqual(self.listener._subscribers, {})
+
+    def test_wait_for_change(self):
+        version_ids = [3, 3, 4]
+        self._publish_later({'entity_type': 'datastore'}, [['datastore', self.datastore.id]])
+        start = time.time()
+        version_id = self.listener.wait_for_change('datastore', self.datastore.id, 3, lambda: version_ids.pop(0), 5)
+        self.assertEqual(version_id, 4)
+        self.assertLess(time.time() - start, 5)
+
+        # a version that already differs is returned without waiting, and an unchanged one after the timeout
+        self.assertEqual(self.listener.wait_for_change('datastore', self.datastore.id, 3, lambda: 5, 5), 5)
+        start = time.time()
+        self.assertEqual(self.listener.wait_for_change('datastore', self.datastore.id, 3, lambda: 3, 1), 3)
+        self.assertGreaterEqual(time.time() - start, 1)
+
+    def test_orm_notifications(self):
+        # saving a workflow notifies the waiters on its datastore, once the save commits
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            self.dart.wait_for_state_change('datastore', self.datastore.id, timeout_seconds=20)))
+        thread.start()
+        time.sleep(1)
+        wf = Workflow(data=WorkflowData(name='test-workflow', datastore_id=self.datastore.id))
+        workflow = self.dart.save_workflow(wf, self.datastore.id)
+        thread.join()
+        self.assertEqual((results[0]['entity_type'], results[0]['id']), ('workflow', workflow.id))
+        self.assertIn(['datastore', self.datastore.id], results[0]['keys'])
+
+        # a long poll returns the entity once its version changes
+        patched = self.dart.patch_workflow(workflow, name='test-workflow-renamed')
+        url = 'http://localhost:5000/api/1/workflow/%s' % workflow.id
+        response = requests.get(url, params={'wait_for_change_since': workflow.version_id})
+        self.assertEqual(response.json()['results']['version_id'], patched.version_id)
+        self.dart.delete_workflow(workflow.id)
+
+    def test_bad_parameters(self):
+        url = 'http://localhost:5000/api/1/datastore/%s' % self.datastore.id
+        self.assertEqual(requests.get(url, params={'wait_for_change_since': 'x'}).status_code, 400)
+        url = 'http://localhost:5000/api/1/state_change/datastore/%s' % self.datastore.id
+        self.assertEqual(requests.get(url, params={'timeout_seconds': 'x'}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import unittest
+
+import requests
+
+from dart.client.python.dart_client import Dart
+from dart.engine.no_op.metadata import NoOpActionTypes
+from dart.model.action import Action, ActionData
+from dart.model.datastore import Datastore, DatastoreData, DatastoreState
+from dart.web.api import streaming
+from dart.web.api.streaming import StreamingList
+
+
+class TestStreamingList(unittest.TestCase):
+    def test_encode(self):
+        results = [{'id': 'a', 'data': {'n': 1}}, {'id': 'b', 'data': {'n': None}}]
+        encoded = ''.join(StreamingList(iter(results), limit=2, offset=0, total=5)._encode())
+        self.assertEqual(json.loads(encoded), {'results': results, 'limit': 2, 'offset': 0, 'total': 5})
+        self.assertEqual(json.loads(''.join(StreamingList([])._encode())), {'results': []})
+
+    def test_results_are_read_as_they_are_written(self):
+        pulled = []
+
+        def results():
+            for i in range(10):
+                pulled.append(i)
+                yield 'x' * (streaming._CHUNK_SIZE / 4)
+
+        chunks = StreamingList(results())._encode()
+        next(chunks)
+        # the first chunk is written once it holds enough results, before the rest are read
+        self.assertEqual(len(pulled), 4)
+        remaining = list(chunks)
+        self.assertEqual(len(pulled), 10)
+        self.assertEqual(len(remaining), 2)
+
+
+class TestStreamedListEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.dart = Dart(host='localhost', port=5000)
+        dst = Datastore(data=DatastoreData(name='test-datastore', engine_name='no_op_engine',
+                                           state=DatastoreState.INACTIVE))
+        self.datastore = self.dart.save_datastore(dst)
+        actions = [Action(data=ActionData('test-action-%s' % i, NoOpActionTypes.action_that_succeeds.name,
+                                          engine_name='no_op_engine')) for i in range(3)]
+        self.actions = self.dart.save_actions(actions, datastore_id=self.datastore.id)
+
+    def tearDown(self):
+        for action in self.actions:
+            self.dart.delete_action(action.id)
+        self.dart.delete_datastore(self.datastore.id)
+
+    def _get(self, **params):
+        params['datastore_id'] = self.datastore.id
+        params['order_by'] = json.dumps(['order_idx ASC'])
+        response = requests.get('http://localhost:5000/api/1/action', params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_pages(self):
+        page = self._get(limit=2, offset=0)
+        self.assertEqual((page['limit'], page['offset'], page['total']), (2, 0, 3))
+        self.assertEqual([a['id'] for a in page['results']], [a.id for a in self.actions[:2]])
+
+        page = self._get(limit=2, offset=2)
+        self.assertEqual([a['id'] for a in page['results']], [self.actions[2].id])
+        self.assertEqual(self._get(limit=2, offset=4)['results'], [])
+
+        # the streamed results are the same as the single action responses
+        streamed = Action.from_dict(self._get(limit=1)['results'][0])
+        self.assertEqual(streamed.to_dict(), self.dart.get_action(self.actions[0].id).to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
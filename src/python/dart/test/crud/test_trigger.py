@@ -40,5 +40,24 @@ class TestTriggerCrud(unittest.TestCase):
 
         self.fail('trigger should have been missing after delete!')
 
+    def test_batch(self):
+        args = {'completed_workflow_id': self.workflow.id}
+        triggers = []
+        for name in ['test-trigger-1', 'test-trigger-2']:
+            tr = Trigger(data=TriggerData(name, 'workflow_completion', [self.workflow.id], args))
+            triggers.append(self.dart.save_trigger(tr))
+        ids = [t.id for t in triggers]
+
+        fetched = self.dart.batch_get('trigger', ids + ['missing-id'])
+        self.assertEqual([t.to_dict() for t in fetched[:2]], [t.to_dict() for t in triggers])
+        self.assertIsNone(fetched[2])
+
+        patched = self.dart.batch_patch('trigger', [(t, {'tags': ['batched']}) for t in triggers])
+        self.assertEqual([t.id for t in patched], ids)
+        self.assertEqual([t.data.tags for t in self.dart.batch_get('trigger', ids)], [['batched'], ['batched']])
+
+        for trigger_id in ids:
+            self.dart.delete_trigger(trigger_id)
+
 if __name__ == '__main__':
     unittest.main()
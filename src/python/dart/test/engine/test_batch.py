@@ -0,0 +1,133 @@
+import unittest
+
+from dart.engine.batch import run_action_batch
+from dart.model.action import Action, ActionData, ActionState, ActionType, OnFailure
+from dart.model.engine import ActionContext, ActionResultState, Engine, EngineData
+from dart.model.exception import DartRequestException
+from dart.worker.engine import EngineWorker
+
+
+def _action(action_id, action_type_name='batchable', **data):
+    return Action(id=action_id, data=ActionData(action_id, action_type_name, engine_name='test_engine', **data))
+
+
+class _Dart(object):
+    """ records the calls an engine task makes, with each action RUNNING only from its checkout to its checkin """
+    def __init__(self, actions):
+        self.actions = {a.id: a for a in actions}
+        self.running = set()
+        self.calls = []
+
+    def engine_action_checkout(self, action_id):
+        self.calls.append(('checkout', action_id))
+        if action_id not in self.actions:
+            raise DartRequestException(None, 'action is not PENDING')
+        self.running.add(action_id)
+        return ActionContext(action=self.actions[action_id])
+
+    def engine_action_batch_checkin(self, action_results, released_action_ids):
+        for r in action_results:
+            self.running.remove(r.action_id)
+            self.calls.append(('checkin', r.action_id, r.result.state))
+        if released_action_ids:
+            self.calls.append(('release', released_action_ids))
+
+
+class _Engine(object):
+    def __init__(self, dart, fail_ids=()):
+        self.dart = dart
+        self.fail_ids = fail_ids
+        self.ran = []
+
+    def handler(self, engine, datastore, action):
+        assert engine is self
+        self.ran.append((action.id, sorted(self.dart.running)))
+        if action.id in self.fail_ids:
+            raise Exception('failed')
+
+
+class TestRunActionBatch(unittest.TestCase):
+    def _run(self, actions, action_ids, fail_ids=()):
+        engine = _Engine(_Dart(actions), fail_ids)
+        run_action_batch(engine, action_ids, {'batchable': engine.handler})
+        return engine
+
+    def test_actions_run_one_at_a_time_in_order(self):
+        engine = self._run([_action('a1'), _action('a2')], ['a1', 'a2'])
+        self.assertEqual(engine.ran, [('a1', ['a1']), ('a2', ['a2'])])
+        self.assertEqual(engine.dart.calls, [
+            ('checkout', 'a1'), ('checkin', 'a1', ActionResultState.SUCCESS),
+            ('checkout', 'a2'), ('checkin', 'a2', ActionResultState.SUCCESS),
+        ])
+
+    def test_failure_releases_the_rest_of_the_batch(self):
+        engine = self._run([_action('a1'), _action('a2'), _action('a3')], ['a1', 'a2', 'a3'], fail_ids=['a1'])
+        self.assertEqual(engine.dart.calls, [
+            ('checkout', 'a1'), ('checkin', 'a1', ActionResultState.FAILURE), ('release', ['a2', 'a3']),
+        ])
+
+    def test_failure_continues_when_on_failure_is_continue(self):
+        actions = [_action('a1', on_failure=OnFailure.CONTINUE), _action('a2')]
+        engine = self._run(actions, ['a1', 'a2'], fail_ids=['a1'])
+        self.assertEqual([a for a, running in engine.ran], ['a1', 'a2'])
+
+    def test_unsupported_action_type_fails_the_action(self):
+        engine = self._run([_action('a1', 'unknown', on_failure=OnFailure.CONTINUE), _action('a2')], ['a1', 'a2'])
+        self.assertIn(('checkin', 'a1', ActionResultState.FAILURE), engine.dart.calls)
+        self.assertEqual([a for a, running in engine.ran], ['a2'])
+
+    def test_actions_that_cannot_be_checked_out_are_skipped(self):
+        engine = self._run([_action('a2')], ['a1', 'a2'])
+        self.assertEqual([a for a, running in engine.ran], ['a2'])
+
+
+class _ActionService(object):
+    def __init__(self, following_actions):
+        self.following_actions = following_actions
+        self.pending_ids = []
+
+    def find_following_actions(self, action, limit):
+        return self.following_actions[:limit]
+
+    def update_action_state(self, action, state, error_message, conditional=None):
+        assert state == ActionState.PENDING and conditional(action)
+        self.pending_ids.append(action.id)
+
+
+class TestAddFollowingActionsToBatch(unittest.TestCase):
+    def setUp(self):
+        self.engine = Engine(data=EngineData('test_engine', None, None, [
+            ActionType('batchable', batchable=True),
+            ActionType('not_batchable'),
+        ]))
+
+    def _batch_ids(self, action, following_actions, max_action_batch_size=20):
+        worker = EngineWorker.__new__(EngineWorker)
+        worker._max_action_batch_size = max_action_batch_size
+        worker._action_service = _ActionService(following_actions)
+        batch_ids = [a.id for a in worker._add_following_actions_to_batch(self.engine, action)]
+        self.assertEqual(batch_ids, worker._action_service.pending_ids)
+        return batch_ids
+
+    def test_batch_stops_at_first_unbatchable_action(self):
+        following = [_action('a2'), _action('a3', 'not_batchable'), _action('a4')]
+        self.assertEqual(self._batch_ids(_action('a1'), following), ['a2'])
+
+    def test_batch_size_is_limited(self):
+        following = [_action('a2'), _action('a3'), _action('a4')]
+        self.assertEqual(self._batch_ids(_action('a1'), following, max_action_batch_size=3), ['a2', 'a3'])
+        self.assertEqual(self._batch_ids(_action('a1'), following, max_action_batch_size=1), [])
+
+    def test_batch_stops_at_started_actions(self):
+        following = [_action('a2'), _action('a3', state=ActionState.QUEUED), _action('a4')]
+        self.assertEqual(self._batch_ids(_action('a1'), following), ['a2'])
+
+    def test_depends_on_ends_the_batch_even_when_empty(self):
+        following = [_action('a2'), _action('a3', depends_on=[]), _action('a4')]
+        self.assertEqual(self._batch_ids(_action('a1'), following), ['a2'])
+        self.assertEqual(self._batch_ids(_action('a1', depends_on=[]), following), [])
+        self.assertEqual(self._batch_ids(_action('a1', depends_on=['a0']), following), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
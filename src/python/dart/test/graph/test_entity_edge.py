@@ -0,0 +1,189 @@
+import hashlib
+import unittest
+
+from sqlalchemy import or_
+
+from dart.context.database import db
+from dart.model.action import ActionState
+from dart.model.graph import GraphEntity
+from dart.model.orm import ActionDao, DatasetDao, DatastoreDao, EntityEdgeDao, TriggerDao, WorkflowDao
+from dart.service.entity_edge import _owned_edges, _edge_key, edge_id
+from dart.service.graph.entity import GraphEntityService
+from dart.util.rand import new_id, random_id
+
+
+class TestEntityEdge(unittest.TestCase):
+
+    def test_trigger_edges(self):
+        data = {'state': 'ACTIVE', 'workflow_ids': ['w1', 'w2', 'w1'],
+                'args': {'completed_trigger_ids': ['t0'], 'event_id': 'e1', 'subscription_id': None}}
+        self.assertEqual(_owned_edges('trigger', 't1', data), {
+            ('trigger', 't1', 'workflow', 'w1', 'workflow_ids'),
+            ('trigger', 't1', 'workflow', 'w2', 'workflow_ids'),
+            ('trigger', 't0', 'trigger', 't1', 'completed_trigger_ids'),
+            ('event', 'e1', 'trigger', 't1', 'event_id'),
+        })
+
+    def test_action_edges(self):
+        data = {'state': ActionState.TEMPLATE, 'workflow_id': 'w1', 'args': {'dataset_id': 'd1'}}
+        self.assertEqual(_owned_edges('action', 'a1', data), {
+            ('workflow', 'w1', 'action', 'a1', 'workflow_id'),
+            ('dataset', 'd1', 'action', 'a1', 'dataset_id'),
+        })
+
+    def test_edge_key_ignores_state_changes(self):
+        data = {'state': 'ACTIVE', 'workflow_ids': ['w1']}
+        self.assertEqual(_edge_key('trigger', data), _edge_key('trigger', dict(data, state='INACTIVE')))
+        self.assertNotEqual(_edge_key('trigger', data), _edge_key('trigger', dict(data, workflow_ids=['w2'])))
+
+    def test_edge_id(self):
+        # the same as md5('dataset-d1 action-a1 dataset_id') in postgres
+        self.assertEqual(edge_id('dataset', 'd1', 'action', 'a1', 'dataset_id'),
+                         hashlib.md5('dataset-d1 action-a1 dataset_id').hexdigest())
+
+
+class _EntityTestCase(unittest.TestCase):
+    def setUp(self):
+        self.daos = []
+
+    def tearDown(self):
+        db.session.rollback()
+        # deleting through the ORM also deletes the edges
+        for dao in reversed(self.daos):
+            db.session.delete(dao)
+        db.session.commit()
+
+    def _add(self, dao_class, data, **columns):
+        dao = dao_class(id=new_id(), data=data, **columns)
+        db.session.add(dao)
+        db.session.commit()
+        self.daos.append(dao)
+        return dao
+
+    def _add_dataset(self):
+        name = 'test-dataset-' + random_id()
+        return self._add(DatasetDao, {'name': name, 'location': 's3://test/%s/' % random_id()}, name=name)
+
+    def _add_action(self, args, state=ActionState.TEMPLATE, workflow_id=None):
+        data = {'name': 'test-action', 'state': state, 'action_type_name': 'load', 'args': args,
+                'workflow_id': workflow_id}
+        return self._add(ActionDao, data)
+
+    @staticmethod
+    def _update(dao, **data):
+        dao.data = dict(dao.data, **data)
+        db.session.commit()
+
+
+class TestEntityEdgeListeners(_EntityTestCase):
+    @staticmethod
+    def _edges(entity_id):
+        db.session.expire_all()
+        return {(e.src_type, e.src_id, e.dst_type, e.dst_id, e.relationship)
+                for e in EntityEdgeDao.query.filter(or_(EntityEdgeDao.src_id == entity_id,
+                                                        EntityEdgeDao.dst_id == entity_id))}
+
+    def test_action_edges(self):
+        dataset = self._add_dataset()
+        workflow_id = random_id()
+        action = self._add_action({'dataset_id': dataset.id, 'destination_s3_path': dataset.data['location'] + 'x'},
+                                  workflow_id=workflow_id)
+        edges = {
+            ('dataset', dataset.id, 'action', action.id, 'dataset_id'),
+            ('dataset', dataset.id, 'action', action.id, 'destination_s3_path'),
+            ('workflow', workflow_id, 'action', action.id, 'workflow_id'),
+        }
+        self.assertEqual(self._edges(action.id), edges)
+
+        # the edges follow the data, and an action that is no longer a TEMPLATE leaves the graph
+        self._update(action, args={'dataset_id': dataset.id})
+        edges.remove(('dataset', dataset.id, 'action', action.id, 'destination_s3_path'))
+        self.assertEqual(self._edges(action.id), edges)
+        self._update(action, state=ActionState.HAS_NEVER_RUN)
+        self.assertEqual(self._edges(action.id), set())
+        self._update(action, state=ActionState.TEMPLATE)
+        self.assertEqual(self._edges(action.id), edges)
+
+        action_id = action.id
+        db.session.delete(action)
+        db.session.commit()
+        self.daos.remove(action)
+        self.assertEqual(self._edges(action_id), set())
+
+    def test_only_template_actions_have_edges(self):
+        dataset = self._add_dataset()
+        action = self._add_action({'dataset_id': dataset.id}, state=ActionState.HAS_NEVER_RUN)
+        self.assertEqual(self._edges(action.id), set())
+
+    def test_dataset_location(self):
+        dataset = self._add_dataset()
+        action = self._add_action({'destination_s3_path': dataset.data['location'] + 'x'})
+        edge = ('dataset', dataset.id, 'action', action.id, 'destination_s3_path')
+        self.assertEqual(self._edges(dataset.id), {edge})
+
+        # the edges of a dataset are refreshed from either end
+        self._update(dataset, location='s3://test/%s/' % random_id())
+        self.assertEqual(self._edges(dataset.id), set())
+        self._update(action, args={'destination_s3_path': dataset.data['location']})
+        self.assertEqual(self._edges(dataset.id), {edge})
+
+    def test_trigger_edges(self):
+        trigger = self._add(TriggerDao, {'name': 'test-trigger', 'state': 'ACTIVE', 'workflow_ids': ['w1'],
+                                         'args': {'completed_trigger_ids': ['t0']}})
+        self.assertEqual(self._edges(trigger.id), {('trigger', trigger.id, 'workflow', 'w1', 'workflow_ids'),
+                                                ('trigger', 't0', 'trigger', trigger.id, 'completed_trigger_ids')})
+
+
+class TestEntityGraphWalk(_EntityTestCase):
+    def setUp(self):
+        super(TestEntityGraphWalk, self).setUp()
+        datastore_name = 'test-datastore-' + random_id()
+        self.datastore = self._add(DatastoreDao, {'name': datastore_name, 'state': 'INACTIVE',
+                                                  'engine_name': 'no_op_engine'})
+        self.workflow = self._add(WorkflowDao, {'name': 'test-workflow', 'state': 'INACTIVE',
+                                                'datastore_id': self.datastore.id})
+        self.dataset = self._add_dataset()
+        # the subscription does not exist, so it is left out of the graph
+        self.action = self._add_action({'dataset_id': self.dataset.id, 'subscription_id': random_id()},
+                                       workflow_id=self.workflow.id)
+        self.trigger = self._add(TriggerDao, {'name': 'test-trigger', 'state': 'ACTIVE',
+                                              'workflow_ids': [self.workflow.id], 'args': {}})
+
+    @staticmethod
+    def _graph(dao, entity_type, max_nodes=5000):
+        service = GraphEntityService({'dart': {'entity_graph_max_nodes': max_nodes}}, None, None, None, None)
+        graph = service.get_entity_graph(GraphEntity(entity_type, dao.id, dao.data['name'], dao.data.get('state')))
+        nodes = {(n.entity_type, n.entity_id) for n in graph.nodes}
+        edges = {(e.source_type, e.source_id, e.destination_type, e.destination_id) for e in graph.edges}
+        return nodes, edges
+
+    def test_walk(self):
+        nodes, edges = self._graph(self.dataset, 'dataset')
+        self.assertEqual(nodes, {('dataset', self.dataset.id), ('action', self.action.id),
+                                 ('workflow', self.workflow.id), ('datastore', self.datastore.id),
+                                 ('trigger', self.trigger.id)})
+        self.assertEqual(edges, {('dataset', self.dataset.id, 'action', self.action.id),
+                                 ('workflow', self.workflow.id, 'action', self.action.id),
+                                 ('datastore', self.datastore.id, 'workflow', self.workflow.id),
+                                 ('trigger', self.trigger.id, 'workflow', self.workflow.id)})
+
+        # the walk goes in both directions, so it finds the same graph from any of its entities
+        self.assertEqual(self._graph(self.trigger, 'trigger'), (nodes, edges))
+
+    def test_max_nodes(self):
+        nodes, edges = self._graph(self.dataset, 'dataset', max_nodes=2)
+        self.assertEqual(nodes, {('dataset', self.dataset.id), ('action', self.action.id)})
+        self.assertEqual(edges, {('dataset', self.dataset.id, 'action', self.action.id)})
+
+    def test_cycles(self):
+        trigger = self._add(TriggerDao, {'name': 'test-trigger', 'state': 'ACTIVE',
+                                         'args': {'completed_trigger_ids': [self.trigger.id]}})
+        self._update(self.trigger, args={'completed_trigger_ids': [trigger.id]})
+        nodes, edges = self._graph(trigger, 'trigger')
+        self.assertIn(('trigger', trigger.id, 'trigger', self.trigger.id), edges)
+        self.assertIn(('trigger', self.trigger.id, 'trigger', trigger.id), edges)
+        self.assertEqual(len(nodes), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
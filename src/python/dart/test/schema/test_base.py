@@ -0,0 +1,38 @@
+import unittest
+
+from dart.model.event import Event
+from dart.model.event import EventData
+from dart.model.exception import DartValidationException
+from dart.schema.base import apply_defaults, compile_schema, default_and_validate_all
+from dart.schema.event import event_schema
+
+
+class TestBaseSchema(unittest.TestCase):
+
+    def test_compiled_schemas_are_cached(self):
+        schema = event_schema()
+        self.assertIs(compile_schema(schema), compile_schema(schema))
+        # an equal schema built separately shares the compiled schema too
+        self.assertIs(compile_schema(schema), compile_schema(event_schema()))
+
+    def test_mutable_defaults_are_copied(self):
+        schema = {'type': 'object', 'properties': {'tags': {'type': 'array', 'default': []}, 'nested': {
+            'type': 'object', 'properties': {'name': {'type': 'string', 'default': 'x'}}}}}
+        first, second = {'nested': {'other': 1}}, {'id': 'a'}
+        apply_defaults(first, schema)
+        apply_defaults(second, schema)
+        first['tags'].append('tag')
+        self.assertEqual(first, {'tags': ['tag'], 'nested': {'other': 1, 'name': 'x'}})
+        self.assertEqual(second, {'id': 'a', 'tags': []})
+
+    def test_default_and_validate_all(self):
+        events = default_and_validate_all([Event(data=EventData('a')), Event(data=EventData('b'))], event_schema())
+        self.assertEqual([e.data.name for e in events], ['a', 'b'])
+        self.assertTrue(all(e.data.state for e in events))
+
+        with self.assertRaises(DartValidationException):
+            default_and_validate_all([Event(data=EventData('a')), Event(data=EventData(None))], event_schema())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from sqlalchemy.dialects import postgresql
+
+from dart.model.orm import ActionDao
+from dart.schema.action import action_schema
+from dart.service.filter import FilterService
+from dart.service.order_by import OrderByService
+
+_ARGS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'size': {'type': ['integer', 'null']},
+        'tables': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'columns': {'type': 'array', 'items': {'type': 'string'}},
+                },
+            },
+        },
+    },
+}
+
+_FILTERS = [
+    'state = HAS_NEVER_RUN',
+    'order_idx > 2',
+    'args.size >= 10',
+    'tables.name = events',
+    'args.tables.name LIKE %event%',
+    'args.tables.columns = user_id',
+    'name ~ load',
+    'unknown.key != x',
+]
+_ORDER_BY = ['order_idx ASC', 'args.size DESC', 'updated DESC', 'name ASC']
+
+
+class TestFilterPlans(unittest.TestCase):
+    def setUp(self):
+        # schemas are built once and reused, as with EngineCache
+        self.schemas = [action_schema(_ARGS_SCHEMA), action_schema(None)]
+
+    def _compile(self, services, filter_strings, order_by_strings):
+        filter_service, order_by_service = services
+        query = ActionDao.query
+        for s in order_by_strings:
+            query = order_by_service.apply_order_by(order_by_service.from_string(s), query, ActionDao, self.schemas)
+        for s in filter_strings:
+            query = filter_service.apply_filter(filter_service.from_string(s), query, ActionDao, self.schemas)
+        compiled = query.statement.compile(dialect=postgresql.dialect())
+        return str(compiled), compiled.params
+
+    def test_cached_plans_give_the_same_sql(self):
+        cached_services = (FilterService(), OrderByService())
+        for filter_strings, order_by_strings in [(_FILTERS, _ORDER_BY), (_FILTERS[2:5], _ORDER_BY[1:2]),
+                                                 (_FILTERS[::-1], _ORDER_BY[::-1])]:
+            # the first use fills the caches and the second reads them, while new services never cache
+            for i in range(2):
+                expected = self._compile((FilterService(), OrderByService()), filter_strings, order_by_strings)
+                actual = self._compile(cached_services, filter_strings, order_by_strings)
+                self.assertEqual(actual, expected)
+                # the jsonb_array_elements aliases of the array filters
+                self.assertIn('dart_a_0', actual[0])
+
+    def test_cache_is_keyed_by_schema_identity(self):
+        services = (FilterService(), OrderByService())
+        sql, params = self._compile(services, ['args.size >= 10'], ['args.size DESC'])
+        self.assertIn('AS INTEGER', sql)
+
+        # other schemas (even equal ones) are planned again rather than served the cached plans
+        self.schemas = [action_schema(None)]
+        sql, params = self._compile(services, ['args.size >= 10'], ['args.size DESC'])
+        self.assertNotIn('AS INTEGER', sql)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from dart.context.database import db, config
+from dart.model.orm import SubscriptionElementDao
+from dart.model.subscription import SubscriptionElementState
+from dart.service.subscription import SubscriptionElementService
+from dart.service.subscription_element_partition import SubscriptionElementPartitioner
+from dart.util.rand import new_id
+
+
+class TestReserveSubscriptionElements(unittest.TestCase):
+    def setUp(self):
+        self.service = SubscriptionElementService(None, SubscriptionElementPartitioner(config))
+        self.subscription_id = new_id()
+        sizes = {'a': 100, 'b': 200, 'c': 300, 'd': 400}
+        elements = [(self.subscription_id, 's3://bucket/%s' % name, size) for name, size in sizes.items()]
+        self.service.conditional_insert_subscription_elements(elements)
+
+    def tearDown(self):
+        db.session.rollback()
+        SubscriptionElementDao.query.filter(SubscriptionElementDao.subscription_id == self.subscription_id).delete()
+        db.session.commit()
+
+    def _elements(self, state):
+        db.session.expire_all()
+        daos = SubscriptionElementDao.query\
+            .filter(SubscriptionElementDao.subscription_id == self.subscription_id)\
+            .filter(SubscriptionElementDao.state == state)\
+            .order_by(SubscriptionElementDao.s3_path)\
+            .all()
+        return [(dao.s3_path[-1], dao.batch_id) for dao in daos]
+
+    def test_reserve_until_the_size_is_crossed(self):
+        # in s3_path order, elements are added while the ones before them sum to less than the size
+        self.assertEqual(self.service.reserve_subscription_elements(self.subscription_id, 250), (2, 300))
+        reserved = self._elements(SubscriptionElementState.RESERVED)
+        self.assertEqual([name for name, batch_id in reserved], ['a', 'b'])
+        self.assertEqual(len({batch_id for name, batch_id in reserved}), 1)
+
+        self.assertEqual(self.service.reserve_subscription_elements(self.subscription_id, 250), (1, 300))
+        reserved = self._elements(SubscriptionElementState.RESERVED)
+        self.assertEqual([name for name, batch_id in reserved], ['a', 'b', 'c'])
+        self.assertEqual(len({batch_id for name, batch_id in reserved}), 2)
+
+    def test_nothing_reserved_below_the_size(self):
+        self.assertEqual(self.service.reserve_subscription_elements(self.subscription_id, 1001), (0, 0))
+        self.assertEqual(self._elements(SubscriptionElementState.RESERVED), [])
+
+        # exactly reaching the size is enough
+        self.assertEqual(self.service.reserve_subscription_elements(self.subscription_id, 1000), (4, 1000))
+        self.assertEqual(self._elements(SubscriptionElementState.UNCONSUMED), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import hashlib
+import unittest
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.service.subscription_element_partition import SubscriptionElementPartitioner
+from dart.util.rand import random_id, time_ordered_id
+
+
+def _partitioner(partition_count):
+    return SubscriptionElementPartitioner({'dart': {'subscription_element_partitions': partition_count}})
+
+
+class TestSubscriptionElementPartitioner(unittest.TestCase):
+    def setUp(self):
+        self.partitioner = _partitioner(16)
+        self.subscription_ids = [random_id() for _ in range(50)] + [time_ordered_id() for _ in range(50)]
+
+    def test_partition_key(self):
+        self.assertEqual(self.partitioner.partition_key('ABC123'),
+                         int(hashlib.md5('ABC123').hexdigest()[:8], 16) % 16)
+        keys = {self.partitioner.partition_key(sid) for sid in self.subscription_ids}
+        self.assertTrue(keys <= set(range(16)))
+        self.assertGreater(len(keys), 1)
+
+    def test_partition_key_matches_sql(self):
+        for sid in self.subscription_ids:
+            sql = 'SELECT %s' % self.partitioner.partition_key_sql('CAST(:sid AS TEXT)')
+            sql_key = db.session.execute(text(sql).bindparams(sid=sid)).scalar()
+            self.assertEqual(sql_key, self.partitioner.partition_key(sid), sid)
+        db.session.rollback()
+
+    def test_table_name_and_sql(self):
+        key = self.partitioner.partition_key('ABC123')
+        self.assertEqual(self.partitioner.table_name('ABC123'), 'subscription_element_p%s' % key)
+        self.assertEqual(self.partitioner.key_condition('ABC123', 'se'),
+                         ('(se.partition_key = :partition_key OR se.partition_key IS NULL)', {'partition_key': key}))
+        self.assertEqual(self.partitioner.insert_sql('ABC123'),
+                         (', partition_key', ', CAST(:element_partition_key AS INTEGER)',
+                          {'element_partition_key': key}))
+
+    def test_disabled(self):
+        partitioner = _partitioner(0)
+        self.assertFalse(partitioner.enabled)
+        self.assertIsNone(partitioner.partition_key('ABC123'))
+        self.assertEqual(partitioner.table_name('ABC123'), 'subscription_element')
+        self.assertEqual(partitioner.key_condition('ABC123'), ('TRUE', {}))
+        self.assertEqual(partitioner.insert_sql('ABC123'), ('', '', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
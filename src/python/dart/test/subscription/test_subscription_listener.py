@@ -0,0 +1,116 @@
+import json
+import unittest
+
+from dart.message.broker import SqsJsonMessageBroker
+from dart.message.subscription_listener import SubscriptionListener
+from dart.model.subscription import Subscription
+
+
+def _s3_event(key):
+    records = [{'eventName': 'ObjectCreated:Put', 's3': {'bucket': {'name': 'my-bucket'},
+                                                         'object': {'key': key, 'size': 100}}}]
+    return {'Subject': 'Amazon S3 Notification', 'Message': json.dumps({'Records': records})}
+
+
+class _SqsMessage(object):
+    def __init__(self, message_id, body):
+        self.id = message_id
+        self.body = body
+
+    def get_body(self):
+        return self.body
+
+
+class _Queue(object):
+    def __init__(self, sqs_messages, log):
+        self.sqs_messages = sqs_messages
+        self.log = log
+
+    def get_messages(self, num_messages, wait_time_seconds):
+        return self.sqs_messages[:num_messages]
+
+    def delete_message(self, sqs_message):
+        self.log.append(('delete', sqs_message.id))
+
+
+class _MessageService(object):
+    """ records when each message is begun (marked RUNNING) and completed """
+    def __init__(self, log):
+        self.log = log
+
+    def purge_old_messages(self):
+        pass
+
+    def get_message(self, message_id, raise_when_missing=True):
+        return None
+
+    def save_message(self, message_id, message_body, state):
+        self.log.append(('begin', message_id))
+        return message_id
+
+    def update_message_state(self, message, state):
+        self.log.append(('complete', message))
+
+
+class _SubscriptionMatcher(object):
+    def find_matching_subscriptions(self, s3_path):
+        return [Subscription(id='sub1')]
+
+
+class _SubscriptionElementService(object):
+    def __init__(self, log):
+        self.log = log
+
+    def conditional_insert_subscription_elements(self, elements):
+        self.log.append(('insert', sorted(s3_path for subscription_id, s3_path, size in elements)))
+        return {'sub1': len(elements)}
+
+
+class _TriggerService(object):
+    def __init__(self, log):
+        self.log = log
+
+    def evaluate_subscription_triggers(self, subscription):
+        self.log.append(('evaluate', subscription.id))
+
+
+class TestSubscriptionListener(unittest.TestCase):
+    def _await_call(self, messages):
+        log = []
+        broker = SqsJsonMessageBroker('test-queue')
+        broker._queue = _Queue([_SqsMessage(message_id, body) for message_id, body in messages], log)
+        broker._message_service = _MessageService(log)
+        listener = SubscriptionListener(broker, None, _SubscriptionElementService(log), _TriggerService(log), None,
+                                        None, _SubscriptionMatcher(), {})
+        listener.await_call(wait_time_seconds=0)
+        return [entry for entry in log if entry[0] != 'delete']
+
+    def test_s3_events_are_handled_together(self):
+        log = self._await_call([('m1', _s3_event('a.txt')), ('m2', _s3_event('b.txt'))])
+        self.assertEqual(log, [
+            ('begin', 'm1'), ('begin', 'm2'),
+            ('insert', ['s3://my-bucket/a.txt', 's3://my-bucket/b.txt']), ('evaluate', 'sub1'),
+            ('complete', 'm1'), ('complete', 'm2'),
+        ])
+
+    def test_bad_s3_event_does_not_lose_the_rest_of_the_batch(self):
+        bad_event = {'Subject': 'Amazon S3 Notification', 'Message': 'not json'}
+        log = self._await_call([('m1', _s3_event('a.txt')), ('m2', bad_event), ('m3', _s3_event('c.txt'))])
+        self.assertEqual(log, [
+            ('begin', 'm1'), ('begin', 'm2'), ('begin', 'm3'),
+            ('insert', ['s3://my-bucket/a.txt']), ('evaluate', 'sub1'),
+            ('insert', ['s3://my-bucket/c.txt']), ('evaluate', 'sub1'),
+            ('complete', 'm1'), ('complete', 'm2'), ('complete', 'm3'),
+        ])
+
+    def test_other_messages_are_begun_one_at_a_time(self):
+        log = self._await_call([('m1', {'call': 'unknown'}), ('m2', _s3_event('a.txt')), ('m3', {'call': 'unknown'})])
+        self.assertEqual(log, [
+            ('begin', 'm2'), ('insert', ['s3://my-bucket/a.txt']), ('evaluate', 'sub1'), ('complete', 'm2'),
+            ('begin', 'm1'), ('complete', 'm1'),
+            ('begin', 'm3'), ('complete', 'm3'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
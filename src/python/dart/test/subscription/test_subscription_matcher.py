@@ -0,0 +1,44 @@
+import unittest
+
+from dart.model.subscription import Subscription, SubscriptionData
+from dart.service.subscription_matcher import SubscriptionMatchIndex
+
+
+class TestSubscriptionMatchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SubscriptionMatchIndex()
+        self.all_files = self._add('all-files', 's3://my-bucket/weblogs')
+        start, end = 's3://my-bucket/weblogs/2016-02', 's3://my-bucket/weblogs/2016-04'
+        self.ranged = self._add('ranged', 's3://my-bucket/weblogs', start, end)
+        self.gz_only = self._add('gz-only', 's3://my-bucket/weblogs', regex='.*\\.gz$')
+        self.other = self._add('other', 's3://my-bucket/other')
+
+    def _add(self, name, location, start=None, end=None, regex=None):
+        subscription = Subscription(id=name, data=SubscriptionData(name, 'ABC123', start, end, regex))
+        self.index.add(subscription, location)
+        return subscription
+
+    def _match_ids(self, s3_path):
+        return sorted(s.id for s in self.index.match(s3_path))
+
+    def test_prefix_match(self):
+        self.assertEqual(self._match_ids('s3://my-bucket/weblogs/2016-01/a.txt'), ['all-files'])
+        self.assertEqual(self._match_ids('s3://my-bucket/other/a.txt'), ['other'])
+        self.assertEqual(self._match_ids('s3://my-bucket/unknown/a.txt'), [])
+        self.assertEqual(self._match_ids('s3://my-bucket/web'), [])
+
+    def test_range_is_start_inclusive_end_exclusive(self):
+        self.assertEqual(self._match_ids('s3://my-bucket/weblogs/2016-02'), ['all-files', 'ranged'])
+        self.assertEqual(self._match_ids('s3://my-bucket/weblogs/2016-03/a.txt'), ['all-files', 'ranged'])
+        self.assertEqual(self._match_ids('s3://my-bucket/weblogs/2016-04'), ['all-files'])
+
+    def test_regex_filter(self):
+        self.assertEqual(self._match_ids('s3://my-bucket/weblogs/2016-01/a.gz'), ['all-files', 'gz-only'])
+
+    def test_invalid_regex_is_skipped(self):
+        self._add('bad-regex', 's3://my-bucket/weblogs', regex='(unclosed')
+        self.assertEqual(self.index.size, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
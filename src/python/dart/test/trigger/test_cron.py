@@ -0,0 +1,46 @@
+import unittest
+from datetime import datetime
+
+from dart.util.cron import CronExpression
+
+
+class TestCronExpression(unittest.TestCase):
+    def _next(self, expression, after):
+        return CronExpression(expression).next_fire_time(after)
+
+    def test_every_fifteen_minutes(self):
+        self.assertEqual(self._next('0/15 * * * ? *', datetime(2016, 3, 1, 10, 7, 30)), datetime(2016, 3, 1, 10, 15))
+        self.assertEqual(self._next('0/15 * * * ? *', datetime(2016, 3, 1, 10, 45)), datetime(2016, 3, 1, 11, 0))
+
+    def test_next_fire_time_is_strictly_after(self):
+        self.assertEqual(self._next('0 10 * * ? *', datetime(2016, 3, 1, 10, 0)), datetime(2016, 3, 2, 10, 0))
+
+    def test_days_of_week(self):
+        # 2016-03-01 is a tuesday, and aws numbers the days of the week SUN=1 ... SAT=7
+        self.assertEqual(self._next('0 18 ? * MON-FRI *', datetime(2016, 3, 4, 19, 0)), datetime(2016, 3, 7, 18, 0))
+        self.assertEqual(self._next('0 8 ? * 1 *', datetime(2016, 3, 1)), datetime(2016, 3, 6, 8, 0))
+        self.assertEqual(self._next('0 8 ? * 6L *', datetime(2016, 3, 1)), datetime(2016, 3, 25, 8, 0))
+        self.assertEqual(self._next('0 8 ? * 2#1 *', datetime(2016, 3, 1)), datetime(2016, 3, 7, 8, 0))
+
+    def test_days_of_month(self):
+        self.assertEqual(self._next('0 0 L * ? *', datetime(2016, 2, 3)), datetime(2016, 2, 29, 0, 0))
+        # the 5th of march 2016 is a saturday
+        self.assertEqual(self._next('0 0 5W * ? *', datetime(2016, 3, 1)), datetime(2016, 3, 4, 0, 0))
+        self.assertEqual(self._next('0 0 LW * ? *', datetime(2016, 4, 1)), datetime(2016, 4, 29, 0, 0))
+        self.assertEqual(self._next('0 0 1,15 JAN,JUL ? 2017', datetime(2016, 3, 1)), datetime(2017, 1, 1, 0, 0))
+
+    def test_expressions_that_never_fire_again(self):
+        self.assertIsNone(self._next('0 0 1 1 ? 2015', datetime(2016, 3, 1)))
+        self.assertIsNone(self._next('0 0 30 FEB ? *', datetime(2016, 3, 1)))
+
+    def test_fire_times_between(self):
+        fire_times = CronExpression('0 */6 * * ? *').fire_times_between(datetime(2016, 3, 1), datetime(2016, 3, 2))
+        self.assertEqual([t.hour for t in fire_times], [6, 12, 18, 0])
+
+    def test_invalid_expressions(self):
+        for expression in ['* * * * *', '0 0 * * * *', '0 0 ? * ? *', '60 0 * * ? *', '0 0 ? * 8 *', '0 0 5-1 * ? *']:
+            self.assertRaises(ValueError, CronExpression, expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from dart.trigger import subscription
+from dart.trigger.subscription import SubscriptionBatchTriggerProcessor
+
+
+class TestSubscriptionBatchDebounce(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self._time = subscription.time
+        subscription.time = self.clock
+        self.trigger_proxy = _TriggerProxy()
+
+    def tearDown(self):
+        subscription.time = self._time
+
+    def _processor(self, evaluation_window_seconds):
+        config = {'triggers': {'subscription_batch': {'evaluation_window_seconds': evaluation_window_seconds}}}
+        return SubscriptionBatchTriggerProcessor(self.trigger_proxy, None, None, None, config)
+
+    def _request(self, processor, now, trigger_id='t1'):
+        self.clock.now = now
+        processor.request_evaluation(trigger_id)
+
+    def test_window(self):
+        processor = self._processor(30)
+        # the first request is sent right away, and the next ones in the window are folded into one delayed message
+        self._request(processor, 1000)
+        self._request(processor, 1005)
+        self._request(processor, 1010)
+        self._request(processor, 1029)
+        self.assertEqual(self.trigger_proxy.messages, [('t1', None), ('t1', 25)])
+
+        # a request after the delayed message is delivered, but within its window, is delayed to the window's end
+        self._request(processor, 1040)
+        self.assertEqual(self.trigger_proxy.messages[2:], [('t1', 20)])
+
+        # once the window has closed, a request is sent right away again
+        self._request(processor, 1100)
+        self.assertEqual(self.trigger_proxy.messages[3:], [('t1', None)])
+
+        # triggers are debounced separately
+        self._request(processor, 1101, 't2')
+        self.assertEqual(self.trigger_proxy.messages[4:], [('t2', None)])
+
+    def test_expired_triggers_are_forgotten(self):
+        processor = self._processor(30)
+        for i in range(10):
+            self._request(processor, 1000, 't%s' % i)
+        self.assertEqual(len(processor._evaluation_times), 10)
+
+        self._request(processor, 1031, 'other')
+        self.assertEqual(processor._evaluation_times.keys(), ['other'])
+
+        # within a window of the last eviction, nothing is scanned
+        self._request(processor, 1032, 't1')
+        self._request(processor, 1050, 't2')
+        self.assertEqual(sorted(processor._evaluation_times.keys()), ['other', 't1', 't2'])
+        self._request(processor, 1070, 't3')
+        self.assertEqual(sorted(processor._evaluation_times.keys()), ['t2', 't3'])
+
+    def test_no_window(self):
+        processor = self._processor(0)
+        self._request(processor, 1000)
+        self._request(processor, 1000)
+        self.assertEqual(self.trigger_proxy.messages, [('t1', None), ('t1', None)])
+        self.assertEqual(processor._evaluation_times, {})
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def time(self):
+        return self.now
+
+
+class _TriggerProxy(object):
+    def __init__(self):
+        self.messages = []
+
+    def trigger_subscription_evaluation(self, trigger_id, delay_seconds=None):
+        self.messages.append((trigger_id, delay_seconds))
+
+
+if __name__ == '__main__':
+    unittest.main()
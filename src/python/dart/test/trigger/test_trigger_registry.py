@@ -0,0 +1,99 @@
+import unittest
+
+from dart.context.database import db
+from dart.model.cache_version import CacheVersions
+from dart.model.orm import CacheVersionDao, TriggerDao
+from dart.model.trigger import TriggerState
+from dart.service.cache_version import get_cache_version, increment_cache_version
+from dart.service.trigger_registry import TriggerRegistry
+from dart.util.rand import new_id, random_id
+
+
+class TestCacheVersion(unittest.TestCase):
+    def setUp(self):
+        self.name = 'TEST_' + random_id()
+
+    def tearDown(self):
+        db.session.rollback()
+        CacheVersionDao.query.filter(CacheVersionDao.name == self.name).delete()
+        db.session.commit()
+
+    def test_increment(self):
+        self.assertIsNone(get_cache_version(self.name))
+        increment_cache_version(self.name)
+        self.assertEqual(get_cache_version(self.name), 1)
+        increment_cache_version(self.name)
+        self.assertEqual(get_cache_version(self.name), 2)
+
+        # without a commit, the increment is rolled back with the caller's transaction
+        increment_cache_version(self.name, commit=False)
+        db.session.rollback()
+        self.assertEqual(get_cache_version(self.name), 2)
+
+
+class TestTriggerRegistry(unittest.TestCase):
+    def setUp(self):
+        # unique arg values, so that the lookups below only find the triggers of this test
+        self.trigger_ids = [random_id(), random_id()]
+        self.super_id = self._add_trigger('super', {'completed_trigger_ids': self.trigger_ids})
+        self.workflow_id = random_id()
+        self.completion_id = self._add_trigger('workflow_completion', {'completed_workflow_id': self.workflow_id})
+        # the registry reloads on every lookup while the counter does not exist
+        increment_cache_version(CacheVersions.TRIGGERS)
+        self.registry = TriggerRegistry({'triggers': {'registry': {'max_age_seconds': 3600}}})
+
+    def tearDown(self):
+        db.session.rollback()
+        for dao in TriggerDao.query.filter(TriggerDao.id.in_([self.super_id, self.completion_id])).all():
+            db.session.delete(dao)
+        increment_cache_version(CacheVersions.TRIGGERS)
+
+    @staticmethod
+    def _add_trigger(trigger_type_name, args, state=TriggerState.ACTIVE):
+        """ adds a trigger directly, bypassing TriggerService (as a migration tool would) """
+        trigger_id = new_id()
+        data = {'name': 'test-trigger', 'trigger_type_name': trigger_type_name, 'args': args, 'state': state}
+        db.session.add(TriggerDao(id=trigger_id, data=data))
+        db.session.commit()
+        return trigger_id
+
+    def _find_ids(self, trigger_type_name, arg_name, arg_value):
+        return [t.id for t in self.registry.find_triggers(trigger_type_name, arg_name, arg_value)]
+
+    def test_find_triggers(self):
+        # each element of a list arg is indexed
+        self.assertEqual(self._find_ids('super', 'completed_trigger_ids', self.trigger_ids[0]), [self.super_id])
+        self.assertEqual(self._find_ids('super', 'completed_trigger_ids', self.trigger_ids[1]), [self.super_id])
+        self.assertEqual(self._find_ids('workflow_completion', 'completed_workflow_id', self.workflow_id),
+                         [self.completion_id])
+        self.assertEqual(self._find_ids('super', 'completed_workflow_id', self.workflow_id), [])
+
+        # callers get copies
+        trigger, = self.registry.find_triggers('super', 'completed_trigger_ids', self.trigger_ids[0])
+        trigger.data.args['completed_trigger_ids'].append('other')
+        trigger, = self.registry.find_triggers('super', 'completed_trigger_ids', self.trigger_ids[0])
+        self.assertEqual(trigger.data.args['completed_trigger_ids'], self.trigger_ids)
+
+    def test_reloads_when_the_version_changes(self):
+        self.assertEqual(self._find_ids('workflow_completion', 'completed_workflow_id', self.workflow_id),
+                         [self.completion_id])
+
+        # a change is not seen until the TRIGGERS cache version is incremented
+        dao = TriggerDao.query.get(self.completion_id)
+        dao.data = dict(dao.data, state=TriggerState.INACTIVE)
+        db.session.commit()
+        self.assertEqual(self._find_ids('workflow_completion', 'completed_workflow_id', self.workflow_id),
+                         [self.completion_id])
+        increment_cache_version(CacheVersions.TRIGGERS)
+        self.assertEqual(self._find_ids('workflow_completion', 'completed_workflow_id', self.workflow_id), [])
+
+    def test_reloads_after_max_age(self):
+        registry = TriggerRegistry({'triggers': {'registry': {'max_age_seconds': 0}}})
+        self.assertEqual(len(registry.find_triggers('super', 'completed_trigger_ids', self.trigger_ids[0])), 1)
+        db.session.delete(TriggerDao.query.get(self.super_id))
+        db.session.commit()
+        self.assertEqual(registry.find_triggers('super', 'completed_trigger_ids', self.trigger_ids[0]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import unittest
+from datetime import datetime, date
+
+from dart.util import json_util
+from dart.util.json_util import DartJsonEncoder, configure_json_codec, json_codec_name, to_jsonable
+
+
+class TestJsonCodec(unittest.TestCase):
+    def setUp(self):
+        self.value = {
+            'id': 'abc',
+            'created': datetime(2016, 4, 7, 3, 33, 20, 123000),
+            'day': date(2016, 4, 7),
+            'data': {'tags': set(['a']), 'steps': [{'name': 'step', 'progress': 0.25, 'rows': 10, 'done': True}]},
+            'pair': (1, None),
+        }
+        self.expected = json.loads(json.dumps(self.value, cls=DartJsonEncoder))
+
+    def tearDown(self):
+        configure_json_codec('json')
+
+    def test_to_jsonable(self):
+        self.assertEqual(to_jsonable(self.value), self.expected)
+        self.assertEqual(to_jsonable({1: 'x', None: 'y'}), {'1': 'x', 'null': 'y'})
+        self.assertRaises(TypeError, to_jsonable, object())
+
+    def test_codecs(self):
+        for name in ['json', 'ujson']:
+            configure_json_codec(name)
+            self.assertEqual(json_util.loads(json_util.dumps(self.value)), self.expected, json_codec_name())
+            self.assertEqual(json_util.dumps({'b': 1, 'a': 2}, sort_keys=True), '{"a":2,"b":1}')
+
+    def test_unknown_codec(self):
+        self.assertRaises(ValueError, configure_json_codec, 'yaml')
+
+
+if __name__ == '__main__':
+    unittest.main()
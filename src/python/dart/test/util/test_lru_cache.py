@@ -0,0 +1,28 @@
+import unittest
+
+from dart.util.lru_cache import LruCache
+
+
+class TestLruCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LruCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(len(cache), 2)
+
+    def test_by_identity(self):
+        cache = LruCache(2)
+        schemas = [{'type': 'object'}, {'type': 'string'}]
+        cache.put_by_identity(schemas, 'value', 'key')
+        self.assertEqual(cache.get_by_identity(schemas, 'key'), 'value')
+        self.assertEqual(cache.get_by_identity(list(schemas), 'key'), 'value')
+        self.assertIsNone(cache.get_by_identity(schemas, 'other key'))
+        # equal objects that are not the same instances do not match
+        self.assertIsNone(cache.get_by_identity([dict(s) for s in schemas], 'key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from dart.util.rand import time_ordered_id, random_id, configure_id_generator, new_id
+
+
+class TestTimeOrderedIds(unittest.TestCase):
+    def test_ids_sort_by_creation_time(self):
+        ids = [time_ordered_id(1460000000 + i * 0.001) for i in range(100)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids[0]), 20)
+
+    def test_random_ids_sort_by_first_character(self):
+        # the older random ids are shorter, and sort among the time ordered ones by their first character
+        self.assertEqual(len(random_id()), 10)
+        ids = sorted([time_ordered_id(1460000000), 'ZZZZZZZZZZ', '0000000000'])
+        self.assertEqual(ids[0], '0000000000')
+        self.assertEqual(ids[-1], 'ZZZZZZZZZZ')
+
+    def test_configure_id_generator(self):
+        try:
+            configure_id_generator('random')
+            self.assertEqual(len(new_id()), 10)
+            self.assertRaises(ValueError, configure_id_generator, 'unknown')
+        finally:
+            configure_id_generator('time_ordered')
+        self.assertEqual(len(new_id()), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import argparse
+import logging
+import time
+
+from sqlalchemy.dialects import postgresql
+
+from dart.model.orm import ActionDao, DatastoreDao, WorkflowInstanceDao
+from dart.schema.workflow import workflow_instance_schema
+from dart.service.engine_cache import EngineCache
+from dart.service.filter import FilterService
+from dart.service.order_by import OrderByService
+from dart.tool.tool_runner import Tool
+
+_logger = logging.getLogger(__name__)
+
+# filter combinations that the UI list views send
+_ACTION_FILTERS = [
+    ['datastore_id = 0123456789'],
+    ['workflow_instance_id = 0123456789', 'state IN FAILED,COMPLETED'],
+    ['name LIKE %load%', 'tags = nightly', 'order_idx > 2'],
+    ['args.s3_path_start_prefix_inclusive LIKE s3://bucket/%', 'state = HAS_NEVER_RUN'],
+]
+_ACTION_ORDER_BY = ['order_idx ASC', 'updated DESC']
+_DATASTORE_FILTERS = [
+    ['name LIKE %prod%', 'state = ACTIVE'],
+    ['args.cluster_tags.Name = dart-emr', 'engine_name = emr_engine'],
+]
+_WORKFLOW_INSTANCE_FILTERS = [
+    ['workflow_id = 0123456789', 'state IN RUNNING,QUEUED'],
+]
+
+
+class BenchmarkFilters(Tool):
+    """ times turning typical UI list view filters into SQL, with the filter and order by services' caches cold (new
+        services for each request, as before they were cached) and warm """
+
+    def __init__(self, iterations):
+        super(BenchmarkFilters, self).__init__(_logger)
+        self.iterations = iterations
+
+    def run(self):
+        engine_cache = self.app_context.get(EngineCache)
+        cases = [
+            ('action', ActionDao, engine_cache.all_action_schemas(), _ACTION_FILTERS, _ACTION_ORDER_BY),
+            ('datastore', DatastoreDao, engine_cache.all_datastore_schemas(), _DATASTORE_FILTERS, []),
+            ('workflow_instance', WorkflowInstanceDao, [workflow_instance_schema()], _WORKFLOW_INSTANCE_FILTERS, []),
+        ]
+        for name, dao, schemas, filter_combinations, order_by in cases:
+            cold_seconds = self._time(lambda: (FilterService(), OrderByService()), dao, schemas, filter_combinations,
+                                      order_by)
+            services = (FilterService(), OrderByService())
+            warm_seconds = self._time(lambda: services, dao, schemas, filter_combinations, order_by)
+            _logger.info('%s (%s schemas): %.3f ms per list request cold, %.3f ms warm' % (
+                name, len(schemas), cold_seconds * 1000, warm_seconds * 1000))
+
+    def _time(self, get_services, dao, schemas, filter_combinations, order_by):
+        """ :return: the mean seconds to parse, apply and compile one filter combination """
+        start = time.time()
+        for i in range(self.iterations):
+            for filter_strings in filter_combinations:
+                filter_service, order_by_service = get_services()
+                query = dao.query
+                for o in [order_by_service.from_string(s) for s in order_by]:
+                    query = order_by_service.apply_order_by(o, query, dao, schemas)
+                for f in [filter_service.from_string(s) for s in filter_strings]:
+                    query = filter_service.apply_filter(f, query, dao, schemas)
+                str(query.statement.compile(dialect=postgresql.dialect()))
+        return (time.time() - start) / (self.iterations * len(filter_combinations))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--iterations', action='store', dest='iterations', type=int, default=200)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    BenchmarkFilters(args.iterations).run()
@@ -0,0 +1,74 @@
+import argparse
+import logging
+import time
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.tool.tool_runner import Tool
+from dart.util.rand import random_id, time_ordered_id
+
+_logger = logging.getLogger(__name__)
+
+
+class BenchmarkIdInserts(Tool):
+    """ compares insert rates into a primary key index of random ids and of time ordered ids, using temporary
+        tables shaped like the entity tables """
+
+    def __init__(self, rows, batch_size):
+        super(BenchmarkIdInserts, self).__init__(_logger)
+        self.rows = rows
+        self.batch_size = batch_size
+
+    def run(self):
+        for name, id_generator in [('random', random_id), ('time_ordered', time_ordered_id)]:
+            rows_per_second, index_bytes = self._benchmark(name, id_generator)
+            _logger.info('%s ids: %.0f rows/second, primary key index of %s bytes' % (name, rows_per_second,
+                                                                                      index_bytes))
+
+    def _benchmark(self, name, id_generator):
+        table_name = 'benchmark_%s_id' % name
+        db.session.execute('DROP TABLE IF EXISTS %s' % table_name)
+        db.session.execute("""
+            CREATE TABLE {table_name} (
+                id VARCHAR(36) PRIMARY KEY,
+                created TIMESTAMP NOT NULL DEFAULT NOW(),
+                data JSONB NOT NULL
+            )
+            """.format(table_name=table_name))
+        db.session.commit()
+
+        sql = """
+            INSERT INTO {table_name} (id, data)
+            SELECT unnest(CAST(:ids AS VARCHAR[])), CAST('{{"state": "HAS_NEVER_RUN"}}' AS JSONB)
+            """.format(table_name=table_name)
+        try:
+            start = time.time()
+            inserted = 0
+            while inserted < self.rows:
+                count = min(self.batch_size, self.rows - inserted)
+                db.session.execute(text(sql).bindparams(ids=[id_generator() for i in range(count)]))
+                db.session.commit()
+                inserted += count
+            elapsed = time.time() - start
+
+            statement = text('SELECT pg_relation_size(:index_name)').bindparams(index_name=table_name + '_pkey')
+            index_bytes = db.session.execute(statement).scalar()
+            return inserted / elapsed, index_bytes
+
+        finally:
+            db.session.rollback()
+            db.session.execute('DROP TABLE IF EXISTS %s' % table_name)
+            db.session.commit()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--rows', action='store', dest='rows', type=int, default=1000000)
+    parser.add_argument('-b', '--batch-size', action='store', dest='batch_size', type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    BenchmarkIdInserts(args.rows, args.batch_size).run()
@@ -0,0 +1,93 @@
+import argparse
+import datetime
+import json
+import logging
+import time
+
+from dart.model.action import Action, ActionData, ActionState
+from dart.model.subscription import SubscriptionElement, SubscriptionElementState
+from dart.tool.tool_runner import Tool
+from dart.util import json_util
+from dart.util.json_util import DartJsonEncoder, configure_json_codec, json_codec_name, to_jsonable
+from dart.util.rand import random_id
+
+_logger = logging.getLogger(__name__)
+
+
+class BenchmarkJson(Tool):
+    """ compares the json codecs (see dart.util.json_util) on representative payloads: actions whose extra_data
+        holds many steps and pages of subscription elements, as written by the web responses and read by
+        dart_client, and the dao to model conversion of to_model """
+
+    def __init__(self, iterations, steps, page_size):
+        super(BenchmarkJson, self).__init__(_logger, configure_app_context=False)
+        self.iterations = iterations
+        self.steps = steps
+        self.page_size = page_size
+
+    def run(self):
+        payloads = [('action', self._action().to_dict()), ('subscription element page', self._element_page())]
+        for name in ['json', 'ujson']:
+            configure_json_codec(name)
+            if json_codec_name() != name:
+                continue
+            for payload_name, payload in payloads:
+                text = json_util.dumps(payload)
+                dumps_seconds = self._time(lambda: json_util.dumps(payload))
+                loads_seconds = self._time(lambda: json_util.loads(text))
+                _logger.info('%s codec, %s (%s bytes): dumps %.3f ms, loads %.3f ms' % (
+                    name, payload_name, len(text), dumps_seconds * 1000, loads_seconds * 1000))
+
+        # the shape of an ActionDao's __json__, with datetimes as they are read from the database
+        dao_json = self._action().to_dict()
+        for key in ['created', 'updated']:
+            dao_json[key] = datetime.datetime.utcnow()
+        round_trip_seconds = self._time(lambda: json.loads(json.dumps(dao_json, cls=DartJsonEncoder)))
+        to_jsonable_seconds = self._time(lambda: to_jsonable(dao_json))
+        _logger.info('to_model conversion of an action: json round trip %.3f ms, to_jsonable %.3f ms' % (
+            round_trip_seconds * 1000, to_jsonable_seconds * 1000))
+
+    def _time(self, f):
+        """ :return: the mean seconds per call of f """
+        start = time.time()
+        for i in range(self.iterations):
+            f()
+        return (time.time() - start) / self.iterations
+
+    def _action(self):
+        now = datetime.datetime.utcnow().isoformat()
+        steps = [{
+            'name': 'step_%s' % i,
+            'state': ActionState.COMPLETED,
+            'start_time': now,
+            'end_time': now,
+            'rows': i * 1000,
+            'progress': i / float(self.steps),
+            'output': {'s3_path': 's3://bucket/prefix/step_%s/part-00000.gz' % i, 'tags': ['a', 'b', 'c']},
+        } for i in range(self.steps)]
+        data = ActionData('benchmark', 'load_dataset', args={'dataset_id': random_id(), 's3_path_start_prefix': 'x'},
+                          state=ActionState.RUNNING, start_time=now, progress=0.5, engine_name='redshift_engine',
+                          datastore_id=random_id(), workflow_id=random_id(), extra_data={'steps': steps},
+                          tags=['benchmark'])
+        return Action(id=random_id(), version_id=12, created=now, updated=now, data=data)
+
+    def _element_page(self):
+        now = datetime.datetime.utcnow().isoformat()
+        subscription_id = random_id()
+        elements = [SubscriptionElement(random_id(), 1, now, now, subscription_id,
+                                        's3://bucket/prefix/2016/01/01/part-%05d.gz' % i, 1024 * 1024 + i,
+                                        SubscriptionElementState.UNCONSUMED).to_dict() for i in range(self.page_size)]
+        return {'results': elements, 'limit': self.page_size, 'offset': 0, 'total': self.page_size * 10}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--iterations', action='store', dest='iterations', type=int, default=200)
+    parser.add_argument('-s', '--steps', action='store', dest='steps', type=int, default=500)
+    parser.add_argument('-p', '--page-size', action='store', dest='page_size', type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    BenchmarkJson(args.iterations, args.steps, args.page_size).run()
@@ -0,0 +1,34 @@
+import logging
+import traceback
+
+from dart.context.database import db
+from dart.model.orm import EntityEdgeDao
+from dart.service.entity_edge import EntityEdgeService
+from dart.tool.tool_runner import Tool
+
+_logger = logging.getLogger(__name__)
+
+
+class BuildEntityEdges(Tool):
+    """ creates the entity_edge table (if needed) and rebuilds it from the entities, in one transaction.  It can be
+        rerun at any time to repair the table (if an entity is saved while it runs, the rebuild may fail on that
+        entity's edges, and can simply be rerun). """
+
+    def __init__(self):
+        super(BuildEntityEdges, self).__init__(_logger)
+
+    def run(self):
+        try:
+            EntityEdgeDao.__table__.create(db.engine, checkfirst=True)
+            counts = EntityEdgeService.rebuild()
+            for relationship, count in sorted(counts.items()):
+                _logger.info('done - %s %s edges' % (count, relationship))
+
+        except Exception as e:
+            db.session.rollback()
+            _logger.error(traceback.format_exc())
+            raise e
+
+
+if __name__ == '__main__':
+    BuildEntityEdges().run()
@@ -0,0 +1,64 @@
+import logging
+import traceback
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.model.action import ActionState
+from dart.model.orm import EntitySearchDao
+from dart.service.entity_search import SEARCHABLE_DAOS
+from dart.tool.tool_runner import Tool
+
+_logger = logging.getLogger(__name__)
+
+
+class BuildEntitySearch(Tool):
+    """ creates the entity_search table (if needed) and adds the searchable entities that are missing from it, e.g.
+        those saved before it existed, and removes the rows of entities that no longer exist.  It can be rerun at
+        any time to repair the table, and should be once dart.entity_search_enabled is deployed. """
+
+    def __init__(self):
+        super(BuildEntitySearch, self).__init__(_logger)
+
+    def run(self):
+        try:
+            db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            db.session.commit()
+            EntitySearchDao.__table__.create(db.engine, checkfirst=True)
+            for dao, entity_type in sorted(SEARCHABLE_DAOS.items(), key=lambda i: i[1]):
+                added, removed = self._build(dao.__tablename__, entity_type)
+                _logger.info('done - added %s and removed %s %s rows' % (added, removed, entity_type))
+
+        except Exception as e:
+            db.session.rollback()
+            _logger.error(traceback.format_exc())
+            raise e
+
+    @staticmethod
+    def _build(table_name, entity_type):
+        condition = "e.data->>'state' = :template_state" if entity_type == 'action' else 'TRUE'
+        insert_sql = """
+            INSERT INTO entity_search (id, version_id, created, updated, entity_type, name, search_text)
+            SELECT e.id, 0, NOW(), NOW(), :entity_type, e.data->>'name',
+                   lower(e.id || ' ' || COALESCE(e.data->>'name', ''))
+            FROM {table_name} e
+            WHERE {condition}
+              AND NOT EXISTS (SELECT NULL FROM entity_search s WHERE s.id = e.id)
+            """.format(table_name=table_name, condition=condition)
+        delete_sql = """
+            DELETE FROM entity_search s
+            WHERE s.entity_type = :entity_type
+              AND NOT EXISTS (SELECT NULL FROM {table_name} e WHERE e.id = s.id AND {condition})
+            """.format(table_name=table_name, condition=condition)
+
+        params = {'entity_type': entity_type}
+        if entity_type == 'action':
+            params['template_state'] = ActionState.TEMPLATE
+        added = db.session.execute(text(insert_sql).bindparams(**params)).rowcount
+        removed = db.session.execute(text(delete_sql).bindparams(**params)).rowcount
+        db.session.commit()
+        return added, removed
+
+
+if __name__ == '__main__':
+    BuildEntitySearch().run()
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import traceback
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.model.orm import ActionPayloadDao, ActionPayloadArchiveDao
+from dart.service.action import ACTION_PAYLOAD_FIELDS
+from dart.tool.tool_runner import Tool
+
+_logger = logging.getLogger(__name__)
+
+
+class MoveActionPayloads(Tool):
+    """ creates the action_payload tables (if needed) and moves the payload fields (see
+        dart.service.action.ACTION_PAYLOAD_FIELDS) of existing actions out of their data and into them, in batches.
+        A payload row that already exists was written after the action's data, so it is kept. """
+
+    def __init__(self, batch_size):
+        super(MoveActionPayloads, self).__init__(_logger)
+        self.batch_size = batch_size
+
+    def run(self):
+        try:
+            for dao in [ActionPayloadDao, ActionPayloadArchiveDao]:
+                dao.__table__.create(db.engine, checkfirst=True)
+            for table_name, payload_table_name in [('action', 'action_payload'),
+                                                   ('action_archive', 'action_payload_archive')]:
+                moved = self._move_payloads(table_name, payload_table_name)
+                _logger.info('done - moved the payloads of %s %s rows' % (moved, table_name))
+
+        except Exception as e:
+            db.session.rollback()
+            _logger.error(traceback.format_exc())
+            raise e
+
+    def _move_payloads(self, table_name, payload_table_name):
+        select_sql = """
+            SELECT id
+            FROM {table_name}
+            WHERE {condition}
+            LIMIT :batch_size
+            FOR UPDATE
+            """.format(table_name=table_name,
+                       condition=' OR '.join("data->>'%s' IS NOT NULL" % f for f in ACTION_PAYLOAD_FIELDS))
+        insert_sql = """
+            INSERT INTO {payload_table_name} (id, version_id, created, updated, extra_data, error_message)
+            SELECT a.id, 0, NOW(), NOW(), NULLIF(a.data->'extra_data', CAST('null' AS JSONB)), a.data->>'error_message'
+            FROM {table_name} a
+            WHERE a.id = ANY(:ids)
+              AND NOT EXISTS (SELECT NULL FROM {payload_table_name} p WHERE p.id = a.id)
+            """.format(table_name=table_name, payload_table_name=payload_table_name)
+        # postgres 9.4 has no jsonb_set or "-", so the data is reassembled key by key with the payload fields nulled
+        update_sql = """
+            UPDATE {table_name} a
+            SET version_id = a.version_id + 1, data = (
+                SELECT CAST(json_object_agg(e.key, e.value) AS JSONB)
+                FROM (
+                    SELECT key, value FROM jsonb_each(a.data) WHERE key <> ALL(:payload_fields)
+                    UNION ALL SELECT k, CAST('null' AS JSONB) FROM unnest(:payload_fields) k
+                ) e
+            )
+            WHERE a.id = ANY(:ids)
+            """.format(table_name=table_name)
+
+        total = 0
+        while True:
+            ids = [r.id for r in db.session.execute(text(select_sql).bindparams(batch_size=self.batch_size))]
+            if ids:
+                db.session.execute(text(insert_sql).bindparams(ids=ids))
+                db.session.execute(text(update_sql).bindparams(ids=ids, payload_fields=ACTION_PAYLOAD_FIELDS))
+            db.session.commit()
+            total += len(ids)
+            if len(ids) < self.batch_size:
+                break
+            _logger.info('moved the payloads of %s %s rows so far' % (total, table_name))
+        return total
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-b', '--batch-size', action='store', dest='batch_size', type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    MoveActionPayloads(args.batch_size).run()
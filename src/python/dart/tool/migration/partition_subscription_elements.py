@@ -0,0 +1,64 @@
+import argparse
+import logging
+import traceback
+
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.service.subscription_element_partition import SubscriptionElementPartitioner
+from dart.tool.tool_runner import Tool
+
+_logger = logging.getLogger(__name__)
+
+
+class PartitionSubscriptionElements(Tool):
+    """ adds the partition_key column (if needed), then creates the partitions configured by
+        dart.subscription_element_partitions and moves the existing elements into them.  It is safe to run while
+        dart is running, and again to pick up elements inserted by processes that had not been reconfigured yet. """
+
+    def __init__(self, batch_size):
+        super(PartitionSubscriptionElements, self).__init__(_logger)
+        self.batch_size = batch_size
+
+    def run(self):
+        partitioner = self.app_context.get(SubscriptionElementPartitioner)
+        assert isinstance(partitioner, SubscriptionElementPartitioner)
+
+        try:
+            if not partitioner.enabled:
+                _logger.info('done - dart.subscription_element_partitions is not configured')
+                return
+            # databases created before partitioning do not have the column (see SubscriptionElementColumns)
+            for table_name in ['subscription_element', 'subscription_element_archive']:
+                self._add_partition_key_column(table_name)
+            partitioner.ensure_partitions()
+            moved = partitioner.move_unpartitioned_rows(self.batch_size)
+            _logger.info('done - moved %s subscription elements into partitions' % moved)
+
+        except Exception as e:
+            db.session.rollback()
+            _logger.error(traceback.format_exc())
+            raise e
+
+    @staticmethod
+    def _add_partition_key_column(table_name):
+        sql = """
+            SELECT NULL
+            FROM information_schema.columns
+            WHERE table_name = :table_name AND column_name = 'partition_key'
+            """
+        if db.session.execute(text(sql).bindparams(table_name=table_name)).first():
+            return
+        db.session.execute('ALTER TABLE %s ADD COLUMN partition_key INTEGER' % table_name)
+        db.session.commit()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-b', '--batch-size', action='store', dest='batch_size', type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    PartitionSubscriptionElements(args.batch_size).run()
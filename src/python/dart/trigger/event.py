@@ -51,8 +51,7 @@ class EventTriggerProcessor(TriggerProcessor):
             return []
 
         executed_trigger_ids = []
-        arg = {'event_id': event_id}
-        for trigger in trigger_service.find_triggers(self._trigger_type.name, arg):
+        for trigger in trigger_service.find_active_triggers_with_arg(self._trigger_type.name, 'event_id', event_id):
             execute_trigger(trigger, self._trigger_type, self._workflow_service, _logger)
             executed_trigger_ids.append(trigger.id)
 
@@ -9,6 +9,7 @@ from dart.model.trigger import TriggerType, TriggerState
 from dart.message.call import TriggerCall
 from dart.trigger.base import TriggerProcessor, execute_trigger
 from dart.model.exception import DartValidationException
+from dart.util.cron import CronExpression
 
 _logger = logging.getLogger(__name__)
 
@@ -38,6 +39,9 @@ class ScheduledTriggerProcessor(TriggerProcessor):
         self._workflow_service = workflow_service
         self._trigger_type = scheduled_trigger
         self._dart_config = dart_config
+        # "cloudwatch" provisions a CloudWatch Events rule per trigger, while "local" leaves scheduling to the
+        # LocalCronScheduler running in the trigger worker
+        self._scheduler = dart_config['triggers']['scheduled'].get('scheduler', 'cloudwatch')
 
     def trigger_type(self):
         return self._trigger_type
@@ -47,6 +51,9 @@ class ScheduledTriggerProcessor(TriggerProcessor):
             :type trigger_service: dart.service.trigger.TriggerService """
 
         self._validate_aws_cron_expression(trigger.data.args['cron_pattern'])
+        if self._scheduler == 'local':
+            return
+
         # http://boto3.readthedocs.org/en/latest/reference/services/events.html#CloudWatchEvents.Client.put_rule
         client = boto3.client('events')
 
@@ -79,6 +86,10 @@ class ScheduledTriggerProcessor(TriggerProcessor):
     def update_trigger(self, unmodified_trigger, modified_trigger):
         """ :type unmodified_trigger: dart.model.trigger.Trigger
             :type modified_trigger: dart.model.trigger.Trigger """
+        if self._scheduler == 'local':
+            self._validate_aws_cron_expression(modified_trigger.data.args['cron_pattern'])
+            return modified_trigger
+
         client = boto3.client('events')
         patch_list = jsonpatch.make_patch(unmodified_trigger.to_dict(), modified_trigger.to_dict())
         for patch in patch_list:
@@ -114,6 +125,9 @@ class ScheduledTriggerProcessor(TriggerProcessor):
     def teardown_trigger(self, trigger, trigger_service):
         """ :type trigger: dart.model.trigger.Trigger
             :type trigger_service: dart.service.trigger.TriggerService """
+        if self._scheduler == 'local':
+            return
+
         rule_name = self._get_cloudwatch_events_rule_name(trigger)
         client = boto3.client('events')
         self._check_response(client.remove_targets(Rule=rule_name, Ids=[trigger.id]))
@@ -136,7 +150,11 @@ class ScheduledTriggerProcessor(TriggerProcessor):
     def _validate_aws_cron_expression(cron_expression):
         # See the Note on: http://docs.aws.amazon.com/AmazonCloudWatch/latest/DeveloperGuide/ScheduledEvents.html
         cron_pattern_split = cron_expression.split()
-        if '?' not in [cron_pattern_split[2], cron_pattern_split[4]]:
+        if len(cron_pattern_split) == 6 and '?' not in [cron_pattern_split[2], cron_pattern_split[4]]:
             raise DartValidationException('CRON Validation Error: Support for specifying both a day-of-week and a '
                                           'day-of-month value is not complete (you must currently use the "?"'
                                           'character in one of these fields).')
+        try:
+            CronExpression(cron_expression)
+        except ValueError as e:
+            raise DartValidationException('CRON Validation Error: %s' % e.message)
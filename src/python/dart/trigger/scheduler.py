@@ -0,0 +1,169 @@
+import heapq
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import dateutil.parser
+from sqlalchemy import text
+
+from dart.context.database import db
+from dart.context.locator import injectable
+from dart.model.cache_version import CacheVersions
+from dart.service.cache_version import get_cache_version
+from dart.trigger.scheduled import scheduled_trigger
+from dart.util.cron import CronExpression
+
+_logger = logging.getLogger(__name__)
+
+
+@injectable
+class LocalCronScheduler(object):
+    """ an alternative to CloudWatch Events for scheduled triggers (triggers.scheduled.scheduler: local).  Every
+        trigger worker runs one, but only the holder of a postgres advisory lock fires triggers.  The leader keeps a
+        heap of the next fire time of each ACTIVE scheduled trigger and sends PROCESS_TRIGGER messages directly to
+        the trigger queue when they come due.  The last fire time of each trigger is recorded in its extra_data, so
+        a newly elected leader fires (once) any trigger whose fire time was missed within the misfire grace period. """
+
+    def __init__(self, trigger_service, trigger_proxy, dart_config):
+        self._trigger_service = trigger_service
+        self._trigger_proxy = trigger_proxy
+        scheduled_config = dart_config['triggers']['scheduled']
+        local_config = scheduled_config.get('local', {})
+        self._enabled = scheduled_config.get('scheduler', 'cloudwatch') == 'local'
+        self._poll_seconds = local_config.get('poll_seconds', 1)
+        self._max_age_seconds = local_config.get('max_age_seconds', 300)
+        self._misfire_grace_seconds = local_config.get('misfire_grace_seconds', 3600)
+        self._leader_lock_id = local_config.get('leader_lock_id', 7231001)
+        self._leader_connection = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self._heap = None
+        self._schedules = {}
+        self._version = None
+        self._loaded_at = 0
+        self._catch_up = False
+
+    def start(self):
+        if not self._enabled or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='local-cron-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+        _logger.info('started the local cron scheduler')
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if self._acquire_leadership():
+                    self.tick(datetime.utcnow())
+            except Exception:
+                _logger.error(json.dumps(traceback.format_exc()))
+                self._release_leadership()
+            finally:
+                db.session.rollback()
+            self._stopped.wait(self._poll_seconds)
+        self._release_leadership()
+        db.session.remove()
+
+    def tick(self, now):
+        """ fires every trigger that is due as of the given time
+
+            :type now: datetime.datetime """
+        self._refresh_if_needed(now)
+        while self._heap and self._heap[0][0] <= now:
+            fire_time, trigger_id = heapq.heappop(self._heap)
+            cron_pattern, cron_expression, _ = self._schedules[trigger_id]
+            self._fire(trigger_id, fire_time)
+            # several fire times that were missed (e.g. after a long pause) are coalesced into a single fire
+            next_fire_time = cron_expression.next_fire_time(max(fire_time, now))
+            self._schedules[trigger_id] = (cron_pattern, cron_expression, next_fire_time)
+            if next_fire_time:
+                heapq.heappush(self._heap, (next_fire_time, trigger_id))
+
+    def _fire(self, trigger_id, fire_time):
+        _logger.info('firing scheduled trigger (id=%s) for %s' % (trigger_id, fire_time.isoformat()))
+        # the message is sent before the fire time is recorded, so a crash in between results in a duplicate fire
+        # rather than a lost one
+        self._trigger_proxy.process_trigger(scheduled_trigger, {'trigger_id': trigger_id})
+        self._trigger_service.record_scheduled_fire_time(trigger_id, fire_time)
+
+    def _refresh_if_needed(self, now):
+        version = get_cache_version(CacheVersions.TRIGGERS)
+        if self._heap is not None and version is not None and version == self._version:
+            if time.time() - self._loaded_at < self._max_age_seconds:
+                return
+        self._load(now, version)
+
+    def _load(self, now, version):
+        schedules = {}
+        for trigger in self._trigger_service.find_triggers(trigger_type_name=scheduled_trigger.name):
+            cron_pattern = trigger.data.args['cron_pattern']
+            existing = self._schedules.get(trigger.id)
+            if existing and existing[0] == cron_pattern:
+                schedules[trigger.id] = existing
+                continue
+            try:
+                cron_expression = CronExpression(cron_pattern)
+            except ValueError as e:
+                _logger.error('scheduled trigger (id=%s) has an invalid cron_pattern: %s' % (trigger.id, e.message))
+                continue
+            next_fire_time = self._first_fire_time(trigger, cron_expression, now, self._catch_up)
+            schedules[trigger.id] = (cron_pattern, cron_expression, next_fire_time)
+
+        self._schedules = schedules
+        self._heap = [(s[2], trigger_id) for trigger_id, s in schedules.iteritems() if s[2]]
+        heapq.heapify(self._heap)
+        self._version = version
+        self._loaded_at = time.time()
+        self._catch_up = False
+        _logger.info('loaded %s active scheduled triggers into the local cron scheduler' % len(schedules))
+
+    def _first_fire_time(self, trigger, cron_expression, now, catch_up):
+        last_fire_time = (trigger.data.extra_data or {}).get('last_scheduled_fire_time')
+        if catch_up and last_fire_time:
+            missed_fire_time = cron_expression.next_fire_time(dateutil.parser.parse(last_fire_time))
+            if missed_fire_time and missed_fire_time <= now:
+                if (now - missed_fire_time).total_seconds() <= self._misfire_grace_seconds:
+                    return missed_fire_time
+                _logger.warn('skipping missed fire times of scheduled trigger (id=%s) since %s'
+                             % (trigger.id, missed_fire_time.isoformat()))
+        return cron_expression.next_fire_time(now)
+
+    def _acquire_leadership(self):
+        if self._leader_connection:
+            # raises if the connection, and with it the lock, has been lost
+            self._leader_connection.execute(text('SELECT 1'))
+            return True
+
+        connection = db.session.get_bind().connect()
+        statement = text('SELECT pg_try_advisory_lock(:lock_id)').bindparams(lock_id=self._leader_lock_id)
+        if not connection.execute(statement).scalar():
+            connection.close()
+            return False
+
+        _logger.info('this process is now the local cron scheduler leader')
+        self._leader_connection = connection
+        # a new leader starts from the persisted fire times rather than any schedule it computed as a follower
+        self._heap = None
+        self._schedules = {}
+        self._catch_up = True
+        return True
+
+    def _release_leadership(self):
+        connection = self._leader_connection
+        if not connection:
+            return
+        self._leader_connection = None
+        try:
+            statement = text('SELECT pg_advisory_unlock(:lock_id)').bindparams(lock_id=self._leader_lock_id)
+            connection.execute(statement)
+            connection.close()
+        except Exception:
+            # dropping the underlying connection releases the lock
+            connection.invalidate()
@@ -1,5 +1,6 @@
 import logging
 import math
+import time
 
 from dart.context.locator import injectable
 from dart.model.trigger import TriggerType, TriggerState
@@ -29,12 +30,18 @@ subscription_batch_trigger = TriggerType(
 
 @injectable
 class SubscriptionBatchTriggerProcessor(TriggerProcessor):
-    def __init__(self, trigger_proxy, subscription_service, subscription_element_service, workflow_service):
+    def __init__(self, trigger_proxy, subscription_service, subscription_element_service, workflow_service,
+                 dart_config):
         self._trigger_proxy = trigger_proxy
         self._subscription_service = subscription_service
         self._subscription_element_service = subscription_element_service
         self._workflow_service = workflow_service
         self._trigger_type = subscription_batch_trigger
+        trigger_config = dart_config.get('triggers', {}).get('subscription_batch', {})
+        # SQS does not allow message delays beyond 15 minutes
+        self._evaluation_window_seconds = min(trigger_config.get('evaluation_window_seconds', 30), 900)
+        self._evaluation_times = {}
+        self._next_eviction_time = 0
 
     def trigger_type(self):
         return self._trigger_type
@@ -59,30 +66,14 @@ class SubscriptionBatchTriggerProcessor(TriggerProcessor):
 
         unconsumed_data_size_in_bytes = long(trigger.data.args['unconsumed_data_size_in_bytes'])
         sid = trigger.data.args['subscription_id']
-        file_size_sum, file_size_avg =\
-            self._subscription_element_service.get_subscription_element_file_size_sum_and_avg(sid)
-
-        if file_size_sum < unconsumed_data_size_in_bytes:
+        reserved_count, reserved_bytes = self._subscription_element_service.reserve_subscription_elements(
+            sid, unconsumed_data_size_in_bytes
+        )
+        if reserved_count == 0:
             return []
 
-        # average = sum / count,  count = sum / avg,  adding 10% will help reduce more trips to the db
-        predict_limit = lambda fs_sum: int(math.ceil(float(fs_sum / file_size_avg) * 1.1))
-        element_ids = []
-        s3_path = None
-        current_unconsumed_bytes = 0
-        while current_unconsumed_bytes < unconsumed_data_size_in_bytes:
-            limit = predict_limit(unconsumed_data_size_in_bytes - current_unconsumed_bytes)
-            elements = self._subscription_element_service.find_subscription_elements(
-                sid, gt_s3_path=s3_path, limit=limit
-            )
-            for element in elements:
-                element_ids.append(element.id)
-                current_unconsumed_bytes += element.file_size
-                s3_path = element.s3_path
-                if current_unconsumed_bytes >= unconsumed_data_size_in_bytes:
-                    break
-
-        self._subscription_element_service.reserve_subscription_elements(element_ids)
+        values = (reserved_count, reserved_bytes, sid, trigger_id)
+        _logger.info('reserved %s elements (%s bytes) of subscription (id=%s) for trigger (id=%s)' % values)
 
         execute_trigger(trigger, self._trigger_type, self._workflow_service, _logger)
 
@@ -91,5 +82,43 @@ class SubscriptionBatchTriggerProcessor(TriggerProcessor):
     def teardown_trigger(self, trigger, trigger_service):
         pass
 
-    def send_evaluation_message(self, trigger_id):
-        self._trigger_proxy.trigger_subscription_evaluation(trigger_id)
+    def send_evaluation_message(self, trigger_id, delay_seconds=None):
+        self._trigger_proxy.trigger_subscription_evaluation(trigger_id, delay_seconds)
+
+    def request_evaluation(self, trigger_id):
+        """ like send_evaluation_message, but evaluations of the same trigger are debounced so that at most one is
+            delivered per evaluation window.  The first request after a quiet period is sent right away, and
+            requests arriving while the window is still open are folded into one message delayed until the
+            window closes (so new elements are always followed by an evaluation that can see them). """
+        if self._evaluation_window_seconds <= 0:
+            self.send_evaluation_message(trigger_id)
+            return
+
+        now = time.time()
+        self._evict_evaluation_times(now)
+        # the time at which the most recently sent evaluation message was (or will be) delivered
+        evaluation_time = self._evaluation_times.get(trigger_id)
+
+        if evaluation_time is None or evaluation_time + self._evaluation_window_seconds <= now:
+            self._evaluation_times[trigger_id] = now
+            self.send_evaluation_message(trigger_id)
+            return
+
+        if evaluation_time > now:
+            # a delayed evaluation is already on its way
+            return
+
+        delay_seconds = int(math.ceil(evaluation_time + self._evaluation_window_seconds - now))
+        self._evaluation_times[trigger_id] = now + delay_seconds
+        self.send_evaluation_message(trigger_id, delay_seconds)
+
+    def _evict_evaluation_times(self, now):
+        """ forgets the triggers whose evaluation window has closed, which is the same as never having evaluated
+            them, so that triggers that are deleted or go quiet do not stay in memory.  This scans every trigger,
+            so it runs at most once per window. """
+        if now < self._next_eviction_time:
+            return
+        self._next_eviction_time = now + self._evaluation_window_seconds
+        for trigger_id, evaluation_time in self._evaluation_times.items():
+            if evaluation_time + self._evaluation_window_seconds <= now:
+                del self._evaluation_times[trigger_id]
@@ -1,5 +1,3 @@
-import copy
-from datetime import datetime
 import logging
 
 from dart.context.locator import injectable
@@ -55,8 +53,10 @@ class SuperTriggerProcessor(TriggerProcessor):
 
         executed_trigger_ids = []
         completed_trigger_id = message['trigger_id']
-        arg = {'completed_trigger_ids': [completed_trigger_id]}
-        for s_trigger in trigger_service.find_triggers(self._trigger_type.name, arg):
+        s_triggers = trigger_service.find_active_triggers_with_arg(
+            self._trigger_type.name, 'completed_trigger_ids', completed_trigger_id
+        )
+        for s_trigger in s_triggers:
             assert isinstance(s_trigger, Trigger)
 
             operator = s_trigger.data.args['fire_after']
@@ -66,26 +66,8 @@ class SuperTriggerProcessor(TriggerProcessor):
 
             assert operator == 'ALL', 'unexpected super trigger operator: %s' % operator
 
-            extra_data = copy.deepcopy(s_trigger.data.extra_data or {})
-            if 'completed_trigger_id_times' not in extra_data:
-                extra_data['completed_trigger_id_times'] = {}
-            extra_data['completed_trigger_id_times'][completed_trigger_id] = datetime.utcnow().isoformat()
-
-            completed_trigger_ids = set(extra_data['completed_trigger_id_times'].keys())
-            all_completed = True
-            for ctid in s_trigger.data.args['completed_trigger_ids']:
-                if ctid not in completed_trigger_ids:
-                    all_completed = False
-                    break
-
-            if not all_completed:
-                trigger_service.update_trigger_extra_data(s_trigger, extra_data)
-                continue
-
-            extra_data['completed_trigger_id_times'] = {}
-            trigger_service.update_trigger_extra_data(s_trigger, extra_data)
-
-            self._fire_trigger(executed_trigger_ids, s_trigger)
+            if trigger_service.record_super_trigger_completion(s_trigger.id, completed_trigger_id):
+                self._fire_trigger(executed_trigger_ids, s_trigger)
 
         return executed_trigger_ids
 
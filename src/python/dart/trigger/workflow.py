@@ -45,8 +45,9 @@ class WorkflowCompletionTriggerProcessor(TriggerProcessor):
             :type trigger_service: dart.service.trigger.TriggerService """
 
         executed_trigger_ids = []
-        arg = {'completed_workflow_id': message['workflow_id']}
-        for trigger in trigger_service.find_triggers(self._trigger_type.name, arg):
+        workflow_id = message['workflow_id']
+        for trigger in trigger_service.find_active_triggers_with_arg(self._trigger_type.name, 'completed_workflow_id',
+                                                                     workflow_id):
             execute_trigger(trigger, self._trigger_type, self._workflow_service, _logger)
             executed_trigger_ids.append(trigger.id)
 
@@ -0,0 +1,172 @@
+import calendar
+from datetime import date, datetime, timedelta
+
+
+# Parsing and evaluation of AWS (CloudWatch Events) cron expressions, which have six space separated fields:
+#
+#     minutes  hours  day-of-month  month  day-of-week  year
+#
+# Beyond the usual "*", "," "-" and "/" syntax, day-of-month supports "?", "L", "LW" and "<n>W", and day-of-week
+# supports "?", "L", "<n>L" and "<n>#<k>".  Days of the week are numbered 1 (SUN) through 7 (SAT).  Exactly one of
+# day-of-month and day-of-week must be "?".  All times are UTC.
+#
+#     http://docs.aws.amazon.com/AmazonCloudWatch/latest/events/ScheduledEvents.html
+
+_MONTH_NAMES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+_DAY_NAMES = ['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+_MAX_YEAR = 2199
+
+
+class CronExpression(object):
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 6:
+            raise ValueError('expected 6 fields in cron expression "%s", found %s' % (expression, len(fields)))
+        minutes, hours, days_of_month, months, days_of_week, years = fields
+        if '?' not in [days_of_month, days_of_week]:
+            raise ValueError('one of day-of-month or day-of-week must be "?" in cron expression "%s"' % expression)
+        if days_of_month == '?' and days_of_week == '?':
+            raise ValueError('day-of-month and day-of-week cannot both be "?" in cron expression "%s"' % expression)
+
+        self.expression = expression
+        self._minutes = sorted(_parse_values(minutes, 0, 59))
+        self._hours = sorted(_parse_values(hours, 0, 23))
+        self._months = _parse_values(months, 1, 12, _MONTH_NAMES)
+        self._years = _parse_values(years, 1970, _MAX_YEAR)
+        self._day_matchers = _parse_days_of_month(days_of_month) if days_of_week == '?'\
+            else _parse_days_of_week(days_of_week)
+
+    def next_fire_time(self, after):
+        """ :type after: datetime.datetime
+            :rtype: datetime.datetime
+            :return: the first fire time strictly after the given time, or None if the expression never fires again """
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        while day.year <= _MAX_YEAR:
+            if day.year not in self._years:
+                day = date(day.year + 1, 1, 1)
+                continue
+            if day.month not in self._months:
+                day = _first_of_next_month(day)
+                continue
+            if self._day_matches(day):
+                time_of_day = self._first_time_of_day(start if day == start.date() else None)
+                if time_of_day:
+                    return datetime(day.year, day.month, day.day, time_of_day[0], time_of_day[1])
+            day += timedelta(days=1)
+        return None
+
+    def fire_times_between(self, after, until):
+        """ :return: the fire times in (after, until]
+            :rtype: list[datetime.datetime] """
+        results = []
+        fire_time = self.next_fire_time(after)
+        while fire_time and fire_time <= until:
+            results.append(fire_time)
+            fire_time = self.next_fire_time(fire_time)
+        return results
+
+    def _day_matches(self, day):
+        return any(m(day) for m in self._day_matchers)
+
+    def _first_time_of_day(self, not_before):
+        for hour in self._hours:
+            if not_before and hour < not_before.hour:
+                continue
+            for minute in self._minutes:
+                if not_before and hour == not_before.hour and minute < not_before.minute:
+                    continue
+                return hour, minute
+        return None
+
+
+def _parse_values(field, min_value, max_value, names=None):
+    values = set()
+    for part in field.split(','):
+        step = None
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = _parse_int(step_str, 1, max_value - min_value + 1)
+        if part == '*':
+            start, end = min_value, max_value
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start = _parse_value(start_str, min_value, max_value, names)
+            end = _parse_value(end_str, min_value, max_value, names)
+        else:
+            start = _parse_value(part, min_value, max_value, names)
+            # "5/10" means starting at 5, every 10
+            end = max_value if step else start
+        if start > end:
+            raise ValueError('invalid range in cron field "%s"' % field)
+        values.update(range(start, end + 1, step or 1))
+    return values
+
+
+def _parse_value(value, min_value, max_value, names=None):
+    if names and value.upper() in names:
+        return names.index(value.upper()) + min_value
+    return _parse_int(value, min_value, max_value)
+
+
+def _parse_int(value, min_value, max_value):
+    try:
+        result = int(value)
+    except ValueError:
+        raise ValueError('invalid cron value: "%s"' % value)
+    if not min_value <= result <= max_value:
+        raise ValueError('cron value %s is not within %s-%s' % (result, min_value, max_value))
+    return result
+
+
+def _parse_days_of_month(field):
+    field = field.upper()
+    if field == 'L':
+        return [lambda d: d.day == _last_day_of_month(d)]
+    if field == 'LW':
+        return [lambda d: d == _nearest_weekday(d.year, d.month, _last_day_of_month(d))]
+    if field.endswith('W'):
+        n = _parse_int(field[:-1], 1, 31)
+        return [lambda d: d == _nearest_weekday(d.year, d.month, min(n, _last_day_of_month(d)))]
+    values = _parse_values(field, 1, 31)
+    return [lambda d: d.day in values]
+
+
+def _parse_days_of_week(field):
+    field = field.upper()
+    if field == 'L':
+        field = 'SAT'
+    if field.endswith('L'):
+        aws_weekday = _parse_value(field[:-1], 1, 7, _DAY_NAMES)
+        return [lambda d: _aws_weekday(d) == aws_weekday and (d + timedelta(days=7)).month != d.month]
+    if '#' in field:
+        weekday_str, nth_str = field.split('#', 1)
+        aws_weekday = _parse_value(weekday_str, 1, 7, _DAY_NAMES)
+        nth = _parse_int(nth_str, 1, 5)
+        return [lambda d: _aws_weekday(d) == aws_weekday and (d.day - 1) // 7 + 1 == nth]
+    values = _parse_values(field, 1, 7, _DAY_NAMES)
+    return [lambda d: _aws_weekday(d) in values]
+
+
+def _aws_weekday(d):
+    # python: MON=0 ... SUN=6,  aws: SUN=1 ... SAT=7
+    return (d.weekday() + 1) % 7 + 1
+
+
+def _last_day_of_month(d):
+    return calendar.monthrange(d.year, d.month)[1]
+
+
+def _nearest_weekday(year, month, day):
+    d = date(year, month, day)
+    if d.weekday() == 5:
+        # saturday -> friday, unless that crosses into the previous month
+        return d - timedelta(days=1) if day > 1 else d + timedelta(days=2)
+    if d.weekday() == 6:
+        # sunday -> monday, unless that crosses into the next month
+        return d + timedelta(days=1) if day < _last_day_of_month(d) else d - timedelta(days=2)
+    return d
+
+
+def _first_of_next_month(d):
+    return date(d.year + 1, 1, 1) if d.month == 12 else date(d.year, d.month + 1, 1)
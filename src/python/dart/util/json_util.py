@@ -1,7 +1,16 @@
 import datetime
+import json
+import logging
 
 from flask.ext.jsontools import DynamicJSONEncoder
 
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_logger = logging.getLogger(__name__)
+
 
 class DartJsonEncoder(DynamicJSONEncoder):
     def default(self, o):
@@ -15,3 +24,93 @@ class DartJsonEncoder(DynamicJSONEncoder):
 
         # Fallback
         return super(DartJsonEncoder, self).default(o)
+
+
+_SCALAR_TYPES = (basestring, bool, int, long, float)
+
+
+def to_jsonable(o):
+    """ a copy of o made only of JSON types, converted as DartJsonEncoder would (datetimes and dates become isoformat
+        strings, sets and tuples become lists and objects with a __json__ method, e.g. daos, are expanded).  This is
+        json.loads(json.dumps(o, cls=DartJsonEncoder)) without writing and parsing the text in between. """
+    if o is None or isinstance(o, _SCALAR_TYPES):
+        return o
+    if isinstance(o, dict):
+        return {k if isinstance(k, basestring) else json.dumps(k): to_jsonable(v) for k, v in o.iteritems()}
+    if isinstance(o, (list, tuple, set)):
+        return [to_jsonable(v) for v in o]
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    if hasattr(o, '__json__'):
+        return to_jsonable(o.__json__())
+    raise TypeError(repr(o) + ' is not JSON serializable')
+
+
+class _StdlibJsonCodec(object):
+    name = 'json'
+
+    @staticmethod
+    def dumps(o, sort_keys=False):
+        return json.dumps(o, cls=DartJsonEncoder, sort_keys=sort_keys, separators=(',', ':'))
+
+    @staticmethod
+    def loads(s):
+        return json.loads(s)
+
+
+class _UjsonCodec(object):
+    """ ujson has no hook for other types (it writes datetimes as epoch seconds), so values are converted with
+        to_jsonable first.  Floats are written with at most 15 significant decimals. """
+    name = 'ujson'
+
+    @staticmethod
+    def dumps(o, sort_keys=False):
+        return ujson.dumps(to_jsonable(o), sort_keys=sort_keys, escape_forward_slashes=False, double_precision=15)
+
+    @staticmethod
+    def loads(s):
+        return ujson.loads(s, precise_float=True)
+
+
+_json_codecs = {
+    'json': _StdlibJsonCodec,
+    'ujson': _UjsonCodec,
+}
+_json_codec = _StdlibJsonCodec
+
+
+def configure_json_codec(name):
+    """ :param name: the dart.json_codec config value, "json" (the standard library) or "ujson" (which falls back to
+                     "json" when ujson is not installed) """
+    global _json_codec
+    if name not in _json_codecs:
+        raise ValueError('unknown json_codec: %s' % name)
+    if name == 'ujson' and not ujson:
+        _logger.warn('ujson is not installed, so the json codec is used instead')
+        name = 'json'
+    _json_codec = _json_codecs[name]
+
+
+def json_codec_name():
+    return _json_codec.name
+
+
+def dumps(o, sort_keys=False):
+    """ :return: o as compact JSON text, from the configured codec
+        :rtype: str """
+    return _json_codec.dumps(o, sort_keys)
+
+
+def loads(s):
+    """ :return: the value of the JSON text s, from the configured codec """
+    return _json_codec.loads(s)
+
+
+class DartCodecJsonEncoder(DartJsonEncoder):
+    """ for app.json_encoder, so that flask (and @jsonapi) responses are written by the configured codec.  Pretty
+        printed responses are still written by the standard library. """
+
+    def encode(self, o):
+        if self.indent is not None or _json_codec is _StdlibJsonCodec:
+            return super(DartCodecJsonEncoder, self).encode(o)
+        return _json_codec.dumps(o, self.sort_keys)
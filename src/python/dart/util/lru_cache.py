@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+
+class LruCache(object):
+    """ a bounded cache that evicts the least recently used entry once it holds max_size entries.  It is not thread
+        safe, so callers either lock around it or keep one per thread. """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ :return: the cached value, or None """
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self._entries[key] = value
+        return value
+
+    def put(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def get_by_identity(self, objects, key=None):
+        """ :return: the value cached by put_by_identity for these objects (the same instances) and key, or None """
+        entry = self.get((key, tuple(id(o) for o in objects)))
+        return entry[1] if entry is not None else None
+
+    def put_by_identity(self, objects, value, key=None):
+        """ caches a value computed from objects that are built once and reused, e.g. the schemas of EngineCache.
+            Looking them up by identity avoids hashing or serializing them, but changes to them go unnoticed, so
+            they must not be modified once used. """
+        # the entry holds on to the objects, so that their ids cannot be reused by other objects while it is cached
+        self.put((key, tuple(id(o) for o in objects)), (list(objects), value))
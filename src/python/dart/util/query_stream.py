@@ -0,0 +1,7 @@
+STREAM_BATCH_SIZE = 500
+
+
+def query_results(query, stream=False):
+    """ :return: the results of the query as a list, or (when stream is true) as an iterator that fetches them in
+                 batches from a server side cursor, so that memory use stays flat however many rows there are """
+    return query.yield_per(STREAM_BATCH_SIZE) if stream else query.all()
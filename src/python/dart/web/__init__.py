@@ -11,6 +11,7 @@ from dart.model.exception import DartValidationException
 from dart.web.api.graph import api_graph_bp
 from dart.web.ui.admin.admin import admin_bp
 from dart.web.api.action import api_action_bp
+from dart.web.api.batch import api_batch_bp
 from dart.web.api.dataset import api_dataset_bp
 from dart.web.api.datastore import api_datastore_bp
 from dart.web.api.engine import api_engine_bp
@@ -19,7 +20,9 @@ from dart.web.api.schema import api_schema_bp
 from dart.web.api.trigger import api_trigger_bp
 from dart.web.api.workflow import api_workflow_bp
 from dart.web.api.subscription import api_subscription_bp
+from dart.web.api.state_change import api_state_change_bp
 from dart.web.ui.index import index_bp
+from dart.util.json_util import DartCodecJsonEncoder
 from flasgger import Swagger
 
 _logger = logging.getLogger(__name__)
@@ -33,6 +36,7 @@ _logger.info('loaded config from path: %s' % config_path)
 
 
 app = Flask(__name__, template_folder='ui/templates', static_folder='ui/static')
+app.json_encoder = DartCodecJsonEncoder
 Swagger(app) # enables swagger-ui on /apidocs/index.html
 
 app.dart_context = AppContext(
@@ -58,6 +62,8 @@ app.register_blueprint(api_subscription_bp, url_prefix=api_version_prefix)
 app.register_blueprint(api_event_bp, url_prefix=api_version_prefix)
 app.register_blueprint(api_schema_bp, url_prefix=api_version_prefix)
 app.register_blueprint(api_graph_bp, url_prefix=api_version_prefix)
+app.register_blueprint(api_state_change_bp, url_prefix=api_version_prefix)
+app.register_blueprint(api_batch_bp, url_prefix=api_version_prefix)
 app.register_blueprint(index_bp)
 
 
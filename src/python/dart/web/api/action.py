@@ -11,7 +11,8 @@ from dart.service.action import ActionService
 from dart.service.datastore import DatastoreService
 from dart.service.filter import FilterService
 from dart.service.order_by import OrderByService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track, include_archived_requested
+from dart.web.api.streaming import StreamingList, streaming_jsonapi
 
 api_action_bp = Blueprint('api_action', __name__)
 
@@ -56,6 +57,7 @@ def post_workflow_actions(workflow):
         action.data.state = ActionState.TEMPLATE
         actions.append(action)
 
+    action_service().validate_workflow_action_dependencies(workflow.id, actions)
     datastore = datastore_service().get_datastore(workflow.data.datastore_id)
     engine_name = datastore.data.engine_name
     saved_actions = [a.to_dict() for a in action_service().save_actions(actions, engine_name)]
@@ -63,7 +65,7 @@ def post_workflow_actions(workflow):
 
 
 @api_action_bp.route('/action', methods=['GET'])
-@jsonapi
+@streaming_jsonapi
 def get_datastore_actions():
     limit = int(request.args.get('limit', 20))
     offset = int(request.args.get('offset', 0))
@@ -76,16 +78,14 @@ def get_datastore_actions():
     if workflow_id:
         filters.append(Filter('workflow_id', Operator.EQ, workflow_id))
 
-    actions = action_service().query_actions(filters, limit, offset, order_by)
-    return {
-        'results': [a.to_dict() for a in actions],
-        'limit': limit,
-        'offset': offset,
-        'total': action_service().query_actions_count(filters)
-    }
+    include_archived = include_archived_requested()
+    total = action_service().query_actions_count(filters, include_archived)
+    actions = action_service().query_actions(filters, limit, offset, order_by, include_archived, stream=True)
+    return StreamingList((a.to_dict() for a in actions), limit=limit, offset=offset, total=total)
 
 
 @api_action_bp.route('/action/<action>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_action(action):
@@ -111,7 +111,7 @@ def patch_action(action):
     return update_action(action, Action.from_dict(p.apply(action.to_dict())))
 
 
-def update_action(action, updated_action):
+def update_action(action, updated_action, commit=True):
     # only allow updating fields that are editable
     sanitized_action = action.copy()
     sanitized_action.data.name = updated_action.data.name
@@ -123,11 +123,14 @@ def update_action(action, updated_action):
     sanitized_action.data.on_failure_email = updated_action.data.on_failure_email
     sanitized_action.data.on_success_email = updated_action.data.on_success_email
     sanitized_action.data.extra_data = updated_action.data.extra_data
+    if action.data.state == ActionState.TEMPLATE:
+        sanitized_action.data.depends_on = updated_action.data.depends_on
+        action_service().validate_workflow_action_dependencies(action.data.workflow_id, [sanitized_action])
 
     # revalidate
     sanitized_action = action_service().default_and_validate_action(sanitized_action)
 
-    return {'results': action_service().patch_action(action, sanitized_action).to_dict()}
+    return {'results': action_service().patch_action(action, sanitized_action, commit=commit).to_dict()}
 
 
 @api_action_bp.route('/action/<action>', methods=['DELETE'])
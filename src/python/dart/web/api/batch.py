@@ -0,0 +1,111 @@
+from flask import Blueprint, request, current_app
+from flask.ext.jsontools import jsonapi
+from jsonpatch import JsonPatch
+from sqlalchemy.orm.exc import StaleDataError
+
+from dart.context.database import db
+from dart.model.action import Action
+from dart.model.event import Event
+from dart.model.subscription import Subscription
+from dart.model.trigger import Trigger
+from dart.model.workflow import Workflow
+from dart.web.api.action import update_action
+from dart.web.api.entity_lookup import EntityLookupService, ENTITY_TYPES, accounting_track, include_archived_requested
+from dart.web.api.event import update_event
+from dart.web.api.subscription import update_subscription
+from dart.web.api.trigger import update_trigger
+from dart.web.api.workflow import update_workflow
+
+api_batch_bp = Blueprint('api_batch', __name__)
+
+MAX_BATCH_SIZE = 1000
+
+# the entity types that can be patched in batches, with their model classes and the update functions that their
+# single entity PATCH endpoints use
+_BATCH_PATCHERS = {
+    'action': (Action, update_action),
+    'event': (Event, update_event),
+    'subscription': (Subscription, update_subscription),
+    'trigger': (Trigger, update_trigger),
+    'workflow': (Workflow, update_workflow),
+}
+
+
+@jsonapi
+def batch_get(entity_type):
+    """ takes a list of ids and returns the entities (or null for those not found) in the same order """
+    ids = request.get_json()
+    error = _validate_ids(ids)
+    if error:
+        return error
+    entities = entity_lookup_service().get_entities(entity_type, ids, include_archived_requested())
+    return {'results': [e.to_dict() if e else None for e in entities]}
+
+
+@accounting_track
+@jsonapi
+def batch_patch(entity_type):
+    """ takes a list of {"id": ..., "patch": [json patch operations]} and applies them as the single entity PATCH
+        endpoint would, in one transaction: if any patch fails, none are applied.  If an entity was changed
+        concurrently the batch fails with a 409 (rather than retrying that patch, which would roll back the earlier
+        ones), and can be resubmitted.  Side effects outside of the database (e.g. updates to the CloudWatch rules of
+        scheduled triggers) are not rolled back. """
+    patches = request.get_json()
+    if not isinstance(patches, list) or not all(isinstance(p, dict) and 'id' in p and 'patch' in p for p in patches):
+        return {'results': 'ERROR', 'error_message': 'expected a list of {"id": ..., "patch": [...]}'}, 400, None
+    ids = [p['id'] for p in patches]
+    error = _validate_ids(ids)
+    if error:
+        return error
+
+    entities = entity_lookup_service().get_entities(entity_type, ids)
+    missing_ids = [i for i, e in zip(ids, entities) if not e]
+    if missing_ids:
+        error_message = '%s not found: %s' % (entity_type, ', '.join(missing_ids))
+        return {'results': 'ERROR', 'error_message': error_message}, 404, None
+
+    model_class, update_function = _BATCH_PATCHERS[entity_type]
+    results = []
+    try:
+        for entity, p in zip(entities, patches):
+            updated_entity = model_class.from_dict(JsonPatch(p['patch']).apply(entity.to_dict()))
+            rv = update_function(entity, updated_entity, commit=False)
+            # (error_response, error_response_code, headers)
+            if isinstance(rv, tuple):
+                db.session.rollback()
+                rv[0]['id'] = entity.id
+                return rv
+            results.append(rv['results'])
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        error_message = 'a %s was changed concurrently, no patches were applied' % entity_type
+        return {'results': 'ERROR', 'error_message': error_message}, 409, None
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'results': results}
+
+
+def _validate_ids(ids):
+    if not isinstance(ids, list) or not all(isinstance(i, basestring) for i in ids):
+        return {'results': 'ERROR', 'error_message': 'expected a list of ids'}, 400, None
+    if len(ids) > MAX_BATCH_SIZE:
+        return {'results': 'ERROR', 'error_message': 'at most %s ids are allowed' % MAX_BATCH_SIZE}, 400, None
+    if len(set(ids)) != len(ids):
+        return {'results': 'ERROR', 'error_message': 'the ids must be unique'}, 400, None
+    return None
+
+
+# static rules, so that they take precedence over e.g. PATCH /action/<action>
+for _entity_type in ENTITY_TYPES:
+    api_batch_bp.add_url_rule('/%s/batch_get' % _entity_type, 'batch_get_%s' % _entity_type, batch_get,
+                              methods=['POST'], defaults={'entity_type': _entity_type})
+for _entity_type in _BATCH_PATCHERS:
+    api_batch_bp.add_url_rule('/%s/batch' % _entity_type, 'batch_patch_%s' % _entity_type, batch_patch,
+                              methods=['PATCH'], defaults={'entity_type': _entity_type})
+
+
+def entity_lookup_service():
+    """ :rtype: dart.web.api.entity_lookup.EntityLookupService """
+    return current_app.dart_context.get(EntityLookupService)
@@ -6,7 +6,7 @@ from flask.ext.jsontools import jsonapi
 from dart.model.dataset import Dataset
 from dart.service.dataset import DatasetService
 from dart.service.filter import FilterService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track
 from dart.util.dataset_guess import infer_dataset_data
 
 api_dataset_bp = Blueprint('api_dataset', __name__)
@@ -20,8 +20,9 @@ def post_dataset():
 
 
 @api_dataset_bp.route('/dataset/<dataset>', methods=['GET'])
-@fetch_model
 @accounting_track
+@conditional_get
+@fetch_model
 @jsonapi
 def get_dataset(dataset):
     return {'results': dataset.to_dict()}
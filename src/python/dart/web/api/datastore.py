@@ -8,7 +8,7 @@ from dart.model.datastore import Datastore, DatastoreState
 from dart.service.action import ActionService
 from dart.service.datastore import DatastoreService
 from dart.service.filter import FilterService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track
 
 api_datastore_bp = Blueprint('api_datastore', __name__)
 
@@ -21,6 +21,7 @@ def post_datastore():
 
 
 @api_datastore_bp.route('/datastore/<datastore>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_datastore(datastore):
@@ -5,7 +5,7 @@ from flask.ext.jsontools import jsonapi
 
 from dart.message.trigger_proxy import TriggerProxy
 from dart.model.action import ActionState
-from dart.model.engine import Engine, ActionResult, ActionResultState, ActionContext
+from dart.model.engine import Engine, ActionResult, ActionResultState, ActionContext, ActionBatchCheckin
 from dart.model.graph import SubGraphDefinition
 from dart.service.action import ActionService
 from dart.service.datastore import DatastoreService
@@ -13,7 +13,7 @@ from dart.service.engine import EngineService
 from dart.service.filter import FilterService
 from dart.service.trigger import TriggerService
 from dart.service.workflow import WorkflowService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track
 
 api_engine_bp = Blueprint('api_engine', __name__)
 
@@ -26,8 +26,9 @@ def post_engine():
 
 
 @api_engine_bp.route('/engine/<engine>', methods=['GET'])
-@fetch_model
 @accounting_track
+@conditional_get
+@fetch_model
 @jsonapi
 def get_engine(engine):
     """
@@ -120,6 +121,36 @@ def action_checkin(action):
 
     action_result = ActionResult.from_dict(request.get_json())
     assert isinstance(action_result, ActionResult)
+    _checkin(action, action_result)
+    return {'results': 'OK'}
+
+
+@api_engine_bp.route('/engine/action_batch/checkin', methods=['PUT'])
+@accounting_track
+@jsonapi
+def action_batch_checkin():
+    """ checks in the results of batched actions.  Released actions were handed to the engine task but not run
+        (e.g. because an earlier action in the batch failed), so they go back to HAS_NEVER_RUN. """
+    batch_checkin = ActionBatchCheckin.from_dict(request.get_json())
+    assert isinstance(batch_checkin, ActionBatchCheckin)
+    for action_id in batch_checkin.released_action_ids:
+        action = action_service().get_action(action_id, raise_when_missing=False)
+        if action and action.data.state == ActionState.PENDING:
+            action_service().update_action_state(action, ActionState.HAS_NEVER_RUN, action.data.error_message)
+
+    for action_batch_result in batch_checkin.action_results:
+        action = action_service().get_action(action_batch_result.action_id)
+        results = validate_engine_action(action, ActionState.RUNNING)
+        # (error_response, error_response_code, headers)
+        if len(results) == 3:
+            return results
+        _checkin(action, action_batch_result.result)
+    return {'results': 'OK'}
+
+
+def _checkin(action, action_result):
+    """ :type action: dart.model.action.Action
+        :type action_result: dart.model.engine.ActionResult """
     action_state = ActionState.COMPLETED if action_result.state == ActionResultState.SUCCESS else ActionState.FAILED
     action = workflow_service().action_checkin(action, action_state, action_result.consume_subscription_state)
 
@@ -127,7 +158,6 @@ def action_checkin(action):
     if action_result.state == ActionResultState.FAILURE:
         error_message = action_result.error_message
     trigger_proxy().complete_action(action.id, action_state, error_message)
-    return {'results': 'OK'}
 
 
 def validate_engine_action(action, state):
@@ -167,6 +197,7 @@ def post_subgraph_definition(engine):
 
 
 @api_engine_bp.route('/subgraph_definition/<subgraph_definition>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_subgraph_definition(subgraph_definition):
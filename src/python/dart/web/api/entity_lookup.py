@@ -5,16 +5,43 @@ from functools import wraps
 
 from flask import abort, current_app, request
 
+from dart.context.database import db
 from dart.context.locator import injectable
+from dart.model.exception import DartValidationException
+from dart.model.orm import ActionArchiveDao, ActionDao, ActionPayloadArchiveDao, ActionPayloadDao, DatasetDao, \
+    DatastoreDao, EngineDao, EventDao, SubGraphDefinitionDao, SubscriptionDao, TriggerDao, WorkflowDao, \
+    WorkflowInstanceArchiveDao, WorkflowInstanceDao
 from dart.service.accounting import AccountingService
+from dart.service.state_change import StateChangeListener
 from dart.web.api.utils import generate_accounting_event
 
 _logger = logging.getLogger(__name__)
 
+# the tables holding each entity type (keyed by the entity id), the first being its main table
+_ENTITY_DAOS = {
+    'engine': [EngineDao],
+    'subgraph_definition': [SubGraphDefinitionDao],
+    'dataset': [DatasetDao],
+    'datastore': [DatastoreDao],
+    'action': [ActionDao, ActionPayloadDao],
+    'trigger': [TriggerDao],
+    'workflow': [WorkflowDao],
+    'workflow_instance': [WorkflowInstanceDao],
+    'subscription': [SubscriptionDao],
+    'event': [EventDao],
+}
+ENTITY_TYPES = sorted(_ENTITY_DAOS.keys())
+_ARCHIVED_ENTITY_DAOS = {
+    'action': [ActionArchiveDao, ActionPayloadArchiveDao],
+    'workflow_instance': [WorkflowInstanceArchiveDao],
+}
+
+
 @injectable
 class EntityLookupService(object):
     def __init__(self, engine_service, dataset_service, datastore_service, action_service, trigger_service,
                  workflow_service, subscription_service, event_service):
+        self._action_service = action_service
         self._services = {
             'engine': engine_service.get_engine,
             'subgraph_definition': engine_service.get_subgraph_definition,
@@ -31,20 +58,66 @@ class EntityLookupService(object):
     def unsupported_entity_type(self, entity_type):
         return self._services.get(entity_type) is None
 
-    def get_entity(self, entity_type, id):
+    def get_entity(self, entity_type, id, include_archived=False):
         get_func = self._services[entity_type]
+        if include_archived and entity_type in ['action', 'workflow_instance']:
+            return get_func(id, raise_when_missing=False, include_archived=True)
         return get_func(id, raise_when_missing=False)
 
+    def get_entities(self, entity_type, ids, include_archived=False):
+        """ :return: the entities (or None for those not found), in the order of the given ids
+            :rtype: list """
+        if entity_type == 'action':
+            return self._action_service.get_actions(ids, include_archived)
+        dao = _ENTITY_DAOS[entity_type][0]
+        entities = {d.id: d.to_model() for d in dao.query.filter(dao.id.in_(ids)).all()}
+        missing_ids = [i for i in ids if i not in entities]
+        if missing_ids and include_archived and entity_type in _ARCHIVED_ENTITY_DAOS:
+            archive_dao = _ARCHIVED_ENTITY_DAOS[entity_type][0]
+            entities.update({d.id: d.to_model() for d in archive_dao.query.filter(archive_dao.id.in_(missing_ids))})
+        return [entities.get(i) for i in ids]
+
+    @staticmethod
+    def get_entity_etag(entity_type, id, include_archived=False):
+        """ :return: an etag built from the id and the version_ids of the entity's rows, which change whenever the
+                     entity does, or None if the entity does not exist.  Only the version_ids are read.
+            :rtype: str """
+        versions = EntityLookupService._get_versions(_ENTITY_DAOS[entity_type], id)
+        if not versions and include_archived and entity_type in _ARCHIVED_ENTITY_DAOS:
+            versions = EntityLookupService._get_versions(_ARCHIVED_ENTITY_DAOS[entity_type], id)
+        if not versions:
+            return None
+        return '-'.join([id] + ['%s' % v for v in versions])
+
+    @staticmethod
+    def get_entity_version(entity_type, id, include_archived=False):
+        """ :return: the version_id of the entity's main row, or None if the entity does not exist
+            :rtype: int """
+        versions = EntityLookupService._get_versions(_ENTITY_DAOS[entity_type][:1], id)
+        if not versions and include_archived and entity_type in _ARCHIVED_ENTITY_DAOS:
+            versions = EntityLookupService._get_versions(_ARCHIVED_ENTITY_DAOS[entity_type][:1], id)
+        return versions[0] if versions else None
+
+    @staticmethod
+    def _get_versions(daos, id):
+        main_dao = daos[0]
+        query = db.session.query(*[dao.version_id for dao in daos])
+        for dao in daos[1:]:
+            query = query.outerjoin(dao, dao.id == main_dao.id)
+        return query.filter(main_dao.id == id).first()
+
 
 def fetch_model(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         lookup_service = current_app.dart_context.get(EntityLookupService)
         entities_by_type = {}
+        # archived entities are read-only
+        include_archived = request.method == 'GET' and include_archived_requested()
         for url_param_name, value in kwargs.iteritems():
             if lookup_service.unsupported_entity_type(url_param_name):
                 continue
-            model = lookup_service.get_entity(url_param_name, value)
+            model = lookup_service.get_entity(url_param_name, value, include_archived)
             if not model:
                 abort(404)
             entities_by_type[url_param_name] = model
@@ -53,6 +126,43 @@ def fetch_model(f):
     return wrapper
 
 
+def conditional_get(f):
+    """ for GETs of a single entity (wrapping @fetch_model): sets an ETag on the response, and answers with a 304
+        after a version_id lookup, without loading the entity, when the If-None-Match header already matches it.
+
+        With ?wait_for_change_since=<version_id>, the request is a long poll: the response is held until the
+        entity's version_id differs from the given one (or dart.state_change.long_poll_max_seconds pass). """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        lookup_service = current_app.dart_context.get(EntityLookupService)
+        (entity_type, entity_id), = kwargs.items()
+        include_archived = include_archived_requested()
+        since_version_id = request.args.get('wait_for_change_since')
+        if since_version_id is not None:
+            if not since_version_id.isdigit():
+                raise DartValidationException('wait_for_change_since must be a version_id: %s' % since_version_id)
+            current_app.dart_context.get(StateChangeListener).wait_for_change(
+                entity_type, entity_id, int(since_version_id),
+                lambda: lookup_service.get_entity_version(entity_type, entity_id, include_archived),
+            )
+        etag = lookup_service.get_entity_etag(entity_type, entity_id, include_archived)
+        if etag and request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = f(*args, **kwargs)
+        if etag and response.status_code in [200, 304]:
+            response.set_etag(etag)
+            # browsers may keep the response, but must revalidate it before each use
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+
+def include_archived_requested():
+    """ whether the request asked for archived entities to be included (?include_archived=true) """
+    return request.args.get('include_archived', 'false').lower() == 'true'
+
+
 # This decorator's job is to log to the accounting table the activity that took place.
 # By default we apply this decorator to non-GET methods only.
 # We intentionally run it before the @jsonapi decorator so we can retrieve the return code.
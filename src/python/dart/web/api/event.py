@@ -6,7 +6,7 @@ from jsonpatch import JsonPatch
 from dart.model.event import Event
 from dart.service.event import EventService
 from dart.service.filter import FilterService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track
 
 api_event_bp = Blueprint('api_event', __name__)
 
@@ -19,6 +19,7 @@ def post_event():
 
 
 @api_event_bp.route('/event/<event>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_event(event):
@@ -59,7 +60,7 @@ def patch_event(event):
     return update_event(event, Event.from_dict(p.apply(event.to_dict())))
 
 
-def update_event(event, updated_event):
+def update_event(event, updated_event, commit=True):
     # only allow updating fields that are editable
     sanitized_event = event.copy()
     sanitized_event.data.name = updated_event.data.name
@@ -70,7 +71,7 @@ def update_event(event, updated_event):
     # revalidate
     sanitized_event = event_service().default_and_validate_event(sanitized_event)
 
-    return {'results': event_service().patch_event(event, sanitized_event).to_dict()}
+    return {'results': event_service().patch_event(event, sanitized_event, commit).to_dict()}
 
 
 @api_event_bp.route('/event/<event>', methods=['DELETE'])
@@ -0,0 +1,61 @@
+import time
+from Queue import Empty
+
+from flask import Blueprint, Response, request, current_app, stream_with_context
+from flask.ext.jsontools import jsonapi
+
+from dart.service.state_change import StateChangeListener, NOTIFYING_ENTITY_TYPES
+from dart.util import json_util
+
+api_state_change_bp = Blueprint('api_state_change', __name__)
+
+
+@api_state_change_bp.route('/state_change/<entity_type>/<entity_id>', methods=['GET'])
+@jsonapi
+def wait_for_state_change(entity_type, entity_id):
+    """ a long poll: waits for the next insert or update of the entity (or of the actions, workflow instances, etc.
+        that belong to it, e.g. for a workflow or datastore), for at most ?timeout_seconds
+
+        :return: the notification, or null if the wait timed out """
+    if entity_type not in NOTIFYING_ENTITY_TYPES:
+        return {'results': 'ERROR', 'error_message': 'unsupported entity_type: %s' % entity_type}, 400, None
+    timeout_seconds = request.args.get('timeout_seconds')
+    try:
+        timeout_seconds = float(timeout_seconds) if timeout_seconds is not None else None
+    except ValueError:
+        error_message = 'timeout_seconds must be a number: %s' % timeout_seconds
+        return {'results': 'ERROR', 'error_message': error_message}, 400, None
+    notification = state_change_listener().wait_for_notification(entity_type, entity_id, timeout_seconds)
+    return {'results': notification}
+
+
+@api_state_change_bp.route('/state_change/<entity_type>/<entity_id>/stream', methods=['GET'])
+def stream_state_changes(entity_type, entity_id):
+    """ a server-sent event stream of the notifications for the entity (as above).  The stream ends after
+        dart.state_change.stream_max_seconds, and EventSource clients reconnect on their own. """
+    if entity_type not in NOTIFYING_ENTITY_TYPES:
+        return Response('unsupported entity_type: %s' % entity_type, status=400)
+    listener = state_change_listener()
+
+    def events():
+        queue = listener.subscribe(entity_type, entity_id)
+        try:
+            deadline = time.time() + listener.stream_max_seconds
+            # tells the client how long to wait before reconnecting
+            yield 'retry: 1000\n\n'
+            while time.time() < deadline:
+                try:
+                    notification = queue.get(timeout=min(15, max(0, deadline - time.time())))
+                    yield 'data: %s\n\n' % json_util.dumps(notification)
+                except Empty:
+                    # keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+        finally:
+            listener.unsubscribe(entity_type, entity_id, queue)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+def state_change_listener():
+    """ :rtype: dart.service.state_change.StateChangeListener """
+    return current_app.dart_context.get(StateChangeListener)
@@ -0,0 +1,51 @@
+from functools import wraps
+
+from flask import Response, stream_with_context
+from flask.ext.jsontools import jsonapi
+
+from dart.util import json_util
+
+# how many bytes of encoded results to collect before writing them out
+_CHUNK_SIZE = 64 * 1024
+
+
+class StreamingList(object):
+    def __init__(self, results, **fields):
+        """ a list response, {"results": [...], <fields>}, that is encoded and written as the results are iterated,
+            so that a page of any size is served with flat memory use
+
+            :param results: an iterable of JSON serializable values, e.g. a generator over a server side cursor
+            :param fields: the other (small) values of the response, e.g. limit, offset and total """
+        self.results = results
+        self.fields = fields
+
+    def response(self):
+        return Response(stream_with_context(self._encode()), mimetype='application/json')
+
+    def _encode(self):
+        chunk = ['{']
+        for key, value in self.fields.iteritems():
+            chunk.append('%s: %s, ' % (json_util.dumps(key), json_util.dumps(value)))
+        chunk.append('"results": [')
+        size = 0
+        for i, result in enumerate(self.results):
+            encoded = json_util.dumps(result)
+            chunk.append(', ' + encoded if i else encoded)
+            size += len(encoded)
+            if size >= _CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk, size = [], 0
+        chunk.append(']}')
+        yield ''.join(chunk)
+
+
+def streaming_jsonapi(f):
+    """ like @jsonapi, except that the view may also return a StreamingList.  Since the status of a streamed
+        response is sent before its results are read, an error partway through truncates the response body. """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        rv = f(*args, **kwargs)
+        if isinstance(rv, StreamingList):
+            return rv.response()
+        return jsonapi(lambda: rv)()
+    return wrapper
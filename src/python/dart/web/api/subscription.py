@@ -7,7 +7,8 @@ from jsonpatch import JsonPatch
 from dart.model.subscription import Subscription, SubscriptionState, SubscriptionElementState
 from dart.service.filter import FilterService
 from dart.service.subscription import SubscriptionService, SubscriptionElementService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track, include_archived_requested
+from dart.web.api.streaming import StreamingList, streaming_jsonapi
 
 
 api_subscription_bp = Blueprint('api_subscription', __name__)
@@ -25,6 +26,7 @@ def post_subscription(dataset):
 
 
 @api_subscription_bp.route('/subscription/<subscription>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_subscription(subscription):
@@ -50,13 +52,14 @@ def find_subscriptions():
 @fetch_model
 @jsonapi
 def get_subscription_element_stats(subscription):
-    stats = subscription_element_service().get_subscription_element_stats(subscription.id)
+    stats = subscription_element_service().get_subscription_element_stats(subscription.id,
+                                                                          include_archived_requested())
     return {'results': [s.to_dict() for s in stats]}
 
 
 @api_subscription_bp.route('/subscription/<subscription>/elements', methods=['GET'])
 @fetch_model
-@jsonapi
+@streaming_jsonapi
 def find_subscription_elements(subscription):
     """ :type subscription: dart.model.subscription.Subscription """
     state = request.args.get('state')
@@ -70,7 +73,7 @@ def find_subscription_elements(subscription):
 
 @api_subscription_bp.route('/action/<action>/subscription/elements', methods=['GET'])
 @fetch_model
-@jsonapi
+@streaming_jsonapi
 def find_action_subscription_elements(action):
     """ :type action: dart.model.action.Action """
     if 'subscription_id' not in action.data.args:
@@ -85,6 +88,15 @@ def find_action_subscription_elements(action):
 def subscription_elements(action_id, state, subscription_id, gte_processed=None, gt_s3_path=None):
     limit = int(request.args.get('limit', 10000))
     offset = int(request.args.get('offset', 0))
+    include_archived = include_archived_requested()
+    total = subscription_element_service().find_subscription_elements_count(
+        subscription_id=subscription_id,
+        state=state,
+        action_id=action_id,
+        gt_s3_path=gt_s3_path,
+        gte_processed=gte_processed,
+        include_archived=include_archived
+    )
     elements = subscription_element_service().find_subscription_elements(
         subscription_id=subscription_id,
         state=state,
@@ -92,20 +104,11 @@ def subscription_elements(action_id, state, subscription_id, gte_processed=None,
         offset=offset,
         action_id=action_id,
         gt_s3_path=gt_s3_path,
-        gte_processed=gte_processed
+        gte_processed=gte_processed,
+        include_archived=include_archived,
+        stream=True
     )
-    return {
-        'results': [e.to_dict() for e in elements],
-        'limit': limit,
-        'offset': offset,
-        'total': subscription_element_service().find_subscription_elements_count(
-            subscription_id=subscription_id,
-            state=state,
-            action_id=action_id,
-            gt_s3_path=gt_s3_path,
-            gte_processed=gte_processed
-        )
-    }
+    return StreamingList((e.to_dict() for e in elements), limit=limit, offset=offset, total=total)
 
 
 @api_subscription_bp.route('/subscription/<subscription>', methods=['PUT'])
@@ -127,7 +130,7 @@ def patch_subscription(subscription):
     return update_subscription(subscription, Subscription.from_dict(p.apply(subscription.to_dict())))
 
 
-def update_subscription(subscription, updated_subscription):
+def update_subscription(subscription, updated_subscription, commit=True):
     if subscription.data.state not in [SubscriptionState.ACTIVE, SubscriptionState.INACTIVE]:
         return {'results': 'ERROR', 'error_message': 'state must be ACTIVE or INACTIVE'}, 400, None
 
@@ -142,7 +145,8 @@ def update_subscription(subscription, updated_subscription):
     # revalidate
     sanitized_subscription = subscription_service().default_and_validate_subscription(sanitized_subscription)
 
-    return {'results': subscription_service().patch_subscription(subscription, sanitized_subscription).to_dict()}
+    subscription = subscription_service().patch_subscription(subscription, sanitized_subscription, commit)
+    return {'results': subscription.to_dict()}
 
 
 @api_subscription_bp.route('/subscription/<subscription>', methods=['DELETE'])
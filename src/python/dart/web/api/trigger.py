@@ -6,7 +6,7 @@ from dart.model.trigger import Trigger
 from dart.service.filter import FilterService
 from dart.service.trigger import TriggerService
 from dart.service.workflow import WorkflowService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track
 
 
 api_trigger_bp = Blueprint('api_trigger', __name__)
@@ -22,6 +22,7 @@ def post_trigger():
 
 
 @api_trigger_bp.route('/trigger/<trigger>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_trigger(trigger):
@@ -76,7 +77,7 @@ def patch_trigger(trigger):
     return update_trigger(trigger, Trigger.from_dict(p.apply(trigger.to_dict())))
 
 
-def update_trigger(trigger, updated_trigger):
+def update_trigger(trigger, updated_trigger, commit=True):
     # only allow updating fields that are editable
     sanitized_trigger = trigger.copy()
     sanitized_trigger.data.name = updated_trigger.data.name
@@ -89,7 +90,7 @@ def update_trigger(trigger, updated_trigger):
     # revalidate
     sanitized_trigger = trigger_service().default_and_validate_trigger(sanitized_trigger)
 
-    return {'results': trigger_service().patch_trigger(trigger, sanitized_trigger).to_dict()}
+    return {'results': trigger_service().patch_trigger(trigger, sanitized_trigger, commit).to_dict()}
 
 
 @api_trigger_bp.route('/trigger/<trigger>', methods=['DELETE'])
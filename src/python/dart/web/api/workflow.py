@@ -6,11 +6,11 @@ from dart.model.datastore import DatastoreState
 from dart.model.query import Filter, Operator
 
 from dart.model.workflow import Workflow, WorkflowState, WorkflowInstanceState
-from dart.service.action import ActionService
 from dart.service.filter import FilterService
 from dart.service.workflow import WorkflowService
 from dart.service.trigger import TriggerService
-from dart.web.api.entity_lookup import fetch_model, accounting_track
+from dart.web.api.entity_lookup import fetch_model, conditional_get, accounting_track, include_archived_requested
+from dart.web.api.streaming import StreamingList, streaming_jsonapi
 
 
 api_workflow_bp = Blueprint('api_workflow', __name__)
@@ -49,6 +49,7 @@ def find_workflows():
 
 
 @api_workflow_bp.route('/workflow/<workflow>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_workflow(workflow):
@@ -57,12 +58,13 @@ def get_workflow(workflow):
 
 @api_workflow_bp.route('/workflow/<workflow>/instance', methods=['GET'])
 @fetch_model
-@jsonapi
+@streaming_jsonapi
 def find_workflow_instances(workflow):
     return _find_workflow_instances(workflow)
 
 
 @api_workflow_bp.route('/workflow/instance/<workflow_instance>', methods=['GET'])
+@conditional_get
 @fetch_model
 @jsonapi
 def get_workflow_instance(workflow_instance):
@@ -71,7 +73,7 @@ def get_workflow_instance(workflow_instance):
 
 @api_workflow_bp.route('/workflow/instance', methods=['GET'])
 @fetch_model
-@jsonapi
+@streaming_jsonapi
 def find_instances():
     return _find_workflow_instances()
 
@@ -82,13 +84,11 @@ def _find_workflow_instances(workflow=None):
     filters = [filter_service().from_string(f) for f in json.loads(request.args.get('filters', '[]'))]
     if workflow:
         filters.append(Filter('workflow_id', Operator.EQ, workflow.id))
-    workflow_instances = workflow_service().query_workflow_instances(filters, limit, offset)
-    return {
-        'results': [d.to_dict() for d in workflow_instances],
-        'limit': limit,
-        'offset': offset,
-        'total': workflow_service().query_workflow_instances_count(filters)
-    }
+    include_archived = include_archived_requested()
+    total = workflow_service().query_workflow_instances_count(filters, include_archived)
+    workflow_instances = workflow_service().query_workflow_instances(filters, limit, offset, include_archived,
+                                                                     stream=True)
+    return StreamingList((d.to_dict() for d in workflow_instances), limit=limit, offset=offset, total=total)
 
 
 @api_workflow_bp.route('/workflow/<workflow>', methods=['PUT'])
@@ -110,7 +110,7 @@ def patch_workflow(workflow):
     return update_workflow(workflow, Workflow.from_dict(p.apply(workflow.to_dict())))
 
 
-def update_workflow(workflow, updated_workflow):
+def update_workflow(workflow, updated_workflow, commit=True):
     if workflow.data.state not in [WorkflowState.ACTIVE, WorkflowState.INACTIVE]:
         return {'results': 'ERROR', 'error_message': 'state must be ACTIVE or INACTIVE'}, 400, None
 
@@ -128,7 +128,7 @@ def update_workflow(workflow, updated_workflow):
     # revalidate
     sanitized_workflow = workflow_service().default_and_validate_workflow(sanitized_workflow)
 
-    return {'results': workflow_service().patch_workflow(workflow, sanitized_workflow).to_dict()}
+    return {'results': workflow_service().patch_workflow(workflow, sanitized_workflow, commit).to_dict()}
 
 
 @api_workflow_bp.route('/workflow/<workflow>/do-manual-trigger', methods=['POST'])
@@ -154,7 +154,6 @@ def trigger_workflow(workflow):
 @accounting_track
 @jsonapi
 def delete_workflow(workflow):
-    action_service().delete_actions_in_workflow(workflow.id)
     workflow_service().delete_workflow(workflow.id)
     return {'results': 'OK'}
 
@@ -168,11 +167,6 @@ def delete_workflow_instances(workflow):
     return {'results': 'OK'}
 
 
-def action_service():
-    """ :rtype: dart.service.filter.ActionService """
-    return current_app.dart_context.get(ActionService)
-
-
 def filter_service():
     """ :rtype: dart.service.filter.FilterService """
     return current_app.dart_context.get(FilterService)
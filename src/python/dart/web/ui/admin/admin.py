@@ -1,24 +1,43 @@
-from flask import Blueprint
+from flask import Blueprint, current_app
 from sqlalchemy import text
 
 from dart.context.database import db
+from dart.model.cache_version import CacheVersions
 from dart.model.mutex import Mutexes, MutexState
-from dart.util.rand import random_id
+from dart.service.subscription_element_partition import SubscriptionElementPartitioner
+from dart.util.rand import new_id
 
 admin_bp = Blueprint('admin', __name__)
 
 
 @admin_bp.route('/create_all', methods=['POST'])
 def create_all():
+    # for the trigram index of entity_search
+    db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    db.session.commit()
     db.create_all()
 
+    partitioner = current_app.dart_context.get(SubscriptionElementPartitioner)
+    if partitioner.enabled:
+        partitioner.ensure_partitions()
+
     for mutex in Mutexes.all():
         sql = """
             INSERT INTO mutex (id, version_id, created, updated, name, state)
             SELECT :id, 0, NOW(), NOW(), :name, :state
             WHERE NOT EXISTS (SELECT NULL FROM mutex WHERE name = :name)
             """
-        statement = text(sql).bindparams(id=random_id(), name=mutex, state=MutexState.READY)
+        statement = text(sql).bindparams(id=new_id(), name=mutex, state=MutexState.READY)
+        db.session.execute(statement)
+        db.session.commit()
+
+    for cache_version in CacheVersions.all():
+        sql = """
+            INSERT INTO cache_version (id, version_id, created, updated, name, version)
+            SELECT :id, 0, NOW(), NOW(), :name, 0
+            WHERE NOT EXISTS (SELECT NULL FROM cache_version WHERE name = :name)
+            """
+        statement = text(sql).bindparams(id=new_id(), name=cache_version)
         db.session.execute(statement)
         db.session.commit()
 
@@ -36,6 +36,7 @@ class EngineWorker(Tool):
         self._datastore_service = self.app_context.get(DatastoreService)
         self._trigger_proxy = self.app_context.get(TriggerProxy)
         self._sleep_seconds = 0.7
+        self._max_action_batch_size = self.dart_config['dart'].get('max_action_batch_size', 20)
         self._counter = Counter(transition_queued=1, transition_stale=1, transition_orphaned=60, scale_down=120)
 
     def run(self):
@@ -84,21 +85,26 @@ class EngineWorker(Tool):
                 )
 
                 engine = engine_service.get_engine_by_name(action.data.engine_name)
+                batch = [action] + self._add_following_actions_to_batch(engine, action)
 
                 if self.dart_config['dart'].get('use_local_engines'):
                     config = self.dart_config['engines'][engine.data.name]
                     engine_instance = locate(config['path'])(**config.get('options', {}))
-                    self._launch_in_memory_engine(engine, engine_instance, action)
-                    # empty string allows differentiation from null, yet is still falsey
-                    action_service.update_action_ecs_task_arn(action, '')
+                    self._launch_in_memory_engine(engine, engine_instance, batch)
+                    for a in batch:
+                        # empty string allows differentiation from null, yet is still falsey
+                        action_service.update_action_ecs_task_arn(a, '')
 
                 elif engine.data.ecs_task_definition_arn:
-                    ecs_task_arn = self._try_run_task(engine, action)
+                    ecs_task_arn = self._try_run_task(engine, batch)
                     if ecs_task_arn:
-                        action_service.update_action_ecs_task_arn(action, ecs_task_arn)
+                        for a in batch:
+                            action_service.update_action_ecs_task_arn(a, ecs_task_arn)
                     else:
                         # no task arn means there isn't enough capacity at the moment, so try again later
                         action_service.update_action_state(action, ActionState.QUEUED, action.data.error_message)
+                        for a in batch[1:]:
+                            action_service.update_action_state(a, ActionState.HAS_NEVER_RUN, a.data.error_message)
 
                 else:
                     msg = 'engine %s has no ecs_task_definition and local engines are not allowed'
@@ -114,9 +120,54 @@ class EngineWorker(Tool):
             finally:
                 db.session.rollback()
 
+    def _add_following_actions_to_batch(self, engine, action):
+        """ moves the HAS_NEVER_RUN actions that directly follow the given (now PENDING) action to PENDING as well,
+            as long as they are of a batchable action type, so that a single engine task runs them all in order.
+            Only actions that would otherwise run strictly after the given one qualify, which is why actions with
+            depends_on (and any action after them) end the batch.  An empty depends_on counts as well, since such an
+            action is ready as soon as it is created (see ActionService.find_runnable_actions).
+
+            :type engine: dart.model.engine.Engine
+            :type action: dart.model.action.Action
+            :rtype: list[dart.model.action.Action] """
+        batchable_action_type_names = {t.name for t in engine.data.supported_action_types if t.batchable}
+        if self._max_action_batch_size <= 1 \
+                or action.data.action_type_name not in batchable_action_type_names \
+                or action.data.depends_on is not None:
+            return []
+
+        batch = []
+        for following_action in self._action_service.find_following_actions(action, self._max_action_batch_size - 1):
+            if following_action.data.state != ActionState.HAS_NEVER_RUN \
+                    or following_action.data.engine_name != action.data.engine_name \
+                    or following_action.data.action_type_name not in batchable_action_type_names \
+                    or following_action.data.depends_on is not None:
+                break
+            try:
+                self._action_service.update_action_state(
+                    action=following_action,
+                    state=ActionState.PENDING,
+                    error_message=following_action.data.error_message,
+                    conditional=lambda a: a.data.state == ActionState.HAS_NEVER_RUN
+                )
+            except DartConditionalUpdateFailedException:
+                break
+            batch.append(following_action)
+
+        if batch:
+            _logger.info('batching %s actions after action (id=%s)' % (len(batch), action.id))
+        return batch
+
+    @staticmethod
+    def _action_environment(batch):
+        if len(batch) == 1:
+            return {'DART_ACTION_ID': batch[0].id}
+        return {'DART_ACTION_IDS': ','.join(a.id for a in batch)}
+
     @db_mutex(Mutexes.START_ENGINE_TASK)
-    def _try_run_task(self, engine, action):
+    def _try_run_task(self, engine, batch):
         _logger.info('trying to run ecs task')
+        environment = [{'name': k, 'value': v} for k, v in self._action_environment(batch).iteritems()]
 
         response = boto3.client('ecs').run_task(
             cluster=self._engine_taskrunner_ecs_cluster,
@@ -125,7 +176,7 @@ class EngineWorker(Tool):
                 'containerOverrides': [
                     {
                         'name': containerDefinition['name'],
-                        'environment': [{'name': 'DART_ACTION_ID', 'value': action.id}]
+                        'environment': environment
                     }
                     for containerDefinition in engine.data.ecs_task_definition['containerDefinitions']
                 ]
@@ -146,14 +197,29 @@ class EngineWorker(Tool):
         action_service = self._action_service
         assert isinstance(action_service, ActionService)
         actions = action_service.find_stale_pending_actions()
+        # only the first action of a stale batch was QUEUED, the others go back to waiting for it
+        first_actions = {}
+        for action in sorted(actions, key=lambda a: a.data.order_idx):
+            first_actions.setdefault((action.data.datastore_id, action.data.workflow_instance_id), action)
+
+        datastore_ids = set()
         for action in actions:
             _logger.error('found stale action with id: %s' % action.id)
-            action_service.update_action_state(
-                action=action,
-                state=ActionState.QUEUED,
-                error_message=action.data.error_message,
-                conditional=lambda a: a.data.state == ActionState.PENDING
-            )
+            is_first = first_actions[(action.data.datastore_id, action.data.workflow_instance_id)] is action
+            try:
+                action_service.update_action_state(
+                    action=action,
+                    state=ActionState.QUEUED if is_first else ActionState.HAS_NEVER_RUN,
+                    error_message=action.data.error_message,
+                    conditional=lambda a: a.data.state == ActionState.PENDING
+                )
+            except DartConditionalUpdateFailedException:
+                continue
+            if not is_first:
+                datastore_ids.add(action.data.datastore_id)
+
+        for datastore_id in datastore_ids:
+            self._trigger_proxy.try_next_action(datastore_id)
 
     def _transition_orphaned_actions_to_failed(self):
         _logger.info('transitioning orphaned actions to failed')
@@ -161,7 +227,10 @@ class EngineWorker(Tool):
         action_service = self._action_service
         assert isinstance(action_service, ActionService)
         actions = action_service.find_actions(states=[ActionState.PENDING, ActionState.RUNNING])
-        actions_by_ecs_task_arn = {a.data.ecs_task_arn: a for a in actions if a.data.ecs_task_arn}
+        actions_by_ecs_task_arn = {}
+        for action in actions:
+            if action.data.ecs_task_arn:
+                actions_by_ecs_task_arn.setdefault(action.data.ecs_task_arn, []).append(action)
 
         batch_size = 50
         task_arns = iter(actions_by_ecs_task_arn.keys())
@@ -175,9 +244,9 @@ class EngineWorker(Tool):
             )
             for task in response['tasks']:
                 if task['desiredStatus'] == 'STOPPED':
-                    action = actions_by_ecs_task_arn[task['taskArn']]
                     error_message = 'the ECS task STOPPED unexpectedly'
-                    self._trigger_proxy.complete_action(action.id, ActionState.FAILED, error_message)
+                    for action in actions_by_ecs_task_arn[task['taskArn']]:
+                        self._trigger_proxy.complete_action(action.id, ActionState.FAILED, error_message)
 
     @db_mutex(Mutexes.START_ENGINE_TASK)
     def _scale_down_unused_ecs_container_instances(self):
@@ -244,15 +313,16 @@ class EngineWorker(Tool):
                             )
                             break
 
-    @staticmethod
-    def _launch_in_memory_engine(engine, engine_instance, action):
+    def _launch_in_memory_engine(self, engine, engine_instance, batch):
         def target():
             engine_instance.run()
-        os.environ['DART_ACTION_ID'] = action.id
+        os.environ.pop('DART_ACTION_ID', None)
+        os.environ.pop('DART_ACTION_IDS', None)
+        os.environ.update(self._action_environment(batch))
         p = Process(target=target)
         p.start()
-        values = (engine.data.name, p.pid, action.id)
-        _logger.info('started in memory engine (name=%s) in process (pid=%s) to run action (id=%s)' % values)
+        values = (engine.data.name, p.pid, ', '.join(a.id for a in batch))
+        _logger.info('started in memory engine (name=%s) in process (pid=%s) to run actions (ids=%s)' % values)
 
 
 class Counter(object):
@@ -2,6 +2,7 @@ import logging
 import logging.config
 
 from dart.message.subscription_listener import SubscriptionListener
+from dart.service.subscription_element_partition import SubscriptionElementPartitioner
 from dart.tool.tool_runner import Tool
 from dart.worker.worker import Worker
 
@@ -12,6 +13,9 @@ class SubscriptionWorker(Tool):
     def __init__(self):
         super(SubscriptionWorker, self).__init__(_logger)
         self._listener = self.app_context.get(SubscriptionListener)
+        partitioner = self.app_context.get(SubscriptionElementPartitioner)
+        if partitioner.enabled:
+            partitioner.ensure_partitions()
 
     def run(self):
         assert isinstance(self._listener, SubscriptionListener)
@@ -2,7 +2,10 @@ import logging
 import logging.config
 
 from dart.message.trigger_listener import TriggerListener
+from dart.service.archive import Archiver
+from dart.service.email_outbox import EmailOutboxSender
 from dart.tool.tool_runner import Tool
+from dart.trigger.scheduler import LocalCronScheduler
 from dart.worker.worker import Worker
 
 _logger = logging.getLogger(__name__)
@@ -12,6 +15,14 @@ class TriggerWorker(Tool):
     def __init__(self):
         super(TriggerWorker, self).__init__(_logger)
         self._listener = self.app_context.get(TriggerListener)
+        # only runs when triggers.scheduled.scheduler is "local"
+        self._scheduler = self.app_context.get(LocalCronScheduler)
+        self._scheduler.start()
+        self._email_outbox_sender = self.app_context.get(EmailOutboxSender)
+        self._email_outbox_sender.start()
+        # only runs when dart.archive.enabled is true
+        self._archiver = self.app_context.get(Archiver)
+        self._archiver.start()
 
     def run(self):
         assert isinstance(self._listener, TriggerListener)